@@ -0,0 +1,362 @@
+"""Local scoring and detectors for generated drafts
+
+Metrics and detector flags are computed here from the request and the
+drafts rather than asked of the model, so they cost no output tokens and
+the same drafts always score the same.
+"""
+
+import re
+from bisect import bisect_right
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from .models import ChannelDraft, Detectors, GenerateRequest, Metrics, Severity
+from .moderation import compile_terms, normalize_term
+
+# Regret without ownership ("we regret any inconvenience")
+NON_APOLOGY_TERMS = [
+    "regret any inconvenience",
+    "regret the inconvenience",
+    "apologize for any inconvenience",
+    "apologise for any inconvenience",
+    "sorry for any inconvenience",
+    "sorry if",
+    "sorry you feel",
+    "sorry that you feel",
+    "mistakes were made",
+    "if anyone was offended",
+    "regret that you",
+]
+
+# Contrition >= 60 needs one of these
+EXPLICIT_OWNERSHIP_TERMS = [
+    "we caused",
+    "we failed",
+    "we made a mistake",
+    "we got this wrong",
+    "we let you down",
+    "our fault",
+    "our mistake",
+    "that is on us",
+    "this is on us",
+    "that's on us",
+    "we take full responsibility",
+    "we take responsibility",
+    "we accept responsibility",
+]
+
+# Contrition 21-59: partial ownership
+PARTIAL_OWNERSHIP_TERMS = [
+    "we played a part",
+    "we share responsibility",
+    "we are partly responsible",
+    "we contributed",
+]
+
+APOLOGY_TERMS = ["sorry", "apologize", "apologise", "apologies"]
+
+HEDGE_TERMS = [
+    "to our knowledge",
+    "to the best of our knowledge",
+    "pending investigation",
+    "preliminary",
+    "may have",
+    "might have",
+    "potentially",
+    "possibly",
+    "allegedly",
+    "reportedly",
+    "appears to",
+    "we believe",
+    "at this time",
+    "to the extent",
+    "subject to",
+    "without admission",
+    "without admitting",
+    "beyond our control",
+    "force majeure",
+    "out of an abundance of caution",
+]
+
+# Assertions of certainty or remediation that need backing evidence
+CLAIM_TERMS = [
+    "fixed",
+    "resolved",
+    "fully resolved",
+    "restored",
+    "fully restored",
+    "no data",
+    "no customer data",
+    "no personal data",
+    "no impact",
+    "zero impact",
+    "never happen again",
+    "will not happen again",
+    "guarantee",
+    "guaranteed",
+    "fully compliant",
+    "compliant",
+    "certified",
+    "audited",
+    "encrypted",
+    "soc 2",
+    "iso 27001",
+    "refunded",
+    "all affected",
+    "every affected",
+]
+
+SCAPEGOAT_TERMS = {
+    "vendor_outage": [
+        "third-party vendor",
+        "third party vendor",
+        "third-party provider",
+        "third party provider",
+        "upstream provider",
+        "cloud provider",
+        "our vendor",
+    ],
+    "legacy_system": ["legacy system", "legacy systems", "legacy code", "legacy infrastructure"],
+    "industry_wide": ["industry-wide", "across the industry", "industry wide"],
+    "unexpected_dependency": ["unexpected dependency", "external dependency"],
+    "weather": ["weather", "storm", "act of god", "natural disaster"],
+    "unknown_root_cause": ["unknown root cause", "root cause is unknown", "root cause remains"],
+}
+
+SEVERITY_WEIGHT = {Severity.LOW: 0.2, Severity.MEDIUM: 0.5, Severity.HIGH: 0.8}
+
+# Words that never make a claim specific enough to check against evidence
+STOPWORDS = frozenset(
+    "a all an and are as at be been by completely every for from fully has have in is it no "
+    "not of on our the this to was we were will with".split()
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_SUFFIXES = ("ing", "ed", "es", "e", "s")
+
+
+def _stem(word: str) -> str:
+    """Strip one common suffix so "fix", "fixed" and "fixes" compare equal"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def _stems(text: str) -> frozenset[str]:
+    """Content-word stems of a text"""
+    return frozenset(_stem(w) for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS)
+
+
+def _supported(claims: list[str], evidence: list[frozenset[str]]) -> bool:
+    """Whether some evidence item mentions every term of each claim in a sentence"""
+    return all(any(_stems(claim) <= stems for stems in evidence) for claim in claims)
+
+
+# Category of every detector term; a term listed twice keeps its first category
+TERM_CATEGORIES: dict[str, str] = {}
+for _category, _terms in [
+    ("non_apology", NON_APOLOGY_TERMS),
+    ("explicit", EXPLICIT_OWNERSHIP_TERMS),
+    ("partial", PARTIAL_OWNERSHIP_TERMS),
+    ("apology", APOLOGY_TERMS),
+    ("hedge", HEDGE_TERMS),
+    ("claim", CLAIM_TERMS),
+    *((f"scapegoat_{kind}", terms) for kind, terms in SCAPEGOAT_TERMS.items()),
+]:
+    for _term in _terms:
+        TERM_CATEGORIES.setdefault(normalize_term(_term), _category)
+
+# All terms share one trie (see app.moderation), so the drafts are read once
+# however many detectors there are. Terms are lowercase and the scan runs on
+# lowercased text, which is about twice as fast as matching case-insensitively.
+TERMS_RE = compile_terms(list(TERM_CATEGORIES))
+LOWER_TERMS_RE = re.compile(TERMS_RE.pattern)
+PERCENT_RE = re.compile(r"\d+(?:\.\d+)?\s?%")
+SENTENCE_END_RE = re.compile(r"[.!?]+(?=\s|$)|\n")
+
+
+@dataclass
+class DraftFeatures:
+    """Lexical counts across a set of drafts"""
+
+    words: int = 0
+    sentences: int = 0
+    hedges: int = 0
+    non_apology_phrases: int = 0
+    explicit_ownership: int = 0
+    partial_ownership: int = 0
+    apologies: int = 0
+    scapegoats: list[str] = field(default_factory=list)
+    unverifiable_claims: list[str] = field(default_factory=list)
+
+    @property
+    def hedge_density(self) -> float:
+        """Hedge phrases per sentence"""
+        return self.hedges / self.sentences if self.sentences else 0.0
+
+    @property
+    def words_per_sentence(self) -> float:
+        """Mean sentence length in words"""
+        return self.words / self.sentences if self.sentences else 0.0
+
+
+def _clamp(value: float) -> float:
+    return round(min(1.0, max(0.0, value)), 2)
+
+
+class AnalysisEngine:
+    """Compute metrics and detector flags from a request and its drafts"""
+
+    def scan(self, texts: list[str], evidence: list[str]) -> DraftFeatures:
+        """Count detector phrases across texts in one pass
+
+        Args:
+            texts: Draft texts, scanned together
+            evidence: Incident evidence; claims whose terms it mentions are
+                not reported as unverifiable
+        """
+        text = "\n".join(texts)
+        evidence_stems = [_stems(item) for item in evidence]
+        features = DraftFeatures(words=len(text.split()))
+        counts = {"hedge": 0, "non_apology": 0, "explicit": 0, "partial": 0, "apology": 0}
+
+        # Sentence spans, by end offset
+        ends = [match.end() for match in SENTENCE_END_RE.finditer(text)]
+        if not ends or ends[-1] < len(text):
+            ends.append(len(text))
+        starts = [0, *ends[:-1]]
+
+        lowered = text.lower()
+        # A few characters change length when lowercased; offsets must line up
+        pattern = LOWER_TERMS_RE if len(lowered) == len(text) else TERMS_RE
+        scanned = lowered if pattern is LOWER_TERMS_RE else text
+
+        claims: dict[int, list[str]] = {}
+        for match in pattern.finditer(scanned):
+            kind = TERM_CATEGORIES[normalize_term(match.group())]
+            if kind == "claim":
+                claims.setdefault(bisect_right(ends, match.start()), []).append(match.group())
+            elif kind.startswith("scapegoat_"):
+                features.scapegoats.append(kind.removeprefix("scapegoat_"))
+            else:
+                counts[kind] += 1
+        if "%" in text:
+            for match in PERCENT_RE.finditer(text):
+                claims.setdefault(bisect_right(ends, match.start()), []).append(match.group())
+
+        for index, (start, end) in enumerate(zip(starts, ends)):
+            sentence = text[start:end].strip()
+            if not sentence:
+                continue
+            features.sentences += 1
+            if index in claims and not _supported(claims[index], evidence_stems):
+                features.unverifiable_claims.append(sentence)
+
+        features.hedges = counts["hedge"]
+        features.non_apology_phrases = counts["non_apology"]
+        features.explicit_ownership = counts["explicit"]
+        features.partial_ownership = counts["partial"]
+        features.apologies = counts["apology"]
+        features.unverifiable_claims = list(dict.fromkeys(features.unverifiable_claims))
+        return features
+
+    def analyze(
+        self, request: GenerateRequest, drafts: Mapping[str, ChannelDraft]
+    ) -> tuple[Metrics, Detectors]:
+        """Score the drafts for a normalized request
+
+        Only the useful variants are scanned: pointless variants are
+        non-apologies by design and would flag every response.
+
+        Args:
+            request: Generation request, already clamped and validated
+            drafts: Drafts by channel, all scanned in one batch
+
+        Returns:
+            Metrics and detector flags
+        """
+        features = self.scan([draft.useful for draft in drafts.values()], request.incident.evidence)
+        return self._metrics(request, features), self._detectors(request, features)
+
+    def _detectors(self, request: GenerateRequest, features: DraftFeatures) -> Detectors:
+        """Non-apology, scapegoat and unverifiable-claim flags"""
+        owned = features.explicit_ownership + features.partial_ownership > 0
+        non_apology = (
+            (features.non_apology_phrases > 0 and not owned)
+            or (request.sliders.contrition >= 60 and not features.explicit_ownership)
+            or not (owned or features.apologies)
+        )
+
+        scapegoat = request.strategy.scapegoat
+        if scapegoat.type and scapegoat.intensity:
+            scapegoat_flag = scapegoat.type.value
+        else:
+            scapegoat_flag = features.scapegoats[0] if features.scapegoats else "none"
+
+        return Detectors(
+            non_apology=non_apology,
+            scapegoat_flag=scapegoat_flag,
+            unverifiable_claims=features.unverifiable_claims,
+        )
+
+    def _metrics(self, request: GenerateRequest, features: DraftFeatures) -> Metrics:
+        """Risk and quality scores from severity, sliders and draft features"""
+        s = request.sliders
+        severity = SEVERITY_WEIGHT[request.incident.severity]
+        contrition, memes = s.contrition / 100, s.memes / 100
+        evasion, fog = s.accountability_evasion / 100, s.data_fog / 100
+        scapegoat = request.strategy.scapegoat.intensity / 100
+
+        hedging = min(1.0, features.hedge_density)
+        if features.explicit_ownership:
+            ownership = 1.0
+        elif features.partial_ownership or features.apologies:
+            ownership = 0.5
+        else:
+            ownership = 0.0
+        non_apology = 1.0 if features.non_apology_phrases and ownership < 1 else 0.0
+        claims = min(3, len(features.unverifiable_claims)) / 3
+        rambling = min(1.0, max(0.0, features.words_per_sentence - 20) / 20)
+
+        return Metrics(
+            pr_risk=_clamp(
+                0.1
+                + 0.5 * severity
+                + 0.3 * memes
+                + 0.3 * evasion
+                + 0.2 * non_apology
+                + 0.1 * claims
+                - 0.2 * ownership
+            ),
+            legal_risk=_clamp(
+                0.1
+                + 0.4 * severity
+                + 0.2 * ownership * (1 - hedging)
+                + 0.2 * s.risk_transfer / 100
+                + 0.2 * claims
+                - 0.2 * hedging
+            ),
+            ethics_score=_clamp(
+                1
+                - 0.4 * evasion
+                - 0.3 * fog
+                - 0.2 * s.pseudo_transparency / 100
+                - 0.2 * scapegoat
+                - 0.1 * s.profit_alchemist / 100
+                - 0.1 * claims
+            ),
+            clarity_score=_clamp(1 - 0.35 * hedging - 0.4 * fog - 0.15 * memes - 0.2 * rambling),
+            sincerity_score=_clamp(
+                0.2
+                + 0.3 * contrition
+                + 0.4 * ownership
+                - 0.3 * non_apology
+                - 0.3 * memes
+                - 0.3 * evasion
+            ),
+        )
+
+
+# Singleton instance
+analysis_engine = AnalysisEngine()
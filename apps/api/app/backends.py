@@ -0,0 +1,300 @@
+"""Pool of OpenAI-compatible LLM backends with failover and hedged requests"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any
+
+from .config import settings
+from .metrics import record_upstream_error
+from .resilience import is_overload
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, AsyncStream
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# Latency samples kept per backend for percentiles
+LATENCY_WINDOW = 200
+# Samples needed before the observed p90 replaces the configured hedge delay
+MIN_HEDGE_SAMPLES = 20
+# Consecutive failures that take a backend out of rotation for the cooldown
+FAILURE_THRESHOLD = 3
+# Smoothing for the error rate and latency averages
+EWMA_ALPHA = 0.2
+# Assumed latency (s) for a backend with no successful calls yet
+DEFAULT_LATENCY = 1.0
+
+
+class EmptyResponseError(ValueError):
+    """A backend answered without any completion content"""
+
+
+def should_fail_over(error: BaseException) -> bool:
+    """Whether another backend might succeed where this one failed
+
+    Connection errors, timeouts, 429s, 5xx and empty responses fail over.
+    Any other error (a 400, bad credentials, a content filter refusal) is
+    about the request, so it would fail the same way everywhere.
+    """
+    return is_overload(error) or isinstance(error, EmptyResponseError)
+
+
+class Backend:
+    """One OpenAI-compatible endpoint, its model and its observed health"""
+
+    def __init__(self, name: str, client: "AsyncOpenAI", model: str, weight: float = 1.0) -> None:
+        self.name = name
+        self.client = client
+        self.model = model
+        self.weight = weight
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.latency_ewma: float | None = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.latency_ewma = (
+            latency
+            if self.latency_ewma is None
+            else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency_ewma
+        )
+        self.error_rate *= 1 - EWMA_ALPHA
+        self.consecutive_failures = 0
+
+    def record_failure(self, cooldown: float) -> None:
+        self.errors += 1
+        self.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_rate
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= FAILURE_THRESHOLD:
+            self.down_until = time.monotonic() + cooldown
+
+    def available(self, now: float) -> bool:
+        """Whether the backend is outside its failure cooldown"""
+        return now >= self.down_until
+
+    def score(self) -> float:
+        """Routing weight: configured weight, discounted by errors and latency"""
+        latency = self.latency_ewma if self.latency_ewma is not None else DEFAULT_LATENCY
+        return self.weight * (1 - self.error_rate) / max(latency, 0.01)
+
+    def percentile(self, pct: float) -> float | None:
+        """Latency percentile in seconds, or None until enough samples exist"""
+        if len(self.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def stats(self) -> dict[str, Any]:
+        p50, p90 = self.percentile(50), self.percentile(90)
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p90_ms": round(p90 * 1000, 1) if p90 is not None else None,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "available": self.available(time.monotonic()),
+            "score": round(self.score(), 3),
+        }
+
+
+class BackendPool:
+    """Route completions across backends by health, failing over on errors
+
+    Each call picks a primary by weighted random choice over the healthy
+    backends' scores, then falls back through the rest. With hedging on, a
+    second backend is also tried once the primary has been slower than its
+    observed p90 (or ``hedge_delay`` until it has enough samples); the first
+    valid response wins and the other call is cancelled.
+    """
+
+    def __init__(
+        self,
+        backends: list[Backend],
+        hedge: bool = False,
+        hedge_delay: float = 2.0,
+        cooldown: float = 30.0,
+    ) -> None:
+        if not backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.backends = backends
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.cooldown = cooldown
+
+    @classmethod
+    def from_settings(cls) -> "BackendPool":
+        """Build the pool from LLM_BACKENDS, or a single OpenAI backend"""
+        # Deferred: the SDK is slow to import and only needed once clients exist
+        from openai import AsyncOpenAI
+
+        # Retrying inside the SDK would hide errors from failover, hedging and
+        # the upstream guard, so each attempt gets one try and a bounded wait
+        client_options: dict[str, Any] = {
+            "max_retries": 0,
+            "timeout": settings.llm_request_timeout_seconds,
+        }
+        backends = [
+            Backend(
+                name=config.name,
+                client=AsyncOpenAI(
+                    api_key=config.api_key or settings.openai_api_key,
+                    base_url=config.base_url,
+                    **client_options,
+                ),
+                model=config.model or settings.openai_model,
+                weight=config.weight,
+            )
+            for config in settings.llm_backends
+        ] or [
+            Backend(
+                name="openai",
+                client=AsyncOpenAI(api_key=settings.openai_api_key, **client_options),
+                model=settings.openai_model,
+            )
+        ]
+        return cls(
+            backends,
+            hedge=settings.llm_hedge,
+            hedge_delay=settings.llm_hedge_delay_seconds,
+            cooldown=settings.llm_backend_cooldown_seconds,
+        )
+
+    def _candidates(self) -> list[Backend]:
+        """Backends in the order to try them, healthiest most likely first"""
+        now = time.monotonic()
+        healthy = [b for b in self.backends if b.available(now)]
+        if not healthy:
+            # Everything is cooling down: try the one that went down first
+            return sorted(self.backends, key=lambda b: b.down_until)
+
+        # Weighted shuffle (Efraimidis-Spirakis): sort by u ** (1 / score)
+        def key(backend: Backend) -> float:
+            score = backend.score()
+            return float(random.random() ** (1 / score)) if score > 0 else 0.0
+
+        return sorted(healthy, key=key, reverse=True)
+
+    async def complete(self, **kwargs: Any) -> "ChatCompletion":
+        """Create a chat completion, failing over (and hedging) across backends
+
+        Args:
+            **kwargs: ``chat.completions.create`` arguments, minus ``model``
+
+        Returns:
+            The first valid completion
+        """
+        candidates = self._candidates()
+        error: Exception | None = None
+        while candidates:
+            primary = candidates.pop(0)
+            try:
+                if self.hedge and candidates:
+                    return await self._hedged(primary, candidates, kwargs)
+                return await self._call(primary, kwargs)
+            except Exception as e:
+                if not should_fail_over(e):
+                    raise
+                error = e
+
+        assert error is not None
+        raise error
+
+    async def _hedged(
+        self, primary: Backend, candidates: list[Backend], kwargs: dict[str, Any]
+    ) -> "ChatCompletion":
+        """Call the primary, hedging with the next candidate if it is slow"""
+        primary_task = asyncio.create_task(self._call(primary, kwargs))
+        tasks = {primary_task}
+        try:
+            delay = primary.percentile(90) or self.hedge_delay
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary_task.result()
+
+            hedge = candidates.pop(0)
+            primary.hedges += 1
+            hedge_task = asyncio.create_task(self._call(hedge, kwargs))
+            tasks.add(hedge_task)
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is hedge_task:
+                            hedge.hedge_wins += 1
+                        return task.result()
+                    if not should_fail_over(error):
+                        # The other backend would reject the request too
+                        return task.result()
+
+            # Both failed; the caller fails over to the remaining candidates
+            return primary_task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call(self, backend: Backend, kwargs: dict[str, Any]) -> "ChatCompletion":
+        """One completion against one backend, recording its health"""
+        backend.requests += 1
+        start = time.perf_counter()
+        try:
+            response: "ChatCompletion" = await backend.client.chat.completions.create(
+                model=backend.model, **kwargs
+            )
+            if not response.choices or not response.choices[0].message.content:
+                raise EmptyResponseError("Empty response from LLM")
+        except asyncio.CancelledError:
+            # Lost a hedge race; not the backend's fault
+            raise
+        except Exception as e:
+            record_upstream_error(backend.name, e)
+            if should_fail_over(e):
+                backend.record_failure(self.cooldown)
+            raise
+
+        backend.record_success(time.perf_counter() - start)
+        return response
+
+    async def stream(self, **kwargs: Any) -> "AsyncStream[ChatCompletionChunk]":
+        """Open a streamed chat completion, failing over until one connects
+
+        Streams are not hedged; the latency recorded is time to response headers.
+        """
+        error: Exception | None = None
+        for backend in self._candidates():
+            backend.requests += 1
+            start = time.perf_counter()
+            try:
+                stream: "AsyncStream[ChatCompletionChunk]" = (
+                    await backend.client.chat.completions.create(
+                        model=backend.model, stream=True, **kwargs
+                    )
+                )
+            except Exception as e:
+                record_upstream_error(backend.name, e)
+                if not should_fail_over(e):
+                    raise
+                backend.record_failure(self.cooldown)
+                error = e
+                continue
+            backend.record_success(time.perf_counter() - start)
+            return stream
+
+        assert error is not None
+        raise error
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Per-backend latency, error and hedge metrics"""
+        return {backend.name: backend.stats() for backend in self.backends}
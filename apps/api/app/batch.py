@@ -0,0 +1,64 @@
+"""Batch generation with bounded concurrency and per-item results"""
+
+import asyncio
+from collections.abc import AsyncIterator
+
+from .config import settings
+from .llm_engine import llm_engine
+from .models import BatchItemResult, GenerateRequest
+
+
+async def run_batch(
+    items: list[GenerateRequest],
+    concurrency: int | None = None,
+    item_timeout: float | None = None,
+    use_cache: bool = True,
+) -> AsyncIterator[BatchItemResult]:
+    """Generate every item, yielding results in completion order
+
+    A failing or timed-out item produces an error result and never fails the
+    rest of the batch.
+
+    Args:
+        items: Generate requests
+        concurrency: Max items in flight; BATCH_CONCURRENCY is both the
+            default and the ceiling
+        item_timeout: Seconds per item, measured from when it starts running;
+            BATCH_ITEM_TIMEOUT_SECONDS is both the default and the ceiling
+        use_cache: Whether cached results may be served
+
+    Yields:
+        One BatchItemResult per item
+    """
+    # Clients may ask for less than the configured budget, never more
+    semaphore = asyncio.Semaphore(
+        min(concurrency or settings.batch_concurrency, settings.batch_concurrency)
+    )
+    timeout = min(
+        item_timeout or settings.batch_item_timeout_seconds, settings.batch_item_timeout_seconds
+    )
+
+    async def run_item(index: int, item: GenerateRequest) -> BatchItemResult:
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(
+                    llm_engine.generate(item, use_cache=use_cache), timeout
+                )
+                return BatchItemResult(index=index, status="ok", result=result)
+            except asyncio.TimeoutError:
+                return BatchItemResult(
+                    index=index, status="error", error=f"Timed out after {timeout}s"
+                )
+            except Exception as e:
+                return BatchItemResult(
+                    index=index, status="error", error=f"Generation failed: {str(e)}"
+                )
+
+    tasks = [asyncio.create_task(run_item(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client disconnects close the generator early; stop outstanding work
+        for task in tasks:
+            task.cancel()
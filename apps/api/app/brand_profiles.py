@@ -0,0 +1,462 @@
+"""Server-side brand profiles with precompiled prompt fragments
+
+Profiles are stored as immutable versions and referenced from generate
+requests by ``brand_profile_id`` (and optionally ``brand_profile_version``).
+Each version's prompt fragment is compiled once and cached in-process and in
+Redis under ``brand_profile:<id>:<version>``; a version never changes, so
+those entries need no invalidation.
+
+A profile's current version is its ETag. It is kept in Redis under
+``brand_profile:<id>`` and replaced on every update, and each worker holds
+on to it for ``BRAND_PROFILE_ETAG_TTL_SECONDS``, so updates reach every
+worker within that time.
+"""
+
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+from collections.abc import Collection
+from typing import Protocol
+
+import redis.asyncio as redis
+
+from .config import settings
+from .metrics import stage
+from .models import BrandProfile, BrandProfileRecord, CompiledBrandProfile, GenerateRequest
+from .prompt_encoder import brand_fragment
+
+
+class BrandProfileNotFoundError(LookupError):
+    """No stored brand profile (or version) with the given ID"""
+
+
+class BrandProfileConflictError(Exception):
+    """The profile changed since the version the client last saw"""
+
+
+def etag(version: int) -> str:
+    """ETag header value for a profile version"""
+    return f'"{version}"'
+
+
+def parse_etags(header: str) -> set[int]:
+    """Versions listed in an If-Match/If-None-Match header (weak or strong)"""
+    versions = set()
+    for tag in header.split(","):
+        value = tag.strip().removeprefix("W/").strip('"')
+        if value.isdigit():
+            versions.add(int(value))
+    return versions
+
+
+def compile_profile(record: BrandProfileRecord) -> CompiledBrandProfile:
+    """Render a profile version's prompt fragment"""
+    return CompiledBrandProfile(
+        id=record.id,
+        version=record.version,
+        profile=record.profile,
+        fragment=brand_fragment(record.profile),
+    )
+
+
+class BrandProfileStore(Protocol):
+    """Versioned brand profile storage"""
+
+    async def get(self, profile_id: str, version: int | None = None) -> BrandProfileRecord | None:
+        """Return a version of a profile, the latest if ``version`` is None"""
+        ...
+
+    async def save(
+        self, profile_id: str, profile: BrandProfile, expected_version: int
+    ) -> BrandProfileRecord:
+        """Store the version after ``expected_version`` (0 creates the profile)
+
+        Raises:
+            BrandProfileConflictError: The latest version isn't ``expected_version``
+        """
+        ...
+
+    async def delete(self, profile_id: str) -> int | None:
+        """Delete every version; returns the latest one, or None if there were none"""
+        ...
+
+
+class InMemoryBrandProfileStore:
+    """In-process store for tests and single-node setups"""
+
+    def __init__(self) -> None:
+        self._versions: dict[str, list[BrandProfile]] = {}
+
+    async def get(self, profile_id: str, version: int | None = None) -> BrandProfileRecord | None:
+        """Look up a version"""
+        versions = self._versions.get(profile_id, [])
+        if version is None:
+            version = len(versions)
+        if not 1 <= version <= len(versions):
+            return None
+        return BrandProfileRecord(id=profile_id, version=version, profile=versions[version - 1])
+
+    async def save(
+        self, profile_id: str, profile: BrandProfile, expected_version: int
+    ) -> BrandProfileRecord:
+        """Append a version"""
+        versions = self._versions.setdefault(profile_id, [])
+        if len(versions) != expected_version:
+            raise BrandProfileConflictError(f"Brand profile {profile_id} has changed")
+        versions.append(profile.model_copy(deep=True))
+        return BrandProfileRecord(id=profile_id, version=len(versions), profile=versions[-1])
+
+    async def delete(self, profile_id: str) -> int | None:
+        """Drop all versions"""
+        versions = self._versions.pop(profile_id, None)
+        return len(versions) if versions else None
+
+
+class PgBrandProfileStore:
+    """Postgres-backed store, one row per profile version
+
+    SQLAlchemy is imported on construction, which the registry defers to
+    first use, so it stays off the import path.
+    """
+
+    def __init__(self) -> None:
+        from sqlalchemy import Column, DateTime, Integer, String, Table, Text, func
+
+        from .db import metadata
+
+        self.table = Table(
+            "brand_profiles",
+            metadata,
+            Column("profile_id", String(64), primary_key=True),
+            Column("version", Integer, primary_key=True),
+            Column("profile", Text, nullable=False),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            extend_existing=True,
+        )
+        self._ready = False
+
+    def _ensure_schema(self) -> None:
+        """Create the table on first use"""
+        if self._ready:
+            return
+
+        from .db import get_engine
+
+        with get_engine().begin() as conn:
+            self.table.create(conn, checkfirst=True)
+        self._ready = True
+
+    def _get_sync(self, profile_id: str, version: int | None) -> BrandProfileRecord | None:
+        from sqlalchemy import select
+
+        from .db import get_engine
+
+        self._ensure_schema()
+        query = select(self.table.c.version, self.table.c.profile).where(
+            self.table.c.profile_id == profile_id
+        )
+        if version is None:
+            query = query.order_by(self.table.c.version.desc()).limit(1)
+        else:
+            query = query.where(self.table.c.version == version)
+        with get_engine().connect() as conn:
+            row = conn.execute(query).first()
+        if row is None:
+            return None
+        return BrandProfileRecord(
+            id=profile_id,
+            version=row.version,
+            profile=BrandProfile.model_validate_json(row.profile),
+        )
+
+    def _save_sync(
+        self, profile_id: str, profile: BrandProfile, expected_version: int
+    ) -> BrandProfileRecord:
+        from sqlalchemy import func, select
+        from sqlalchemy.exc import IntegrityError
+
+        from .db import get_engine
+
+        self._ensure_schema()
+        latest = select(func.coalesce(func.max(self.table.c.version), 0)).where(
+            self.table.c.profile_id == profile_id
+        )
+        try:
+            with get_engine().begin() as conn:
+                if conn.execute(latest).scalar_one() != expected_version:
+                    raise BrandProfileConflictError(f"Brand profile {profile_id} has changed")
+                conn.execute(
+                    self.table.insert().values(
+                        profile_id=profile_id,
+                        version=expected_version + 1,
+                        profile=profile.model_dump_json(),
+                    )
+                )
+        except IntegrityError:
+            # A concurrent save took the same version
+            raise BrandProfileConflictError(f"Brand profile {profile_id} has changed")
+        return BrandProfileRecord(id=profile_id, version=expected_version + 1, profile=profile)
+
+    def _delete_sync(self, profile_id: str) -> int | None:
+        from sqlalchemy import func, select
+
+        from .db import get_engine
+
+        self._ensure_schema()
+        with get_engine().begin() as conn:
+            latest: int | None = conn.execute(
+                select(func.max(self.table.c.version)).where(self.table.c.profile_id == profile_id)
+            ).scalar_one()
+            conn.execute(self.table.delete().where(self.table.c.profile_id == profile_id))
+        return latest
+
+    async def get(self, profile_id: str, version: int | None = None) -> BrandProfileRecord | None:
+        """Query a version off the event loop"""
+        return await asyncio.to_thread(self._get_sync, profile_id, version)
+
+    async def save(
+        self, profile_id: str, profile: BrandProfile, expected_version: int
+    ) -> BrandProfileRecord:
+        """Insert a version off the event loop"""
+        return await asyncio.to_thread(self._save_sync, profile_id, profile, expected_version)
+
+    async def delete(self, profile_id: str) -> int | None:
+        """Delete all versions off the event loop"""
+        return await asyncio.to_thread(self._delete_sync, profile_id)
+
+
+class BrandProfileRegistry:
+    """Stored brand profiles, compiled once per version and cached in two tiers"""
+
+    def __init__(self, store: BrandProfileStore | None = None) -> None:
+        self.redis_client: redis.Redis | None = None
+        self._store = store
+        self.ttl = settings.brand_profile_cache_ttl_seconds
+        self.etag_ttl = settings.brand_profile_etag_ttl_seconds
+        self.max_entries = settings.brand_profile_cache_max_entries
+        self._compiled: OrderedDict[
+            tuple[str, int], tuple[float, CompiledBrandProfile]
+        ] = OrderedDict()
+        self._etags: dict[str, tuple[float, int]] = {}
+        self.hits_local = 0
+        self.hits_redis = 0
+        self.misses = 0
+
+    @property
+    def store(self) -> BrandProfileStore:
+        """Get or create the configured store"""
+        if self._store is None:
+            store: BrandProfileStore
+            if settings.brand_profile_store == "memory":
+                store = InMemoryBrandProfileStore()
+            else:
+                store = PgBrandProfileStore()
+            self._store = store
+        return self._store
+
+    async def _get_client(self) -> redis.Redis:
+        """Get or create Redis client"""
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+        return self.redis_client
+
+    def _get_local(self, profile_id: str, version: int) -> CompiledBrandProfile | None:
+        """Look up a compiled version in-process, dropping it if expired"""
+        key = (profile_id, version)
+        entry = self._compiled.get(key)
+        if entry is None:
+            return None
+
+        expires_at, compiled = entry
+        if expires_at <= time.monotonic():
+            del self._compiled[key]
+            return None
+
+        self._compiled.move_to_end(key)
+        return compiled
+
+    def _set_local(self, compiled: CompiledBrandProfile) -> None:
+        """Keep a compiled version in-process, evicting least recently used ones"""
+        key = (compiled.id, compiled.version)
+        self._compiled[key] = (time.monotonic() + self.ttl, compiled)
+        self._compiled.move_to_end(key)
+        while len(self._compiled) > self.max_entries:
+            self._compiled.popitem(last=False)
+
+    async def current_version(self, profile_id: str) -> int | None:
+        """Current version (ETag) of a profile, or None if it doesn't exist"""
+        entry = self._etags.get(profile_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        version: int | None = None
+        try:
+            client = await self._get_client()
+            value = await client.get(f"brand_profile:{profile_id}")
+            version = int(value) if value else None
+        except Exception:
+            # If Redis is down, ask the store
+            pass
+
+        if version is None:
+            record = await self.store.get(profile_id)
+            if record is None:
+                return None
+            version = record.version
+            self._set_local(compile_profile(record))
+            try:
+                client = await self._get_client()
+                # Don't overwrite the ETag of an update that landed meanwhile
+                await client.set(f"brand_profile:{profile_id}", version, ex=self.ttl, nx=True)
+            except Exception:
+                pass
+
+        self._etags[profile_id] = (time.monotonic() + self.etag_ttl, version)
+        return version
+
+    async def get(self, profile_id: str, version: int | None = None) -> CompiledBrandProfile:
+        """Get a compiled profile version, the current one if ``version`` is None
+
+        Raises:
+            BrandProfileNotFoundError: No such profile or version
+        """
+        if version is None:
+            version = await self.current_version(profile_id)
+            if version is None:
+                raise BrandProfileNotFoundError(f"Brand profile {profile_id} not found")
+
+        compiled = self._get_local(profile_id, version)
+        if compiled is not None:
+            self.hits_local += 1
+            return compiled
+
+        key = f"brand_profile:{profile_id}:{version}"
+        try:
+            client = await self._get_client()
+            value = await client.get(key)
+            if value is not None:
+                compiled = CompiledBrandProfile.model_validate_json(value)
+                self._set_local(compiled)
+                self.hits_redis += 1
+                return compiled
+        except Exception:
+            # If Redis is down, compile from the store
+            pass
+
+        self.misses += 1
+        record = await self.store.get(profile_id, version)
+        if record is None:
+            raise BrandProfileNotFoundError(f"Brand profile {profile_id} v{version} not found")
+        compiled = compile_profile(record)
+        self._set_local(compiled)
+        try:
+            client = await self._get_client()
+            await client.set(key, compiled.model_dump_json(), ex=self.ttl)
+        except Exception:
+            pass
+        return compiled
+
+    async def resolve(self, request: GenerateRequest) -> None:
+        """Attach the stored profile a generate request refers to, if any
+
+        Raises:
+            BrandProfileNotFoundError: The referenced profile doesn't exist
+        """
+        if request.brand_profile_id is None or request.stored_brand_profile is not None:
+            return
+
+        with stage("brand_profile"):
+            compiled = await self.get(request.brand_profile_id, request.brand_profile_version)
+        request.attach_brand_profile(compiled)
+
+    async def _publish(self, record: BrandProfileRecord) -> CompiledBrandProfile:
+        """Compile a new version and make it the profile's current ETag"""
+        compiled = compile_profile(record)
+        self._set_local(compiled)
+        self._etags[record.id] = (time.monotonic() + self.etag_ttl, record.version)
+        try:
+            client = await self._get_client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(
+                    f"brand_profile:{record.id}:{record.version}",
+                    compiled.model_dump_json(),
+                    ex=self.ttl,
+                )
+                pipe.set(f"brand_profile:{record.id}", record.version, ex=self.ttl)
+                await pipe.execute()
+        except Exception:
+            # Other workers pick the update up from the store once their ETag expires
+            pass
+        return compiled
+
+    async def create(self, profile: BrandProfile) -> CompiledBrandProfile:
+        """Store a new profile under a generated ID as version 1"""
+        record = await self.store.save(secrets.token_urlsafe(12), profile, expected_version=0)
+        return await self._publish(record)
+
+    async def update(
+        self, profile_id: str, profile: BrandProfile, if_match: Collection[int] | None = None
+    ) -> CompiledBrandProfile:
+        """Store a new version of a profile
+
+        Args:
+            profile_id: Profile to update
+            profile: New contents
+            if_match: Versions the client expects to replace (If-Match);
+                None to replace whatever is current
+
+        Raises:
+            BrandProfileNotFoundError: No such profile
+            BrandProfileConflictError: The current version isn't in ``if_match``
+                or a concurrent update won
+        """
+        current = await self.store.get(profile_id)
+        if current is None:
+            raise BrandProfileNotFoundError(f"Brand profile {profile_id} not found")
+        if if_match is not None and current.version not in if_match:
+            raise BrandProfileConflictError(f"Brand profile {profile_id} has changed")
+
+        record = await self.store.save(profile_id, profile, expected_version=current.version)
+        return await self._publish(record)
+
+    async def delete(self, profile_id: str) -> bool:
+        """Delete every version of a profile; returns False if it didn't exist
+
+        Versions already cached by other workers stay usable there until
+        their ETag (unpinned) or cache entry (pinned version) expires.
+        """
+        latest = await self.store.delete(profile_id)
+        if latest is None:
+            return False
+
+        self._etags.pop(profile_id, None)
+        for version in range(1, latest + 1):
+            self._compiled.pop((profile_id, version), None)
+        try:
+            client = await self._get_client()
+            await client.delete(
+                f"brand_profile:{profile_id}",
+                *(f"brand_profile:{profile_id}:{version}" for version in range(1, latest + 1)),
+            )
+        except Exception:
+            pass
+        return True
+
+    def stats(self) -> dict[str, int]:
+        """Return compiled-version cache counters"""
+        return {
+            "hits_local": self.hits_local,
+            "hits_redis": self.hits_redis,
+            "misses": self.misses,
+            "local_entries": len(self._compiled),
+        }
+
+    async def close(self) -> None:
+        """Close Redis connection"""
+        if self.redis_client:
+            await self.redis_client.close()
+
+
+# Singleton instance
+brand_profiles = BrandProfileRegistry()
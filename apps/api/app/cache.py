@@ -0,0 +1,149 @@
+"""Response caching for LLM generations"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+import redis.asyncio as redis
+from pydantic import BaseModel
+
+from .config import settings
+
+
+def cache_key(namespace: str, request: BaseModel) -> str:
+    """Build a canonical cache key for a normalized request
+
+    The request is dumped in JSON mode with sorted keys and no whitespace, so
+    two requests that validate to the same model always hash identically.
+
+    Args:
+        namespace: Key prefix (e.g. operation and model name)
+        request: Normalized request model
+
+    Returns:
+        Cache key of the form ``<namespace>:<sha256>``
+    """
+    canonical = json.dumps(
+        request.model_dump(mode="json"), sort_keys=True, separators=(",", ":")
+    )
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class ResponseCache:
+    """Two-tier response cache: in-process LRU backed by Redis"""
+
+    def __init__(self) -> None:
+        self.redis_client: redis.Redis | None = None
+        self.enabled = settings.cache_enabled
+        self.ttl = settings.cache_ttl_seconds
+        self.max_entries = settings.cache_max_entries
+        self._local: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.hits_local = 0
+        self.hits_redis = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def _get_client(self) -> redis.Redis:
+        """Get or create Redis client"""
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+        return self.redis_client
+
+    def _get_local(self, key: str) -> str | None:
+        """Look up a key in the in-process tier, dropping it if expired"""
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._local[key]
+            return None
+
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: str, ttl: int) -> None:
+        """Insert into the in-process tier, evicting least recently used entries"""
+        self._local[key] = (time.monotonic() + ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> str | None:
+        """Get a cached payload
+
+        Args:
+            key: Cache key from ``cache_key``
+
+        Returns:
+            Cached payload, or None on miss
+        """
+        if not self.enabled:
+            return None
+
+        value = self._get_local(key)
+        if value is not None:
+            self.hits_local += 1
+            return value
+
+        try:
+            client = await self._get_client()
+            value = await client.get(f"cache:{key}")
+            if value is not None:
+                # Promote to the local tier for the remaining Redis TTL
+                ttl = await client.ttl(f"cache:{key}")
+                self._set_local(key, value, ttl if ttl > 0 else self.ttl)
+                self.hits_redis += 1
+                return value
+        except Exception:
+            # If Redis is down, fall back to the local tier only
+            pass
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        """Store a payload in both tiers
+
+        Args:
+            key: Cache key from ``cache_key``
+            value: Serialized payload
+        """
+        if not self.enabled:
+            return
+
+        self._set_local(key, value, self.ttl)
+
+        try:
+            client = await self._get_client()
+            await client.set(f"cache:{key}", value, ex=self.ttl)
+        except Exception:
+            # If Redis is down, keep the local entry only
+            pass
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and current local size"""
+        return {
+            "hits_local": self.hits_local,
+            "hits_redis": self.hits_redis,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "local_entries": len(self._local),
+        }
+
+    def clear_local(self) -> None:
+        """Drop all entries from the in-process tier"""
+        self._local.clear()
+
+    async def close(self) -> None:
+        """Close Redis connection"""
+        if self.redis_client:
+            await self.redis_client.close()
+
+
+# Singleton instance
+response_cache = ResponseCache()
@@ -0,0 +1,116 @@
+"""Channel length rules, output token budgets and local draft validation"""
+
+import re
+from dataclasses import dataclass
+
+from .models import Channel
+
+_SENTENCE_END_RE = re.compile(r"[.!?]+(?=\s|$)")
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+
+# Output tokens for the JSON structure around the drafts
+RESPONSE_OVERHEAD_TOKENS = 100
+
+
+@dataclass(frozen=True)
+class ChannelSpec:
+    """Length rules for one channel
+
+    ``rule`` is the instruction given to the model; the numeric limits are
+    what we check locally, with some slack where the rule is approximate.
+    ``variant_tokens`` caps the output tokens of one variant.
+    """
+
+    channel: Channel
+    rule: str
+    variant_tokens: int
+    max_chars: int | None = None
+    min_words: int | None = None
+    max_words: int | None = None
+    min_sentences: int | None = None
+    max_sentences: int | None = None
+    min_paragraphs: int | None = None
+    max_paragraphs: int | None = None
+
+    def violations(self, text: str) -> list[str]:
+        """Describe how a draft breaks this channel's length rules"""
+        problems = []
+        words = len(text.split())
+        sentences = len(_SENTENCE_END_RE.findall(text)) or (1 if text.strip() else 0)
+        paragraphs = len([p for p in _PARAGRAPH_BREAK_RE.split(text) if p.strip()])
+
+        if self.max_chars is not None and len(text) > self.max_chars:
+            problems.append(f"{len(text)} characters (max {self.max_chars})")
+        for name, count, low, high in (
+            ("words", words, self.min_words, self.max_words),
+            ("sentences", sentences, self.min_sentences, self.max_sentences),
+            ("paragraphs", paragraphs, self.min_paragraphs, self.max_paragraphs),
+        ):
+            if low is not None and count < low:
+                problems.append(f"{count} {name} (min {low})")
+            if high is not None and count > high:
+                problems.append(f"{count} {name} (max {high})")
+        return problems
+
+
+CHANNEL_SPECS: dict[Channel, ChannelSpec] = {
+    spec.channel: spec
+    for spec in (
+        ChannelSpec(
+            Channel.TWITTER,
+            rule="≤280 chars, crisp, ownership line if contrition ≥60",
+            variant_tokens=120,
+            max_chars=280,
+        ),
+        ChannelSpec(
+            Channel.LINKEDIN,
+            rule="2-5 sentences, professional, soft CTA",
+            variant_tokens=250,
+            min_sentences=2,
+            max_sentences=5,
+        ),
+        ChannelSpec(
+            Channel.PRESS_RELEASE,
+            rule="headline, lede, summary, bullets, quote, contact",
+            variant_tokens=800,
+            max_words=600,
+        ),
+        ChannelSpec(
+            Channel.CEO_LETTER,
+            rule="3-7 paragraphs, human, explicit responsibility if contrition ≥60",
+            variant_tokens=1000,
+            min_paragraphs=3,
+            max_paragraphs=7,
+        ),
+        ChannelSpec(
+            Channel.CUSTOMER_EMAIL,
+            rule="greeting, what happened, restitution, support, sign-off, ~120-200 words",
+            variant_tokens=400,
+            min_words=100,
+            max_words=240,
+        ),
+        ChannelSpec(
+            Channel.STATUS_PAGE,
+            rule="timeline, scope, root cause, remediation, next update",
+            variant_tokens=450,
+            max_words=350,
+        ),
+    )
+}
+
+
+def output_token_budget(channels: list[Channel]) -> int:
+    """Output token ceiling for a response covering ``channels``"""
+    return RESPONSE_OVERHEAD_TOKENS + sum(
+        2 * CHANNEL_SPECS[channel].variant_tokens for channel in channels
+    )
+
+
+def draft_violations(channel: Channel, draft: dict[str, object]) -> list[str]:
+    """Length rule violations across a channel draft's useful and pointless variants"""
+    spec = CHANNEL_SPECS[channel]
+    return [
+        f"{variant}: {problem}"
+        for variant in ("useful", "pointless")
+        for problem in spec.violations(str(draft.get(variant, "")))
+    ]
@@ -0,0 +1,26 @@
+"""Database access"""
+
+from sqlalchemy import Engine, MetaData, create_engine
+
+from .config import settings
+
+# Shared metadata for all tables
+metadata = MetaData()
+
+_engine: Engine | None = None
+
+
+def get_engine() -> Engine:
+    """Get or create the SQLAlchemy engine"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.database_url, pool_pre_ping=True)
+    return _engine
+
+
+def dispose_engine() -> None:
+    """Close all pooled database connections"""
+    global _engine
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
@@ -0,0 +1,264 @@
+"""Redis-backed asynchronous job queue for long generations"""
+
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any
+
+import redis.asyncio as redis
+
+from .config import settings
+from .models import JobStatus, JobSubmitRequest
+
+# Checked in order, so authed jobs are always taken first
+QUEUES = {"authed": "jobs:queue:authed", "anon": "jobs:queue:anon"}
+DELAYED = "jobs:delayed"
+# Job id -> time its worker's lease runs out
+LEASES = "jobs:leases"
+PROCESSING_PREFIX = "jobs:processing:"
+
+# Longest a dequeue blocks on the authed queue before rechecking the anon one
+POLL_SECONDS = 0.5
+# Seconds between scans for jobs whose worker died
+REAP_INTERVAL_SECONDS = 15.0
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class JobQueue:
+    """Submit, poll and process jobs stored in Redis
+
+    Each job is a JSON record under ``job:<id>``. Its id is pushed onto the
+    authed or anon queue; retries wait in a sorted set scored by due time.
+
+    Dequeuing moves the id into this worker's processing list and leases it
+    for JOB_VISIBILITY_TIMEOUT_SECONDS; finishing the job removes both. If a
+    worker dies mid-job, any worker's reaper puts the job back on its queue
+    once the lease has run out, so jobs are processed at least once.
+    """
+
+    def __init__(self, worker_id: str | None = None) -> None:
+        self.redis_client: redis.Redis | None = None
+        self.result_ttl = settings.job_result_ttl_seconds
+        self.max_attempts = settings.job_max_attempts
+        self.visibility_timeout = settings.job_visibility_timeout_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._next_reap = 0.0
+
+    @property
+    def processing_key(self) -> str:
+        """This worker's list of jobs in progress"""
+        return f"{PROCESSING_PREFIX}{self.worker_id}"
+
+    async def _get_client(self) -> redis.Redis:
+        """Get or create Redis client"""
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+        return self.redis_client
+
+    async def _save(self, record: dict[str, Any], ttl: int | None = None) -> None:
+        """Persist a job record, with a TTL once it has finished"""
+        record["updated_at"] = _now()
+        client = await self._get_client()
+        await client.set(f"job:{record['id']}", json.dumps(record), ex=ttl)
+
+    async def _load(self, job_id: str) -> dict[str, Any] | None:
+        client = await self._get_client()
+        raw = await client.get(f"job:{job_id}")
+        return json.loads(raw) if raw else None
+
+    async def submit(self, body: JobSubmitRequest, is_authed: bool) -> JobStatus:
+        """Enqueue a job
+
+        Args:
+            body: Job submission
+            is_authed: Whether the client is authenticated (higher priority)
+
+        Returns:
+            Initial job status
+        """
+        priority = "authed" if is_authed else "anon"
+        record: dict[str, Any] = {
+            "id": uuid.uuid4().hex,
+            "kind": body.request.mode,
+            "status": "queued",
+            "priority": priority,
+            "attempts": 0,
+            "created_at": _now(),
+            "request": body.request.model_dump(mode="json"),
+            "callback_url": str(body.callback_url) if body.callback_url else None,
+            "result": None,
+            "error": None,
+        }
+        await self._save(record)
+
+        client = await self._get_client()
+        await client.lpush(QUEUES[priority], record["id"])  # type: ignore[misc]
+        return self.status(record)
+
+    async def get(self, job_id: str) -> JobStatus | None:
+        """Get a job's status, or None if unknown or expired"""
+        record = await self._load(job_id)
+        return self.status(record) if record else None
+
+    def status(self, record: dict[str, Any]) -> JobStatus:
+        """Build the public status from a job record"""
+        return JobStatus(
+            **{k: v for k, v in record.items() if k not in ("request", "callback_url")}
+        )
+
+    async def dequeue(self, timeout: int = 5) -> dict[str, Any] | None:
+        """Block until a job is available, highest priority first
+
+        Args:
+            timeout: Seconds to wait before returning None
+
+        Returns:
+            The job record, marked running, or None on timeout
+        """
+        await self._promote_delayed()
+        if time.monotonic() >= self._next_reap:
+            self._next_reap = time.monotonic() + REAP_INTERVAL_SECONDS
+            await self.requeue_expired()
+
+        client = await self._get_client()
+        deadline = time.monotonic() + timeout
+        job_id = None
+        while job_id is None:
+            for queue in QUEUES.values():
+                job_id = await client.lmove(queue, self.processing_key, "RIGHT", "LEFT")
+                if job_id is not None:
+                    break
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                job_id = await client.blmove(
+                    QUEUES["authed"],
+                    self.processing_key,
+                    min(remaining, POLL_SECONDS),  # type: ignore[arg-type]
+                    "RIGHT",
+                    "LEFT",
+                )
+
+        await client.zadd(LEASES, {job_id: time.time() + self.visibility_timeout})
+        record = await self._load(job_id)
+        if record is None or record["status"] in ("succeeded", "failed"):
+            # Expired, or finished by a worker whose lease had run out
+            await self._release(job_id, self.worker_id)
+            return None
+
+        record["status"] = "running"
+        record["attempts"] += 1
+        record["worker"] = self.worker_id
+        await self._save(record)
+        return record
+
+    async def _release(self, job_id: str, worker_id: str) -> None:
+        """Drop a job from a worker's processing list and its lease"""
+        client = await self._get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.lrem(f"{PROCESSING_PREFIX}{worker_id}", 1, job_id)
+            pipe.zrem(LEASES, job_id)
+            await pipe.execute()
+
+    async def requeue_expired(self) -> int:
+        """Put jobs whose lease has run out back on their queue
+
+        Scans every worker's processing list. A job moved there by a worker
+        that died before leasing it gets a lease now, so it is requeued one
+        visibility timeout later.
+
+        Returns:
+            Number of jobs requeued
+        """
+        client = await self._get_client()
+        requeued = 0
+        async for processing_key in client.scan_iter(match=f"{PROCESSING_PREFIX}*"):
+            for job_id in await client.lrange(processing_key, 0, -1):  # type: ignore[misc]
+                lease = await client.zscore(LEASES, job_id)
+                if lease is None:
+                    await client.zadd(
+                        LEASES, {job_id: time.time() + self.visibility_timeout}, nx=True
+                    )
+                    continue
+                # ZREM succeeds for exactly one reaper, so each job is requeued once
+                if lease > time.time() or not await client.zrem(LEASES, job_id):
+                    continue
+
+                record = await self._load(job_id)
+                if record is None or record["status"] != "running":
+                    # Expired, or finished after its lease ran out
+                    await client.lrem(processing_key, 1, job_id)  # type: ignore[misc]
+                    continue
+
+                record["error"] = "Job failed: worker lost"
+                if record["attempts"] >= self.max_attempts:
+                    # Don't let a job that kills its workers loop forever
+                    record["status"] = "failed"
+                    await self._save(record, ttl=self.result_ttl)
+                    await client.lrem(processing_key, 1, job_id)  # type: ignore[misc]
+                    continue
+
+                record["status"] = "queued"
+                await self._save(record)
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.lrem(processing_key, 1, job_id)
+                    pipe.rpush(QUEUES[record["priority"]], job_id)
+                    await pipe.execute()
+                requeued += 1
+        return requeued
+
+    async def _promote_delayed(self) -> None:
+        """Move retries whose backoff has elapsed back onto their queue"""
+        client = await self._get_client()
+        due = await client.zrangebyscore(DELAYED, 0, time.time())
+        for job_id in due:
+            # ZREM succeeds for exactly one worker, so each retry is promoted once
+            if await client.zrem(DELAYED, job_id):
+                record = await self._load(job_id)
+                if record is not None:
+                    await client.rpush(QUEUES[record["priority"]], job_id)  # type: ignore[misc]
+
+    async def complete(self, record: dict[str, Any], result: dict[str, Any]) -> None:
+        """Mark a job succeeded and start its result TTL"""
+        record["status"] = "succeeded"
+        record["result"] = result
+        record["error"] = None
+        await self._save(record, ttl=self.result_ttl)
+        await self._release(record["id"], record.get("worker", self.worker_id))
+
+    async def fail(self, record: dict[str, Any], error: str) -> bool:
+        """Record a failed attempt, scheduling a retry if attempts remain
+
+        Returns:
+            True if the job was requeued, False if it failed permanently
+        """
+        record["error"] = error
+        if record["attempts"] < self.max_attempts:
+            record["status"] = "queued"
+            await self._save(record)
+            backoff = settings.job_retry_backoff_seconds * 2 ** (record["attempts"] - 1)
+            client = await self._get_client()
+            await client.zadd(DELAYED, {record["id"]: time.time() + backoff})
+            await self._release(record["id"], record.get("worker", self.worker_id))
+            return True
+
+        record["status"] = "failed"
+        await self._save(record, ttl=self.result_ttl)
+        await self._release(record["id"], record.get("worker", self.worker_id))
+        return False
+
+    async def close(self) -> None:
+        """Close Redis connection"""
+        if self.redis_client:
+            await self.redis_client.close()
+
+
+# Singleton instance
+job_queue = JobQueue()
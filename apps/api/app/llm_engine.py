@@ -1,44 +1,128 @@
 """LLM Engine - Core apology generation logic with guardrails"""
 
-import json
-import re
-from typing import Any
-
-from openai import AsyncOpenAI
-
+import asyncio
+import time
+from collections.abc import AsyncIterator, Iterable
+from typing import TYPE_CHECKING, Any
+
+import orjson
+from opentelemetry import trace
+
+from .analysis import analysis_engine
+from .backends import Backend, BackendPool
+from .brand_profiles import brand_profiles
+from .cache import cache_key, response_cache
+from .channels import draft_violations, output_token_budget
 from .config import settings
+from .metrics import observe_stage, record_cache, record_tokens, stage
 from .models import (
     Channel,
-    ChannelDraft,
-    Detectors,
+    GenerateCompletion,
     GenerateRequest,
     GenerateResponse,
-    Incident,
     InterpretRequest,
     InterpretResponse,
-    Metrics,
     Severity,
 )
+from .offline import offline_generator
+from .prompt_encoder import (
+    check_interpret_budget,
+    count_message_tokens,
+    count_tokens,
+    fit_generate_budget,
+    generate_messages,
+    interpret_messages,
+    repair_messages,
+)
+from .resilience import UpstreamGuard, UpstreamUnavailableError, upstream_guard
+from .semantic_cache import SemanticQuery, generate_query, interpret_query, semantic_cache
+from .singleflight import singleflight
+from .streaming import DraftStreamParser
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from openai.types.chat import ChatCompletion
+
+
+def _dedupe(items: Iterable[str]) -> list[str]:
+    """De-duplicate strings, keeping first-seen order"""
+    return list(dict.fromkeys(items))
 
 
 class LLMEngine:
     """LLM-powered apology generation engine"""
 
-    def __init__(self) -> None:
-        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+    def __init__(
+        self,
+        client: "AsyncOpenAI | None" = None,
+        pool: BackendPool | None = None,
+        guard: UpstreamGuard | None = None,
+        tracer: trace.Tracer | None = None,
+    ) -> None:
+        if pool is None and client is not None:
+            pool = BackendPool([Backend("default", client, settings.openai_model)])
+        # Otherwise built from settings on first use or in ``warm_up``, so that
+        # importing the engine doesn't construct (or even import) the OpenAI client
+        self._pool = pool
+        self.guard = guard or upstream_guard
+        self.tracer = tracer or trace.get_tracer(__name__)
+        # Cache keys use the primary model name whichever backend answers
         self.model = settings.openai_model
+        self.parallel = settings.generate_parallel
+        self.parallel_concurrency = settings.generate_parallel_concurrency
+        self.max_input_tokens = settings.prompt_max_input_tokens
+
+    @property
+    def pool(self) -> BackendPool:
+        """Get or create the backend pool"""
+        if self._pool is None:
+            self._pool = BackendPool.from_settings()
+        return self._pool
+
+    @pool.setter
+    def pool(self, pool: BackendPool) -> None:
+        self._pool = pool
+
+    def warm_up(self) -> None:
+        """Build the backend pool and load the tokenizer ahead of the first request"""
+        self.pool
+        count_tokens("", self.model)
+
+    async def interpret(self, request: InterpretRequest, use_cache: bool = True) -> InterpretResponse:
+        """Interpret messy incident input into structured record
+
+        Args:
+            request: Interpretation request
+            use_cache: Whether a near-duplicate cached result may be served
+        """
+        with self.tracer.start_as_current_span("LLMEngine.interpret") as span:
+            check_interpret_budget(request, self.max_input_tokens, self.model)
+            query = interpret_query(request, self.model)
+            if use_cache:
+                with self.tracer.start_as_current_span("cache_lookup"):
+                    cached = await semantic_cache.get(query)
+                record_cache("semantic", cached is not None)
+                span.set_attribute("app.cache_hit", cached is not None)
+                if cached is not None:
+                    return InterpretResponse.model_validate_json(cached)
+
+            content = await singleflight.do(
+                cache_key(f"interpret:{self.model}", request),
+                lambda: self._complete_interpret(request),
+            )
 
-    async def interpret(self, request: InterpretRequest) -> InterpretResponse:
-        """Interpret messy incident input into structured record"""
-        system_prompt = self._build_interpret_system_prompt()
-        user_prompt = self._build_interpret_user_prompt(request)
-
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+            with self.tracer.start_as_current_span("parse"):
+                interpreted = InterpretResponse.model_validate_json(content)
+            await semantic_cache.set(query, content)
+            return interpreted
+
+    async def _complete_interpret(self, request: InterpretRequest) -> str:
+        """Run the upstream completion for an interpret request"""
+        with stage("prompt_build"), self.tracer.start_as_current_span("prompt_build"):
+            messages = interpret_messages(request)
+        response = await self._complete(
+            [],
+            messages=messages,
             temperature=0.3,
             response_format={"type": "json_object"},
         )
@@ -47,42 +131,376 @@ class LLMEngine:
         if not content:
             raise ValueError("Empty response from LLM")
 
-        result = json.loads(content)
-        return InterpretResponse(**result)
-
-    async def generate(self, request: GenerateRequest) -> GenerateResponse:
-        """Generate apology drafts with guardrails applied"""
-        # Apply severity-based clamps
+        return content
+
+    async def generate(
+        self, request: GenerateRequest, use_cache: bool = True, parallel: bool | None = None
+    ) -> GenerateResponse:
+        """Generate apology drafts with guardrails applied
+
+        Args:
+            request: Generation request
+            use_cache: Whether a cached result may be served. Fresh results
+                are always written back to the cache.
+            parallel: Issue one completion per channel concurrently. Defaults
+                to the GENERATE_PARALLEL setting; single-channel requests
+                always use one call.
+        """
+        with self.tracer.start_as_current_span(
+            "LLMEngine.generate",
+            attributes={"app.channels": [c.value for c in request.channels]},
+        ) as span:
+            # Attach a stored brand profile, unless the route already has
+            await brand_profiles.resolve(request)
+
+            with self.tracer.start_as_current_span("clamp"):
+                # Apply severity-based clamps
+                request = self._apply_severity_clamps(request)
+
+            with self.tracer.start_as_current_span("validate"):
+                # Validate strategies
+                adjustments = self._validate_strategies(request)
+                adjustments += fit_generate_budget(request, self.max_input_tokens, self.model)
+
+            # Cache on the normalized request so clamped variants share an entry
+            key = cache_key(f"generate:{self.model}", request)
+            query = generate_query(request, self.model)
+            content = await self._lookup_generate(key, query) if use_cache else None
+            cached = content is not None
+            span.set_attribute("app.cache_hit", cached)
+
+            if content is None:
+                if parallel is None:
+                    parallel = self.parallel
+                complete = (
+                    self._complete_generate_parallel
+                    if parallel and len(request.channels) > 1
+                    else self._complete_generate
+                )
+                try:
+                    # Identical concurrent requests share one upstream call
+                    content = await singleflight.do(key, lambda: complete(request))
+                except UpstreamUnavailableError:
+                    # Upstream is shedding load: a cached result beats a 503, even
+                    # for clients that asked for a fresh one
+                    if use_cache or (content := await self._lookup_generate(key, query)) is None:
+                        raise
+                    cached = True
+
+            with self.tracer.start_as_current_span("parse"):
+                response = self._parse_generate(request, content, adjustments)
+
+            # Only cache completions that validated
+            if not cached:
+                await self._store_generate(key, query, content)
+
+            return response
+
+    def generate_offline(self, request: GenerateRequest) -> GenerateResponse:
+        """Generate drafts from local templates, with no upstream call
+
+        Applies the same guardrails as ``generate``; see ``app.offline``.
+        """
+        request = self._apply_severity_clamps(request)
+        adjustments = self._validate_strategies(request)
+        return offline_generator.generate(request, adjustments)
+
+    async def generate_stream(
+        self, request: GenerateRequest, use_cache: bool = True
+    ) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+        """Generate apology drafts, yielding each draft field as it completes
+
+        Yields ``("draft", {...})`` for every completed
+        ``drafts[channel].useful``/``pointless`` field, then ``("result", {...})``
+        with the validated GenerateResponse and ``("timings", {...})`` with
+        time-to-first-token, time-to-first-channel and total time in ms.
+
+        Args:
+            request: Generation request
+            use_cache: Whether a cached result may be replayed
+        """
+        start = time.perf_counter()
+        await brand_profiles.resolve(request)
         request = self._apply_severity_clamps(request)
-
-        # Validate strategies
         adjustments = self._validate_strategies(request)
+        adjustments += fit_generate_budget(request, self.max_input_tokens, self.model)
+
+        key = cache_key(f"generate:{self.model}", request)
+        query = generate_query(request, self.model)
+        cached_content = await self._lookup_generate(key, query) if use_cache else None
+
+        parser = DraftStreamParser()
+        chunks: list[str] = []
+        ttft_ms: float | None = None
+        ttfc_ms: float | None = None
+
+        async for delta in self._stream_generate(request, cached_content):
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if ttft_ms is None:
+                ttft_ms = elapsed_ms
+            chunks.append(delta)
+
+            for channel, variant, text in parser.feed(delta):
+                if ttfc_ms is None and parser.channel_complete(channel):
+                    ttfc_ms = elapsed_ms
+                yield "draft", {"channel": channel, "variant": variant, "text": text}
+
+        content = "".join(chunks)
+        if cached_content is None:
+            # Drafts already streamed as-is; the result carries any repairs
+            content = await self._repair_drafts(request, content)
+        response = self._parse_generate(request, content, adjustments)
+        if cached_content is None:
+            await self._store_generate(key, query, content)
+
+        yield "result", response.model_dump(mode="json")
+        yield "timings", {
+            "ttft_ms": ttft_ms,
+            "ttfc_ms": ttfc_ms,
+            "total_ms": (time.perf_counter() - start) * 1000,
+            "cached": cached_content is not None,
+        }
+
+    async def _stream_generate(
+        self, request: GenerateRequest, cached_content: str | None
+    ) -> AsyncIterator[str]:
+        """Yield completion text deltas, replaying a cached completion if given"""
+        if cached_content is not None:
+            yield cached_content
+            return
+
+        with stage("prompt_build"), self.tracer.start_as_current_span("prompt_build"):
+            messages = generate_messages(request)
+
+        # Not made current: the context would leak across the yields below
+        span = self.tracer.start_span(
+            "llm.upstream",
+            attributes={
+                "gen_ai.request.model": self.model,
+                "app.channels": [c.value for c in request.channels],
+                "app.stream": True,
+            },
+        )
+        try:
+            queued = time.perf_counter_ns()
+            async with self.guard.slot(measure_latency=False):
+                observe_stage("upstream_queue", time.perf_counter_ns() - queued)
+                with stage("upstream_wait"):
+                    stream = await self.pool.stream(
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=output_token_budget(request.channels),
+                        response_format={"type": "json_object"},
+                    )
+                deltas: list[str] = []
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    if chunk.choices[0].delta.content:
+                        deltas.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+                    if chunk.choices[0].finish_reason == "length":
+                        raise ValueError("Completion hit the output token limit")
+
+            # Streams carry no usage, so count locally
+            prompt_tokens = count_message_tokens(messages, self.model)
+            completion_tokens = count_tokens("".join(deltas), self.model)
+            span.set_attribute("gen_ai.usage.prompt_tokens", prompt_tokens)
+            span.set_attribute("gen_ai.usage.completion_tokens", completion_tokens)
+            record_tokens(self.model, request.channels, prompt_tokens, completion_tokens)
+        except Exception as e:
+            span.record_exception(e)
+            span.set_status(trace.Status(trace.StatusCode.ERROR))
+            raise
+        finally:
+            span.end()
+
+    async def _lookup_generate(self, key: str, query: SemanticQuery) -> str | None:
+        """Look up a completion in the exact cache, then the semantic cache"""
+        with self.tracer.start_as_current_span("cache_lookup"):
+            content = await response_cache.get(key)
+            record_cache("exact", content is not None)
+            if content is None:
+                content = await semantic_cache.get(query)
+                record_cache("semantic", content is not None)
+            return content
+
+    async def _store_generate(self, key: str, query: SemanticQuery, content: str) -> None:
+        """Write a validated completion to both caches"""
+        await response_cache.set(key, content)
+        await semantic_cache.set(query, content)
+
+    def _parse_generate(
+        self, request: GenerateRequest, content: str, adjustments: list[str]
+    ) -> GenerateResponse:
+        """Parse a completion's drafts and score them locally
+
+        Metrics and detectors always come from ``analysis_engine``, so the
+        model is only asked for drafts and cached completions rescore the same.
+        """
+        if not content:
+            raise ValueError("Empty response from LLM")
 
-        system_prompt = self._build_generate_system_prompt()
-        user_prompt = self._build_generate_user_prompt(request)
+        # Validated straight from the JSON text, with no intermediate dict
+        with stage("json_parse"):
+            completion = GenerateCompletion.model_validate_json(content)
+        with stage("analysis"):
+            metrics, detectors = analysis_engine.analyze(request, completion.drafts)
+
+        with stage("validation"):
+            return GenerateResponse(
+                drafts=completion.drafts,
+                metrics=metrics,
+                detectors=detectors,
+                adjustments=[*completion.adjustments, *adjustments],
+                rationales=completion.rationales,
+            )
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+    async def _complete(self, channels: list[Channel], **kwargs: Any) -> "ChatCompletion":
+        """Run one upstream chat completion through the guard and backend pool
+
+        Args:
+            channels: Channels the completion covers, for token accounting
+            **kwargs: ``chat.completions.create`` arguments, minus ``model``
+        """
+        with self.tracer.start_as_current_span(
+            "llm.upstream",
+            attributes={
+                "gen_ai.request.model": self.model,
+                "app.channels": [c.value for c in channels],
+            },
+        ) as span:
+            queued = time.perf_counter_ns()
+            async with self.guard.slot():
+                observe_stage("upstream_queue", time.perf_counter_ns() - queued)
+                with stage("upstream_wait"):
+                    response = await self.pool.complete(**kwargs)
+
+            span.set_attribute("gen_ai.response.model", response.model)
+            if response.usage is not None:
+                span.set_attribute("gen_ai.usage.prompt_tokens", response.usage.prompt_tokens)
+                span.set_attribute(
+                    "gen_ai.usage.completion_tokens", response.usage.completion_tokens
+                )
+                record_tokens(
+                    response.model,
+                    channels,
+                    response.usage.prompt_tokens,
+                    response.usage.completion_tokens,
+                )
+            return response
+
+    async def _complete_generate(self, request: GenerateRequest) -> str:
+        """Run the upstream completion for a normalized generate request
+
+        Output is capped by the channel mix's token budget; drafts that break
+        their channel's length rules are then repaired channel by channel.
+        """
+        with stage("prompt_build"), self.tracer.start_as_current_span("prompt_build"):
+            messages = generate_messages(request)
+        response = await self._complete(
+            request.channels,
+            messages=messages,
             temperature=0.7,
+            max_tokens=output_token_budget(request.channels),
             response_format={"type": "json_object"},
         )
 
-        content = response.choices[0].message.content
-        if not content:
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            raise ValueError("Completion hit the output token limit")
+        if not choice.message.content:
             raise ValueError("Empty response from LLM")
 
-        result = json.loads(content)
-
-        # Add our adjustments to the result
-        if "adjustments" not in result:
-            result["adjustments"] = []
-        result["adjustments"].extend(adjustments)
+        return await self._repair_drafts(request, choice.message.content)
+
+    async def _repair_drafts(self, request: GenerateRequest, content: str) -> str:
+        """Re-request only the channel drafts that break their length rules"""
+        try:
+            completion = GenerateCompletion.model_validate_json(content)
+        except ValueError:
+            # Left for _parse_generate to reject
+            return content
+
+        drafts = completion.drafts
+        violations = {
+            channel: problems
+            for channel in request.channels
+            if channel.value in drafts
+            and (problems := draft_violations(channel, drafts[channel.value].model_dump()))
+        }
+        if not violations:
+            return content
+
+        repaired = await asyncio.gather(
+            *(
+                self._repair_channel(channel, drafts[channel.value].model_dump(), problems)
+                for channel, problems in violations.items()
+            )
+        )
+        for (channel, problems), draft in zip(violations.items(), repaired):
+            if draft is None:
+                continue
+            drafts[channel.value] = drafts[channel.value].model_copy(update=draft)
+            completion.adjustments.append(
+                f"Rewrote {channel.value} draft to fit channel rules ({'; '.join(problems)})"
+            )
 
-        return GenerateResponse(**result)
+        return completion.model_dump_json()
+
+    async def _repair_channel(
+        self, channel: Channel, draft: dict[str, Any], problems: list[str]
+    ) -> dict[str, str] | None:
+        """Ask for one channel's draft again; None if the repair also fails"""
+        try:
+            response = await self._complete(
+                [channel],
+                messages=repair_messages(channel, draft, problems),
+                temperature=0.3,
+                max_tokens=output_token_budget([channel]),
+                response_format={"type": "json_object"},
+            )
+            repaired = GenerateCompletion.model_validate_json(
+                response.choices[0].message.content or ""
+            ).drafts[channel.value]
+            useful, pointless = repaired.useful, repaired.pointless
+        except Exception:
+            # Keep the original draft rather than failing the whole response
+            return None
+
+        if draft_violations(channel, {"useful": useful, "pointless": pointless}):
+            return None
+        return {"useful": useful, "pointless": pointless}
+
+    async def _complete_generate_parallel(self, request: GenerateRequest) -> str:
+        """Run one channel-scoped completion per channel and merge the results"""
+        semaphore = asyncio.Semaphore(self.parallel_concurrency)
+
+        async def complete_channel(channel: Channel) -> dict[str, Any]:
+            channel_request = request.model_copy(update={"channels": [channel]})
+            async with semaphore:
+                content = await self._complete_generate(channel_request)
+            result: dict[str, Any] = orjson.loads(content)
+            return result
+
+        results = await asyncio.gather(*(complete_channel(c) for c in request.channels))
+        return orjson.dumps(self._merge_results(results)).decode()
+
+    def _merge_results(self, results: list[dict[str, Any]]) -> dict[str, Any]:
+        """Merge channel-scoped generate results into one
+
+        Drafts are combined and list fields de-duplicated; metrics and
+        detectors are scored over the merged drafts by ``_parse_generate``.
+        """
+        drafts: dict[str, Any] = {}
+        for result in results:
+            drafts.update(result.get("drafts", {}))
+
+        return {
+            "drafts": drafts,
+            "adjustments": _dedupe(a for result in results for a in result.get("adjustments", [])),
+            "rationales": _dedupe(r for result in results for r in result.get("rationales", [])),
+        }
 
     def _apply_severity_clamps(self, request: GenerateRequest) -> GenerateRequest:
         """Apply automatic clamps based on severity"""
@@ -94,7 +512,7 @@ class LLMEngine:
             request.strategy.scapegoat.intensity = min(
                 request.strategy.scapegoat.intensity, 40
             )
-            request.strategy.risk_transfer = 0
+            request.sliders.risk_transfer = 0
             request.strategy.responsibility_split.brand = max(
                 request.strategy.responsibility_split.brand, 0.5
             )
@@ -148,96 +566,6 @@ class LLMEngine:
 
         return adjustments
 
-    def _build_interpret_system_prompt(self) -> str:
-        """Build system prompt for interpret mode"""
-        return """You are the interpretation engine for Apology-as-a-Service (AaaS).
-
-Your job is to parse messy incident inputs into structured incident records.
-
-RULES:
-1. Never fabricate facts or evidence
-2. When evidence is missing, use "no evidence at this time" or "unknown"
-3. Extract entities, times, and numbers into the extractions field
-4. Assess severity based on harm scope and stakeholder impact
-5. Identify relevant regulatory jurisdictions
-6. Output valid JSON exactly matching the InterpretResponse schema
-
-Output only JSON, no prose outside JSON."""
-
-    def _build_interpret_user_prompt(self, request: InterpretRequest) -> str:
-        """Build user prompt for interpret mode"""
-        return f"""Parse this incident input into a structured record:
-
-Text: {request.incident_input.text}
-Links: {', '.join(request.incident_input.links) if request.incident_input.links else 'None'}
-Files: {', '.join(request.incident_input.files) if request.incident_input.files else 'None'}
-
-Output JSON with fields: incident, notes, extractions."""
-
-    def _build_generate_system_prompt(self) -> str:
-        """Build system prompt for generate mode"""
-        return """You are the generation engine for Apology-as-a-Service (AaaS).
-
-Your job is to generate two apology variants per channel: useful and pointless.
-
-GLOBAL PRINCIPLES:
-- Truth & Evidence First: Never assert certainty without evidence
-- Duality: Always produce both useful and pointless variants
-- Non-Apology Detector: When contrition ≥ 60, ban "we regret any inconvenience" without ownership
-- Scapegoating Limits: Never target individuals or protected classes
-- Legal Hedging ≠ Lying: Use qualifiers without contradicting facts
-
-DETERMINISTIC MAPPINGS:
-Contrition (0-100):
-  0-20: neutral/indirect
-  21-59: partial ownership
-  ≥60: explicit "we caused/we failed" + restitution
-
-Legal Hedging (0-100):
-  0-20: plain language
-  21-59: add qualifiers ("to our knowledge", "pending investigation")
-  60-100: safe-harbor/force-majeure language
-
-Memes (0-100):
-  0-10: none
-  11-40: subtle idiom
-  41-70: tasteful unhinged
-  71-100: overt memes
-
-CHANNEL RULES:
-- twitter: ≤280 chars, crisp, ownership line if contrition ≥60
-- linkedin: 2-5 sentences, professional, soft CTA
-- press_release: headline, lede, summary, bullets, quote, contact
-- ceo_letter: 3-7 paragraphs, human, explicit responsibility if contrition ≥60
-- customer_email: greeting, what happened, restitution, support, sign-off, ~120-200 words
-- status_page: timeline, scope, root cause, remediation, next update
-
-Output valid JSON exactly matching GenerateResponse schema.
-Include metrics, detectors, adjustments, and rationales."""
-
-    def _build_generate_user_prompt(self, request: GenerateRequest) -> str:
-        """Build user prompt for generate mode"""
-        return f"""Generate apologies for this incident:
-
-INCIDENT:
-{json.dumps(request.incident.model_dump(), indent=2)}
-
-SLIDERS:
-{json.dumps(request.sliders.model_dump(), indent=2)}
-
-STRATEGY:
-{json.dumps(request.strategy.model_dump(), indent=2)}
-
-TONE: {request.tone.value}
-CHANNELS: {', '.join(c.value for c in request.channels)}
-LOCALE: {request.locale}
-
-{f"BRAND PROFILE: {json.dumps(request.brand_profile.model_dump(), indent=2)}" if request.brand_profile else ""}
-
-Generate drafts for ALL requested channels.
-Each channel must have both useful and pointless variants.
-Include metrics, detectors, adjustments, and rationales."""
-
 
 # Singleton instance
 llm_engine = LLMEngine()
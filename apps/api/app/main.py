@@ -1,23 +1,34 @@
 """Main FastAPI application"""
 
-import re
+import asyncio
 import time
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Any, AsyncIterator
 
-import sentry_sdk
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from opentelemetry import trace
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.sdk.trace import TracerProvider
-
-from . import __version__
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.types import Scope
+
+from . import __version__, metrics
+from .batch import run_batch
+from .brand_profiles import (
+    BrandProfileConflictError,
+    BrandProfileNotFoundError,
+    brand_profiles,
+    etag,
+    parse_etags,
+)
 from .config import settings
+from .jobs import job_queue
 from .llm_engine import llm_engine
+from .metrics import RATE_LIMITED, REQUEST_SECONDS, stage
 from .models import (
+    BatchGenerateRequest,
+    BatchGenerateResponse,
+    BrandProfile,
+    BrandProfileRecord,
     Channel,
     DistractionStrategy,
     GenerateRequest,
@@ -26,6 +37,8 @@ from .models import (
     Incident,
     InterpretRequest,
     InterpretResponse,
+    JobStatus,
+    JobSubmitRequest,
     LuckyChannelOutput,
     LuckyRequest,
     LuckyResponse,
@@ -37,26 +50,58 @@ from .models import (
     Strategy,
     Tone,
 )
+from .moderation import moderation_engine
+from .prompt_encoder import PromptTooLargeError
 from .rate_limiter import rate_limiter
+from .resilience import UpstreamUnavailableError, retry_after_header, upstream_guard
+from .streaming import format_sse
+from .timing import TimingMiddleware
+
+
+async def _warm_up() -> float:
+    """Build the upstream clients and load the tokenizer; returns the time taken (ms)"""
+    start = time.perf_counter()
+    # Mostly imports and file reads, so run off the loop and keep /health responsive
+    await asyncio.to_thread(llm_engine.warm_up)
+    return (time.perf_counter() - start) * 1000
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """Lifecycle manager for startup/shutdown"""
-    # Startup: Initialize observability
+    # Startup: Initialize observability. Each SDK is imported only when configured.
     if settings.sentry_dsn:
+        import sentry_sdk
+
         sentry_sdk.init(
             dsn=settings.sentry_dsn,
             environment=settings.environment,
             traces_sample_rate=0.1,
         )
 
+    tracer_provider = None
     if settings.otel_exporter_otlp_endpoint:
-        trace.set_tracer_provider(TracerProvider())
+        from .tracing import setup_tracing
+
+        tracer_provider = setup_tracing()
+
+    # Serve /health right away; /ready reports when warmup is done
+    app.state.warmup = asyncio.create_task(_warm_up())
 
     yield
 
-    # Shutdown: cleanup if needed
+    # Shutdown: stop warmup and flush buffered spans
+    app.state.warmup.cancel()
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
+
+
+class TimedORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that records body rendering as the serialization stage"""
+
+    def render(self, content: Any) -> bytes:
+        with stage("serialization"):
+            return super().render(content)
 
 
 # Create FastAPI app
@@ -65,45 +110,115 @@ app = FastAPI(
     version=settings.api_version,
     description=settings.api_description,
     lifespan=lifespan,
+    # orjson renders large draft payloads several times faster than the stdlib
+    default_response_class=TimedORJSONResponse,
 )
 
+# Exact origins only: neither CORS nor Timing-Allow-Origin matches wildcard ports.
+# Local development runs the frontend on 8082 and oops.ninja on 8085.
+CORS_ORIGINS = [
+    "https://sorry.monster",
+    "https://oops.ninja",
+    "http://localhost:8082",
+    "http://localhost:8085",
+]
+
+
+def _observe_request(scope: Scope, status_code: int, seconds: float) -> None:
+    """Record request latency"""
+    # Label by route template so path parameters don't explode cardinality
+    route = scope.get("route")
+    REQUEST_SECONDS.labels(
+        scope["method"], getattr(route, "path", "unmatched"), str(status_code)
+    ).observe(seconds)
+
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["https://sorry.monster", "https://oops.ninja", "http://localhost:*"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "X-RateLimit-Reset",
+        "Retry-After",
+        "ETag",
+        "Server-Timing",
+        "X-Process-Time",
+    ],
 )
 
-# Add request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next: Any) -> Any:
-    """Add X-Process-Time header to responses"""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+# Add request timing middleware (pure ASGI, so streamed bodies pass straight through)
+app.add_middleware(
+    TimingMiddleware,
+    timing_allow_origin=", ".join(origin for origin in CORS_ORIGINS if "*" not in origin),
+    server_timing=settings.server_timing_enabled,
+    on_complete=_observe_request,
+)
 
 
-# Instrument with OpenTelemetry
+# Instrument with OpenTelemetry (before startup: it adds middleware)
 if settings.otel_exporter_otlp_endpoint:
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
     FastAPIInstrumentor.instrument_app(app)
 
 
-@app.exception_handler(Exception)
-async def global_exception_handler(request: Request, exc: Exception) -> JSONResponse:
-    """Global exception handler"""
+def _report_exception(exc: BaseException) -> None:
+    """Send an exception to Sentry, if configured"""
     if settings.sentry_dsn:
+        import sentry_sdk
+
         sentry_sdk.capture_exception(exc)
 
-    return JSONResponse(
+
+@app.exception_handler(Exception)
+async def global_exception_handler(request: Request, exc: Exception) -> ORJSONResponse:
+    """Global exception handler"""
+    _report_exception(exc)
+
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"error": "Internal server error", "detail": str(exc)},
     )
 
 
+async def _enforce_rate_limit(request: Request, response: Response, cost: int = 1) -> dict[str, str]:
+    """Charge the client's rate limit, raising 429 once it is exhausted
+
+    Sets X-RateLimit-* headers on ``response`` and returns them for handlers
+    that build their own (streaming) response.
+    """
+    client_id = request.headers.get("X-Client-ID", request.client.host if request.client else "unknown")
+    is_authed = request.headers.get("Authorization") is not None
+
+    with stage("rate_limit"):
+        result = await rate_limiter.check_rate_limit(client_id, is_authed, cost=cost)
+    if not result.allowed:
+        route = request.scope.get("route")
+        RATE_LIMITED.labels(getattr(route, "path", request.url.path)).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Please try again later.",
+            headers=result.headers(),
+        )
+
+    response.headers.update(result.headers())
+    return result.headers()
+
+
+def _cache_allowed(request: Request) -> bool:
+    """Whether the client allows serving a cached result
+
+    A ``Cache-Control: no-cache`` request header forces a fresh completion.
+    """
+    cache_control = request.headers.get("Cache-Control", "").lower()
+    return "no-cache" not in cache_control
+
+
 @app.get("/", response_model=HealthResponse)
 async def root() -> HealthResponse:
     """Root endpoint - health check"""
@@ -120,29 +235,56 @@ async def health() -> HealthResponse:
     )
 
 
+@app.get("/ready")
+async def ready(response: Response) -> dict[str, Any]:
+    """Readiness probe: 503 until startup warmup has finished"""
+    warmup: asyncio.Task[float] | None = getattr(app.state, "warmup", None)
+    if warmup is None or not warmup.done():
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "warming_up"}
+    error = "cancelled" if warmup.cancelled() else warmup.exception()
+    if error is not None:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "failed", "detail": str(error)}
+    return {"status": "ready", "warmup_ms": round(warmup.result(), 1)}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    """Prometheus metrics, aggregated across workers in multiprocess mode"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/v1/diagnostics/upstream")
+async def upstream_diagnostics() -> dict[str, Any]:
+    """Circuit breaker, concurrency limiter and per-backend health for this worker"""
+    return {**upstream_guard.stats(), "backends": llm_engine.pool.stats()}
+
+
 @app.post("/v1/interpret", response_model=InterpretResponse)
-async def interpret(request: Request, body: InterpretRequest) -> InterpretResponse:
+async def interpret(request: Request, response: Response, body: InterpretRequest) -> InterpretResponse:
     """Interpret messy incident input into structured record
 
     This endpoint parses raw incident descriptions, tweets, links, etc.
     into a structured incident record ready for apology generation.
     """
     # Rate limiting
-    client_id = request.headers.get("X-Client-ID", request.client.host if request.client else "unknown")
-    is_authed = request.headers.get("Authorization") is not None
-
-    if not await rate_limiter.check_rate_limit(client_id, is_authed):
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Please try again later.",
-        )
+    await _enforce_rate_limit(request, response)
 
     try:
-        result = await llm_engine.interpret(body)
+        result = await llm_engine.interpret(body, use_cache=_cache_allowed(request))
         return result
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UpstreamUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers=retry_after_header(e),
+        )
     except Exception as e:
-        if settings.sentry_dsn:
-            sentry_sdk.capture_exception(e)
+        _report_exception(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Interpretation failed: {str(e)}",
@@ -150,36 +292,340 @@ async def interpret(request: Request, body: InterpretRequest) -> InterpretRespon
 
 
 @app.post("/v1/generate", response_model=GenerateResponse)
-async def generate(request: Request, body: GenerateRequest) -> GenerateResponse:
+async def generate(request: Request, response: Response, body: GenerateRequest) -> GenerateResponse:
     """Generate apology drafts with guardrails applied
 
     This endpoint takes a structured incident record and generates
     both useful and pointless apology variants for each requested channel.
     """
     # Rate limiting
-    client_id = request.headers.get("X-Client-ID", request.client.host if request.client else "unknown")
+    await _enforce_rate_limit(request, response)
+
+    try:
+        await brand_profiles.resolve(body)
+        result = await llm_engine.generate(body, use_cache=_cache_allowed(request))
+        return result
+    except BrandProfileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UpstreamUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers=retry_after_header(e),
+        )
+    except Exception as e:
+        _report_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Generation failed: {str(e)}",
+        )
+
+
+@app.post("/v1/generate/stream")
+async def generate_stream(request: Request, response: Response, body: GenerateRequest) -> StreamingResponse:
+    """Stream apology drafts as Server-Sent Events
+
+    Emits a ``draft`` event as each channel's useful/pointless variant
+    completes, then a ``result`` event with the full GenerateResponse
+    (metrics, detectors, adjustments) and a ``timings`` event with
+    time-to-first-token and time-to-first-channel. Failures after the
+    stream has started are reported as an ``error`` event.
+    """
+    # Rate limiting
+    rate_limit_headers = await _enforce_rate_limit(request, response)
+
+    # Resolve up front, so an unknown profile is a 404 rather than an error event
+    try:
+        await brand_profiles.resolve(body)
+    except BrandProfileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+    use_cache = _cache_allowed(request)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event, data in llm_engine.generate_stream(body, use_cache=use_cache):
+                yield format_sse(event, data)
+        except Exception as e:
+            _report_exception(e)
+            yield format_sse("error", {"detail": f"Generation failed: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **rate_limit_headers},
+    )
+
+
+@app.post("/v1/generate/batch", response_model=BatchGenerateResponse)
+async def generate_batch(request: Request, response: Response, body: BatchGenerateRequest) -> Any:
+    """Generate apology drafts for many incidents in one request
+
+    Items run through the engine with bounded concurrency and a per-item
+    timeout; each item gets its own result or error, so one failure never
+    fails the batch. Send ``Accept: application/x-ndjson`` to stream one
+    JSON line per item as it finishes instead of waiting for the slowest.
+    """
+    if len(body.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Batch exceeds {settings.batch_max_items} items.",
+        )
+
+    # A batch bigger than the client's whole limit could never be admitted
+    limit = rate_limiter.limit_for(request.headers.get("Authorization") is not None)
+    if len(body.items) > limit:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Batch exceeds your rate limit of {limit} requests.",
+        )
+
+    # Rate limiting (each item counts as one request)
+    rate_limit_headers = await _enforce_rate_limit(request, response, cost=len(body.items))
+
+    results = run_batch(
+        body.items,
+        concurrency=body.concurrency,
+        item_timeout=body.item_timeout,
+        use_cache=_cache_allowed(request),
+    )
+
+    if "application/x-ndjson" in request.headers.get("Accept", ""):
+
+        async def lines() -> AsyncIterator[str]:
+            async for item in results:
+                yield item.model_dump_json() + "\n"
+
+        return StreamingResponse(
+            lines(), media_type="application/x-ndjson", headers=rate_limit_headers
+        )
+
+    ordered = sorted([item async for item in results], key=lambda item: item.index)
+    succeeded = sum(1 for item in ordered if item.status == "ok")
+    return BatchGenerateResponse(
+        results=ordered, succeeded=succeeded, failed=len(ordered) - succeeded
+    )
+
+
+@app.post("/v1/jobs", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(request: Request, response: Response, body: JobSubmitRequest) -> JobStatus:
+    """Queue a generate or interpret request for a background worker
+
+    Returns immediately with the job id. Poll ``GET /v1/jobs/{id}`` or pass
+    ``callback_url`` to receive the final status as a POST. Authenticated
+    clients are served ahead of anonymous ones.
+    """
+    # Rate limiting
+    await _enforce_rate_limit(request, response)
     is_authed = request.headers.get("Authorization") is not None
 
-    if not await rate_limiter.check_rate_limit(client_id, is_authed):
+    try:
+        return await job_queue.submit(body, is_authed)
+    except Exception as e:
+        _report_exception(e)
         raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Please try again later.",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Job queue unavailable. Please try again later.",
         )
 
+
+@app.get("/v1/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str) -> JobStatus:
+    """Get the status, and once finished the result, of a queued job"""
     try:
-        result = await llm_engine.generate(body)
-        return result
+        job = await job_queue.get(job_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Job queue unavailable. Please try again later.",
+        )
+
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@app.post(
+    "/v1/brand-profiles", response_model=BrandProfileRecord, status_code=status.HTTP_201_CREATED
+)
+async def create_brand_profile(
+    request: Request, response: Response, body: BrandProfile
+) -> BrandProfileRecord:
+    """Store a brand profile
+
+    Pass the returned ``id`` as ``brand_profile_id`` in generate requests
+    instead of sending the profile inline. Its prompt fragment is compiled
+    once and cached. The version is returned as the ETag.
+    """
+    # Rate limiting
+    await _enforce_rate_limit(request, response)
+
+    try:
+        compiled = await brand_profiles.create(body)
     except Exception as e:
-        if settings.sentry_dsn:
-            sentry_sdk.capture_exception(e)
+        _report_exception(e)
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Generation failed: {str(e)}",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Brand profile store unavailable. Please try again later.",
+        )
+
+    response.headers["ETag"] = etag(compiled.version)
+    response.headers["Location"] = f"/v1/brand-profiles/{compiled.id}"
+    return compiled
+
+
+@app.get("/v1/brand-profiles/{profile_id}", response_model=BrandProfileRecord)
+async def get_brand_profile(
+    request: Request, response: Response, profile_id: str, version: int | None = None
+) -> Any:
+    """Get the current (or a given) version of a stored brand profile
+
+    Answers 304 Not Modified when ``If-None-Match`` has the version's ETag.
+    """
+    try:
+        compiled = await brand_profiles.get(profile_id, version)
+    except BrandProfileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Brand profile store unavailable. Please try again later.",
+        )
+
+    if compiled.version in parse_etags(request.headers.get("If-None-Match", "")):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag(compiled.version)}
+        )
+    response.headers["ETag"] = etag(compiled.version)
+    return compiled
+
+
+@app.put("/v1/brand-profiles/{profile_id}", response_model=BrandProfileRecord)
+async def update_brand_profile(
+    request: Request, response: Response, profile_id: str, body: BrandProfile
+) -> BrandProfileRecord:
+    """Store a new version of a brand profile
+
+    Send the ETag you last saw as ``If-Match`` to fail with 412 rather than
+    overwrite someone else's update. Requests without a pinned
+    ``brand_profile_version`` pick up the new version within
+    BRAND_PROFILE_ETAG_TTL_SECONDS.
+    """
+    # Rate limiting
+    await _enforce_rate_limit(request, response)
+
+    if_match = request.headers.get("If-Match", "*")
+    try:
+        compiled = await brand_profiles.update(
+            profile_id, body, if_match=None if if_match == "*" else parse_etags(if_match)
+        )
+    except BrandProfileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except BrandProfileConflictError as e:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(e))
+    except Exception as e:
+        _report_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Brand profile store unavailable. Please try again later.",
         )
 
+    response.headers["ETag"] = etag(compiled.version)
+    return compiled
+
+
+@app.delete("/v1/brand-profiles/{profile_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_brand_profile(request: Request, response: Response, profile_id: str) -> Response:
+    """Delete every version of a stored brand profile"""
+    # Rate limiting
+    await _enforce_rate_limit(request, response)
+
+    try:
+        deleted = await brand_profiles.delete(profile_id)
+    except Exception as e:
+        _report_exception(e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Brand profile store unavailable. Please try again later.",
+        )
+
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Brand profile not found")
+    response.status_code = status.HTTP_204_NO_CONTENT
+    return response
+
+
+# /v1/lucky defaults, validated once at import
+LUCKY_TEMPLATE = GenerateRequest(
+    mode="generate",
+    incident=Incident(
+        summary="",
+        who=["customers"],
+        what="",
+        when="unknown",
+        harm="",
+        stakeholders=["customers"],
+        severity=Severity.LOW,
+        jurisdictions=[],
+        evidence=[],
+    ),
+    sliders=Sliders(
+        contrition=65,
+        legal_hedging=30,
+        memes=10,
+        accountability_evasion=0,
+        profit_alchemist=0,
+        risk_transfer=0,
+        data_fog=0,
+        pseudo_transparency=0,
+    ),
+    strategy=Strategy(
+        scapegoat=ScapegoatStrategy(type=None, intensity=0),
+        distraction=DistractionStrategy(type=None, intensity=0),
+        responsibility_split=ResponsibilitySplit(brand=0.5, external=0.5),
+        victimless_frame=False,
+        self_credentialing=[],
+    ),
+    tone=Tone.EARNEST,
+    channels=[Channel.TWITTER, Channel.CUSTOMER_EMAIL],
+    brand_profile=None,
+    locale="en-US",
+)
+
+
+def _lucky_request(body: LuckyRequest) -> GenerateRequest:
+    """Fill the lucky template with an already-validated body, skipping revalidation
+
+    The engine's guardrails adjust sliders and strategy in place, so those
+    are copied; everything else is shared with the template.
+    """
+    template = LUCKY_TEMPLATE
+    strategy = template.strategy
+    return template.model_copy(
+        update={
+            "incident": template.incident.model_copy(
+                update={
+                    "summary": body.summary,
+                    "what": body.what,
+                    "harm": body.harm,
+                    "severity": body.severity,
+                }
+            ),
+            "sliders": template.sliders.model_copy(),
+            "strategy": strategy.model_copy(
+                update={
+                    "scapegoat": strategy.scapegoat.model_copy(),
+                    "responsibility_split": strategy.responsibility_split.model_copy(),
+                }
+            ),
+        }
+    )
+
 
 @app.post("/v1/lucky", response_model=LuckyResponse)
-async def lucky(request: Request, body: LuckyRequest) -> LuckyResponse:
+async def lucky(request: Request, response: Response, body: LuckyRequest) -> LuckyResponse:
     """I'm Feeling Lucky - instant apology generation with sane defaults
 
     This endpoint provides a simplified API for oops.ninja instant mode.
@@ -189,55 +635,29 @@ async def lucky(request: Request, body: LuckyRequest) -> LuckyResponse:
     Rate limited for anonymous use.
     """
     # Rate limiting (stricter for lucky endpoint)
-    client_id = request.headers.get("X-Client-ID", request.client.host if request.client else "unknown")
-    is_authed = request.headers.get("Authorization") is not None
-
-    if not await rate_limiter.check_rate_limit(client_id, is_authed):
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Please try again later.",
-        )
+    await _enforce_rate_limit(request, response)
 
     try:
-        # Build GenerateRequest with sane defaults
-        generate_request = GenerateRequest(
-            mode="generate",
-            incident=Incident(
-                summary=body.summary,
-                who=["customers"],
-                what=body.what,
-                when="unknown",
-                harm=body.harm,
-                stakeholders=["customers"],
-                severity=body.severity,
-                jurisdictions=[],
-                evidence=[],
-            ),
-            sliders=Sliders(
-                contrition=65,
-                legal_hedging=30,
-                memes=10,
-                accountability_evasion=0,
-                profit_alchemist=0,
-                risk_transfer=0,
-                data_fog=0,
-                pseudo_transparency=0,
-            ),
-            strategy=Strategy(
-                scapegoat=ScapegoatStrategy(type=None, intensity=0),
-                distraction=DistractionStrategy(type=None, intensity=0),
-                responsibility_split=ResponsibilitySplit(brand=0.5, external=0.5),
-                victimless_frame=False,
-                self_credentialing=[],
-            ),
-            tone=Tone.EARNEST,
-            channels=[Channel.TWITTER, Channel.CUSTOMER_EMAIL],
-            brand_profile=None,
-            locale="en-US",
-        )
-
-        # Generate apologies
-        result = await llm_engine.generate(generate_request)
+        generate_request = _lucky_request(body)
+
+        # Templates when asked for, or while the upstream circuit is open
+        generator = body.generator
+        if generator == "auto" and upstream_guard.breaker.state == "open":
+            generator = "offline"
+
+        if generator == "offline":
+            result = llm_engine.generate_offline(generate_request)
+        else:
+            try:
+                result = await llm_engine.generate(
+                    generate_request, use_cache=_cache_allowed(request)
+                )
+                generator = "llm"
+            except UpstreamUnavailableError:
+                if generator != "auto":
+                    raise
+                result = llm_engine.generate_offline(generate_request)
+                generator = "offline"
 
         # Extract and simplify response
         return LuckyResponse(
@@ -253,12 +673,20 @@ async def lucky(request: Request, body: LuckyRequest) -> LuckyResponse:
                 pr_risk=result.metrics.pr_risk,
                 sincerity=result.metrics.sincerity_score,
             ),
+            generator=generator,
             watermark="Generated by oops.ninja",
         )
 
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UpstreamUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers=retry_after_header(e),
+        )
     except Exception as e:
-        if settings.sentry_dsn:
-            sentry_sdk.capture_exception(e)
+        _report_exception(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Lucky generation failed: {str(e)}",
@@ -266,7 +694,7 @@ async def lucky(request: Request, body: LuckyRequest) -> LuckyResponse:
 
 
 @app.post("/v1/moderate")
-async def moderate(request: Request, body: dict[str, Any]) -> dict[str, Any]:
+async def moderate(request: Request, response: Response, body: dict[str, Any]) -> dict[str, Any]:
     """Content moderation endpoint
 
     Refuse hate/violence/illegal apology requests.
@@ -274,30 +702,7 @@ async def moderate(request: Request, body: dict[str, Any]) -> dict[str, Any]:
     No medical/financial advice beyond boilerplate.
     """
     # Rate limiting
-    client_id = request.headers.get("X-Client-ID", request.client.host if request.client else "unknown")
-    is_authed = request.headers.get("Authorization") is not None
-
-    if not await rate_limiter.check_rate_limit(client_id, is_authed):
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Please try again later.",
-        )
-
-    text = body.get("text", "")
-
-    # Basic content moderation rules
-    forbidden_patterns = [
-        r"\b(hate|violence|illegal|exploit)\b",
-        r"\b(medical advice|financial advice)\b",
-        r"\b(tragedy|disaster) (exploitation|profit)\b",
-    ]
-
-    for pattern in forbidden_patterns:
-        if re.search(pattern, text.lower()):
-            return {
-                "allowed": False,
-                "reason": "Content violates moderation policy",
-                "category": "policy_violation",
-            }
+    await _enforce_rate_limit(request, response)
 
-    return {"allowed": True, "reason": "Content passes moderation", "category": "safe"}
+    # Rules are compiled once and hot-reloaded; one pass reports every match
+    return moderation_engine.check(body.get("text", ""))
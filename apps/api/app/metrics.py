@@ -0,0 +1,149 @@
+"""Prometheus metrics: per-stage latency, token usage, cache and error counters
+
+With several uvicorn workers, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty,
+writable directory before the workers start; each process then writes its
+samples there and ``/metrics`` aggregates them all.
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .channels import CHANNEL_SPECS
+from .models import Channel
+from .timing import record_stage
+
+# Sub-millisecond stages (parsing, rate-limit hits) up to multi-second LLM calls
+STAGE_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "sorry_stage_seconds",
+    "Time spent in each request stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "sorry_http_request_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=STAGE_BUCKETS,
+)
+TOKENS = Counter(
+    "sorry_llm_tokens",
+    "LLM tokens by model and channel; multi-channel calls are split by channel budget",
+    ["model", "channel", "direction"],
+)
+CACHE_LOOKUPS = Counter(
+    "sorry_cache_lookups",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+RATE_LIMITED = Counter(
+    "sorry_rate_limited",
+    "Requests rejected with 429 by our rate limiter",
+    ["route"],
+)
+UPSTREAM_ERRORS = Counter(
+    "sorry_upstream_errors",
+    "Failed upstream LLM calls by backend and kind",
+    ["backend", "kind"],
+)
+
+
+def observe_stage(name: str, elapsed_ns: int) -> None:
+    """Record a stage in the histogram and in the request's Server-Timing"""
+    STAGE_SECONDS.labels(name).observe(elapsed_ns / 1_000_000_000)
+    record_stage(name, elapsed_ns)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Observe the duration of the enclosed block as a stage"""
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter_ns() - start)
+
+
+def record_tokens(
+    model: str, channels: list[Channel], prompt_tokens: int, completion_tokens: int
+) -> None:
+    """Count a completion's tokens, split across its channels by output budget
+
+    Args:
+        model: Model that served the completion
+        channels: Channels the completion covered; none for interpret calls
+        prompt_tokens: Input tokens
+        completion_tokens: Output tokens
+    """
+    if not channels:
+        TOKENS.labels(model, "none", "input").inc(prompt_tokens)
+        TOKENS.labels(model, "none", "output").inc(completion_tokens)
+        return
+    weights = [CHANNEL_SPECS[channel].variant_tokens for channel in channels]
+    total = sum(weights)
+    for channel, weight in zip(channels, weights):
+        share = weight / total
+        TOKENS.labels(model, channel.value, "input").inc(prompt_tokens * share)
+        TOKENS.labels(model, channel.value, "output").inc(completion_tokens * share)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def error_kind(error: BaseException) -> str:
+    """Coarse, low-cardinality label for an upstream failure"""
+    import openai  # already loaded by the time a call can fail
+
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            return "rate_limited"
+        return "server_error" if error.status_code >= 500 else "client_error"
+    if isinstance(error, openai.APITimeoutError | asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    return "invalid_response"
+
+
+def record_upstream_error(backend: str, error: BaseException) -> None:
+    UPSTREAM_ERRORS.labels(backend, error_kind(error)).inc()
+
+
+def render() -> tuple[bytes, str]:
+    """Exposition body and content type, merged across workers in multiprocess mode"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
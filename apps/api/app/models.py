@@ -1,9 +1,9 @@
 """Pydantic models for API request/response schemas"""
 
 from enum import Enum
-from typing import Any, Literal, Optional
+from typing import Any, Literal, Optional, Union
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, HttpUrl, PrivateAttr, field_validator, model_validator
 
 
 class Severity(str, Enum):
@@ -164,6 +164,20 @@ class BrandProfile(BaseModel):
     exemplar_paragraphs: list[str] = Field(default_factory=list)
 
 
+class BrandProfileRecord(BaseModel):
+    """A stored brand profile version"""
+
+    id: str
+    version: int
+    profile: BrandProfile
+
+
+class CompiledBrandProfile(BrandProfileRecord):
+    """A stored brand profile version with its prompt fragment precompiled"""
+
+    fragment: str
+
+
 class InterpretRequest(BaseModel):
     """Request for incident interpretation"""
 
@@ -181,8 +195,45 @@ class GenerateRequest(BaseModel):
     tone: Tone = Field(default=Tone.EARNEST)
     channels: list[Channel] = Field(default_factory=lambda: [Channel.TWITTER])
     brand_profile: Optional[BrandProfile] = None
+    brand_profile_id: Optional[str] = Field(
+        default=None, max_length=64, description="Stored profile to use instead of brand_profile"
+    )
+    brand_profile_version: Optional[int] = Field(
+        default=None, ge=1, description="Stored brand profile version; the latest if unset"
+    )
     locale: str = Field(default="en-US")
 
+    # Set by ``brand_profiles.resolve``; not part of the request body or cache key
+    _stored_brand_profile: Optional[CompiledBrandProfile] = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def check_brand_profile(self) -> "GenerateRequest":
+        """Accept an inline or a stored brand profile, not both"""
+        if self.brand_profile is not None and self.brand_profile_id is not None:
+            raise ValueError("Send either brand_profile or brand_profile_id, not both")
+        if self.brand_profile_version is not None and self.brand_profile_id is None:
+            raise ValueError("brand_profile_version requires brand_profile_id")
+        return self
+
+    @property
+    def stored_brand_profile(self) -> Optional[CompiledBrandProfile]:
+        """The resolved stored brand profile, if any"""
+        return self._stored_brand_profile
+
+    def attach_brand_profile(self, compiled: CompiledBrandProfile) -> None:
+        """Use a resolved stored profile, pinning its version for cache keys"""
+        self.brand_profile_version = compiled.version
+        self._stored_brand_profile = compiled
+
+    @property
+    def brand_name(self) -> Optional[str]:
+        """Name of the inline or resolved stored brand profile"""
+        if self.brand_profile is not None:
+            return self.brand_profile.name
+        if self._stored_brand_profile is not None:
+            return self._stored_brand_profile.profile.name
+        return None
+
 
 class InterpretResponse(BaseModel):
     """Interpretation result"""
@@ -229,6 +280,66 @@ class GenerateResponse(BaseModel):
     rationales: list[str] = Field(default_factory=list)
 
 
+class GenerateCompletion(BaseModel):
+    """Model output for generate mode: drafts only, scored locally"""
+
+    drafts: dict[str, ChannelDraft]
+    adjustments: list[str] = Field(default_factory=list)
+    rationales: list[str] = Field(default_factory=list)
+
+
+class BatchGenerateRequest(BaseModel):
+    """Request for generating apologies for many incidents at once"""
+
+    items: list[GenerateRequest] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Max items generated at once (capped at BATCH_CONCURRENCY)"
+    )
+    item_timeout: Optional[float] = Field(
+        None, gt=0, description="Per-item timeout in seconds (capped at BATCH_ITEM_TIMEOUT_SECONDS)"
+    )
+
+
+class BatchItemResult(BaseModel):
+    """Result or error for a single batch item"""
+
+    index: int
+    status: Literal["ok", "error"]
+    result: Optional[GenerateResponse] = None
+    error: Optional[str] = None
+
+
+class BatchGenerateResponse(BaseModel):
+    """Batch generation result, ordered by item index"""
+
+    results: list[BatchItemResult]
+    succeeded: int
+    failed: int
+
+
+class JobSubmitRequest(BaseModel):
+    """Request to run a generate or interpret call asynchronously"""
+
+    request: Union[GenerateRequest, InterpretRequest] = Field(..., discriminator="mode")
+    callback_url: Optional[HttpUrl] = Field(
+        None, description="URL that receives the final JobStatus as a POST"
+    )
+
+
+class JobStatus(BaseModel):
+    """State of an asynchronous job"""
+
+    id: str
+    kind: Literal["generate", "interpret"]
+    status: Literal["queued", "running", "succeeded", "failed"]
+    priority: Literal["authed", "anon"]
+    attempts: int = 0
+    created_at: str
+    updated_at: str
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+
+
 class HealthResponse(BaseModel):
     """Health check response"""
 
@@ -244,6 +355,10 @@ class LuckyRequest(BaseModel):
     what: str = Field(..., description="What happened")
     harm: str = Field(..., description="Harm caused")
     severity: Severity = Field(default=Severity.MEDIUM, description="Incident severity")
+    generator: Literal["auto", "llm", "offline"] = Field(
+        default="auto",
+        description="auto: LLM, falling back to templates while the upstream is down",
+    )
 
 
 class LuckyChannelOutput(BaseModel):
@@ -266,4 +381,5 @@ class LuckyResponse(BaseModel):
     twitter: LuckyChannelOutput
     customer_email: LuckyChannelOutput
     risk: LuckyRisk
+    generator: Literal["llm", "offline"] = "llm"
     watermark: str = "Generated by oops.ninja"
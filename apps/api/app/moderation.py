@@ -0,0 +1,184 @@
+"""Content moderation with precompiled multi-term rules"""
+
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .config import settings
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("moderation_rules.json")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_term(term: str) -> str:
+    """Lowercase a term and collapse its whitespace"""
+    return _WHITESPACE_RE.sub(" ", term.strip().lower())
+
+
+def _trie_pattern(node: dict[str, Any]) -> str:
+    """Render a character trie as a regex alternation
+
+    Shared prefixes are factored out, so the engine walks each position of
+    the text once instead of trying every term. Ends of shorter terms become
+    optional groups, which are greedy, so the longest term wins.
+    """
+    branches = []
+    for char in sorted(key for key in node if key):
+        prefix = r"\s+" if char == " " else re.escape(char)
+        branches.append(prefix + _trie_pattern(node[char]))
+
+    if not branches:
+        return ""
+
+    terminal = "" in node
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+
+    pattern = "(?:" + "|".join(branches) + ")"
+    return pattern + "?" if terminal else pattern
+
+
+def compile_terms(terms: list[str]) -> re.Pattern[str]:
+    """Compile terms into a single word-bounded, case-insensitive regex
+
+    Raises:
+        ValueError: A term is empty or only whitespace
+    """
+    trie: dict[str, Any] = {}
+    for term in terms:
+        if not term.strip():
+            raise ValueError("Moderation terms must not be empty")
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    return re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)", re.IGNORECASE)
+
+
+@dataclass
+class ModerationMatch:
+    """A matched term and where it occurred"""
+
+    category: str
+    term: str
+    start: int
+    end: int
+
+
+@dataclass
+class CompiledRules:
+    """Combined pattern plus term-to-category lookup"""
+
+    pattern: re.Pattern[str] | None
+    categories: dict[str, list[str]] = field(default_factory=dict)
+
+    def scan(self, text: str) -> list[ModerationMatch]:
+        """Report every matched term in a single pass over the text"""
+        if self.pattern is None:
+            return []
+
+        matches = []
+        for match in self.pattern.finditer(text):
+            term = normalize_term(match.group())
+            for category in self.categories.get(term, []):
+                matches.append(ModerationMatch(category, term, match.start(), match.end()))
+        return matches
+
+
+def load_rules(path: Path) -> CompiledRules:
+    """Load and compile rules from a JSON file, or every JSON file in a directory
+
+    Each file holds ``{"rules": [{"category": ..., "terms": [...]}, ...]}``,
+    so per-brand or per-locale policy lists can live side by side.
+
+    Raises:
+        ValueError: A term is empty or only whitespace
+    """
+    files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+
+    categories: dict[str, list[str]] = {}
+    for rules_file in files:
+        for rule in json.loads(rules_file.read_text(encoding="utf-8"))["rules"]:
+            for term in rule["terms"]:
+                normalized = normalize_term(term)
+                if not normalized:
+                    raise ValueError(f"{rules_file}: empty term in category {rule['category']!r}")
+                term_categories = categories.setdefault(normalized, [])
+                if rule["category"] not in term_categories:
+                    term_categories.append(rule["category"])
+
+    pattern = compile_terms(list(categories)) if categories else None
+    return CompiledRules(pattern=pattern, categories=categories)
+
+
+class ModerationEngine:
+    """Moderation rules compiled once and hot-reloaded when the file changes"""
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or Path(settings.moderation_rules_path or DEFAULT_RULES_PATH)
+        self.reload_interval = settings.moderation_reload_interval_seconds
+        self._rules: CompiledRules | None = None
+        self._signature: tuple[tuple[str, float], ...] = ()
+        self._checked_at = 0.0
+
+    def _current_signature(self) -> tuple[tuple[str, float], ...]:
+        """Name and modification time of each rules file
+
+        Covers files being added or deleted, not just edited, in directory mode.
+        """
+        files = sorted(self.path.glob("*.json")) if self.path.is_dir() else [self.path]
+        return tuple((p.name, p.stat().st_mtime) for p in files)
+
+    def reload(self) -> None:
+        """Recompile the rules from disk"""
+        signature = self._current_signature()
+        # Swap in one assignment so concurrent scans see old or new rules, never a mix
+        self._rules = load_rules(self.path)
+        self._signature = signature
+
+    def maybe_reload(self) -> None:
+        """Reload if the rules changed, checking at most once per reload interval"""
+        now = time.monotonic()
+        if self._rules is not None and now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            if self._rules is None or self._current_signature() != self._signature:
+                self.reload()
+        except (OSError, ValueError, KeyError):
+            # Keep serving the last good rules if the file is missing or invalid
+            if self._rules is None:
+                raise
+
+    def scan(self, text: str) -> list[ModerationMatch]:
+        """Return every rule match in the text"""
+        self.maybe_reload()
+        assert self._rules is not None
+        return self._rules.scan(text)
+
+    def check(self, text: str) -> dict[str, Any]:
+        """Moderate text and build the /v1/moderate response body"""
+        matches = self.scan(text)
+        if not matches:
+            return {"allowed": True, "reason": "Content passes moderation", "category": "safe"}
+
+        return {
+            "allowed": False,
+            "reason": "Content violates moderation policy",
+            "category": "policy_violation",
+            "categories": list(dict.fromkeys(m.category for m in matches)),
+            "matches": [
+                {"category": m.category, "term": m.term, "start": m.start, "end": m.end}
+                for m in matches
+            ],
+        }
+
+
+# Singleton instance
+moderation_engine = ModerationEngine()
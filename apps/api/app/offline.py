@@ -0,0 +1,316 @@
+"""Deterministic template generator: apologies without an LLM call
+
+Implements the slider mappings from the generate system prompt with phrase
+banks per tone and severity. Output is a pure function of the request, so
+it is cheap enough to serve when the upstream is unavailable or when a
+client opts out of the LLM entirely.
+"""
+
+import hashlib
+
+from .analysis import analysis_engine
+from .channels import CHANNEL_SPECS
+from .models import (
+    Channel,
+    ChannelDraft,
+    GenerateRequest,
+    GenerateResponse,
+    Severity,
+    Tone,
+)
+
+# Contrition: 0-20 neutral/indirect, 21-59 partial ownership, >=60 explicit + restitution
+OWNERSHIP = {
+    "indirect": [
+        "{brand} is aware that {summary}.",
+        "It has come to {brand_possessive} attention that {summary}.",
+    ],
+    "partial": [
+        "We played a part in this: {summary}.",
+        "We share responsibility for what happened: {summary}.",
+    ],
+    "explicit": [
+        "We caused this: {summary}, and we are sorry.",
+        "We failed you: {summary}. That is on us, and we are sorry.",
+    ],
+}
+
+# Indirect ownership when the request names no brand
+UNBRANDED_INDIRECT = [
+    "We are aware that {summary}.",
+    "It has come to our attention that {summary}.",
+]
+
+RESTITUTION = [
+    "We will make this right for everyone affected.",
+    "We are putting things right for every affected customer.",
+]
+
+# Legal hedging: 0-20 plain, 21-59 qualifiers, 60-100 safe-harbor
+HEDGES = {
+    "plain": "",
+    "qualified": "To our knowledge, and pending investigation, ",
+    "safe_harbor": "Without admission of liability and subject to circumstances beyond our control, ",
+}
+
+# Memes: 0-10 none, 11-40 subtle idiom, 41-70 tasteful unhinged, 71-100 overt
+MEME_LINES = {
+    "none": [""],
+    "subtle": ["We dropped the ball.", "We know this was not our finest hour."],
+    "unhinged": ["Our servers chose chaos and we are having words with them."],
+    "overt": ["This is fine (it was not fine).", "Task failed unsuccessfully."],
+}
+
+TONE_OPENERS = {
+    Tone.EARNEST: ["We owe you a straight answer.", "We want to be honest with you."],
+    Tone.WARM: ["Thank you for your patience with us.", "We know this was frustrating."],
+    Tone.DRY: ["Here is what happened.", "The short version follows."],
+    Tone.STOIC: ["We will be brief and clear.", "The facts are these."],
+    Tone.CHEEKY: ["Well, that did not go to plan.", "Not our best moment."],
+}
+
+TONE_CLOSERS = {
+    Tone.EARNEST: "Thank you for holding us to a higher standard.",
+    Tone.WARM: "We are grateful you are still with us.",
+    Tone.DRY: "We will share more when there is more to share.",
+    Tone.STOIC: "We will do better.",
+    Tone.CHEEKY: "We will try to keep the excitement to a minimum from here on.",
+}
+
+SEVERITY_NEXT_STEPS = {
+    Severity.LOW: "We have fixed the issue and are watching it closely.",
+    Severity.MEDIUM: "Our team is working on a fix and will post updates as it progresses.",
+    Severity.HIGH: (
+        "Our incident team is working on this around the clock and we will "
+        "update you at least every hour until it is resolved."
+    ),
+}
+
+POINTLESS_LINES = {
+    Tone.EARNEST: "We are deeply committed to our ongoing commitment to commitment.",
+    Tone.WARM: "Please accept this virtual hug in lieu of an explanation.",
+    Tone.DRY: "An event occurred. It has been noted.",
+    Tone.STOIC: "Things happened. Things will continue to happen.",
+    Tone.CHEEKY: "Mercury was in retrograde and so, briefly, were we.",
+}
+
+
+def _band(value: int, bands: list[tuple[int, str]]) -> str:
+    """Name of the first band whose upper bound is >= value"""
+    for upper, name in bands:
+        if value <= upper:
+            return name
+    return bands[-1][1]
+
+
+def _inline(text: str) -> str:
+    """Fit free text into a sentence: no trailing period, lowercase start"""
+    text = " ".join(text.split()).rstrip(".!? ")
+    return text[:1].lower() + text[1:] if text[:2] != text[:2].upper() else text
+
+
+class OfflineGenerator:
+    """Rule-and-template apology generator"""
+
+    def generate(self, request: GenerateRequest, adjustments: list[str]) -> GenerateResponse:
+        """Generate drafts and locally scored metrics for a normalized request
+
+        Args:
+            request: Generation request, already clamped and validated
+            adjustments: Guardrail adjustments to report
+        """
+        seed = int.from_bytes(
+            hashlib.blake2b(
+                f"{request.incident.summary}|{request.incident.what}".encode(), digest_size=4
+            ).digest(),
+            "big",
+        )
+        parts = self._parts(request, seed)
+
+        drafts = {}
+        for channel in request.channels:
+            useful, pointless = self._channel(channel, parts)
+            drafts[channel.value] = ChannelDraft(useful=useful, pointless=pointless)
+
+        sliders = request.sliders
+        metrics, detectors = analysis_engine.analyze(request, drafts)
+        return GenerateResponse(
+            drafts=drafts,
+            metrics=metrics,
+            detectors=detectors,
+            adjustments=adjustments,
+            rationales=[
+                f"offline: contrition {sliders.contrition} -> {parts['ownership_band']} ownership",
+                f"offline: legal_hedging {sliders.legal_hedging} -> {parts['hedge_band']} language",
+                f"offline: memes {sliders.memes} -> {parts['meme_band']}",
+            ],
+        )
+
+    def _parts(self, request: GenerateRequest, seed: int) -> dict[str, str]:
+        """Render the sentences every channel is assembled from"""
+        sliders = request.sliders
+        incident = request.incident
+        brand = request.brand_name
+        fields = {"summary": _inline(incident.summary)}
+        if brand:
+            fields.update(brand=brand, brand_possessive=f"{brand}'s")
+
+        ownership_band = _band(
+            sliders.contrition, [(20, "indirect"), (59, "partial"), (100, "explicit")]
+        )
+        hedge_band = _band(
+            sliders.legal_hedging, [(20, "plain"), (59, "qualified"), (100, "safe_harbor")]
+        )
+        meme_band = _band(
+            sliders.memes, [(10, "none"), (40, "subtle"), (70, "unhinged"), (100, "overt")]
+        )
+
+        def pick(options: list[str], salt: int = 0) -> str:
+            return options[(seed + salt) % len(options)]
+
+        hedge = HEDGES[hedge_band]
+        what = _inline(incident.what)
+        what_happened = f"{hedge}{what[:1].upper() + what[1:] if not hedge else what}."
+        ownership_options = OWNERSHIP[ownership_band]
+        if ownership_band == "indirect" and not brand:
+            ownership_options = UNBRANDED_INDIRECT
+        ownership = pick(ownership_options).format(**fields)
+        if ownership_band == "explicit":
+            ownership += " " + pick(RESTITUTION, 1)
+
+        return {
+            "ownership_band": ownership_band,
+            "hedge_band": hedge_band,
+            "meme_band": meme_band,
+            "opener": pick(TONE_OPENERS[request.tone], 2),
+            "ownership": ownership,
+            "what_happened": what_happened,
+            "harm": f"The impact: {_inline(incident.harm)}.",
+            "next_steps": SEVERITY_NEXT_STEPS[incident.severity],
+            "meme": pick(MEME_LINES[meme_band], 3),
+            "closer": TONE_CLOSERS[request.tone],
+            "pointless": POINTLESS_LINES[request.tone],
+            "summary": fields["summary"],
+        }
+
+    def _channel(self, channel: Channel, p: dict[str, str]) -> tuple[str, str]:
+        """Assemble the useful and pointless variants for one channel"""
+
+        def join(*sentences: str) -> str:
+            return " ".join(s for s in sentences if s)
+
+        if channel == Channel.TWITTER:
+            limit = CHANNEL_SPECS[channel].max_chars or 280
+            useful = join(p["ownership"], p["next_steps"], p["meme"])
+            if len(useful) > limit:
+                useful = join(p["ownership"], p["meme"])
+            if len(useful) > limit:
+                useful = useful[: limit - 1].rstrip() + "…"
+            return useful, join(p["pointless"], "#grateful")
+
+        if channel == Channel.LINKEDIN:
+            return (
+                join(p["opener"], p["ownership"], p["next_steps"]),
+                join(p["pointless"], "Agree?", "Thoughts welcome below."),
+            )
+
+        if channel == Channel.CUSTOMER_EMAIL:
+            useful = "\n\n".join(
+                [
+                    "Hello,",
+                    join(p["opener"], p["ownership"]),
+                    join(
+                        "What happened:",
+                        p["what_happened"],
+                        p["harm"],
+                        "We know you rely on us, and this fell short of what you should expect.",
+                    ),
+                    join(
+                        "What we are doing:",
+                        p["next_steps"],
+                        "If you were affected, we will follow up with you directly about "
+                        "making it right, and you do not need to do anything to qualify.",
+                    ),
+                    join(
+                        "If you have questions or need help, reply to this email and a member of "
+                        "our support team will get back to you.",
+                        p["meme"],
+                        p["closer"],
+                    ),
+                    "Sincerely,\nThe Team",
+                ]
+            )
+            pointless = "\n\n".join(
+                [
+                    "Dear Valued Stakeholder,",
+                    join(
+                        p["pointless"],
+                        "We have convened a working group to align on a framework for "
+                        "scoping the discovery phase of our review of the situation, which "
+                        "we are proactively monitoring with a view to leveraging learnings "
+                        "going forward across our ecosystem of synergies.",
+                    ),
+                    join(
+                        "Please rest assured that your experience matters to us, and we remain "
+                        "focused on delivering value. We appreciate your continued partnership "
+                        "as we continue to continue, and thank you for your patience and "
+                        "understanding during this exciting period of transformation for our "
+                        "whole family of valued customers and stakeholders everywhere.",
+                    ),
+                    "Warm regards,\nThe Team",
+                ]
+            )
+            return useful, pointless
+
+        if channel == Channel.CEO_LETTER:
+            useful = "\n\n".join(
+                [
+                    join("To everyone we let down,", p["opener"]),
+                    join(p["ownership"], p["what_happened"], p["harm"]),
+                    join(p["next_steps"], "I have asked the team to report back to me personally."),
+                    p["closer"],
+                ]
+            )
+            pointless = "\n\n".join(
+                [
+                    "Team,",
+                    p["pointless"],
+                    "As I reflect on my journey, I am reminded that every setback is a setup.",
+                ]
+            )
+            return useful, pointless
+
+        if channel == Channel.PRESS_RELEASE:
+            useful = "\n\n".join(
+                [
+                    f"Statement regarding {p['summary']}",
+                    join(p["what_happened"], p["harm"]),
+                    join(p["ownership"], p["next_steps"]),
+                    '"' + join(p["opener"], p["closer"]) + '" said a company spokesperson.',
+                    "Media contact: press@example.com",
+                ]
+            )
+            pointless = "\n\n".join(
+                [
+                    "FOR IMMEDIATE RELEASE: Company Remains Company",
+                    p["pointless"],
+                    "Media contact: press@example.com",
+                ]
+            )
+            return useful, pointless
+
+        # Status page
+        useful = "\n".join(
+            [
+                f"Incident: {p['summary']}",
+                f"Scope: {p['harm']}",
+                f"Details: {p['what_happened']}",
+                f"Remediation: {p['next_steps']}",
+                "Next update: within the hour.",
+            ]
+        )
+        return useful, join("Status: vibes.", p["pointless"])
+
+
+# Singleton instance
+offline_generator = OfflineGenerator()
@@ -0,0 +1,307 @@
+"""Compact prompt encoding and input token budgeting"""
+
+import json
+import math
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+from .channels import CHANNEL_SPECS
+from .models import (
+    BrandProfile,
+    Channel,
+    GenerateRequest,
+    Incident,
+    InterpretRequest,
+    Sliders,
+    Strategy,
+)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional; falls back to a length estimate
+    tiktoken = None
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessageParam
+
+# Approximate characters per token when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+class PromptTooLargeError(ValueError):
+    """The prompt exceeds the input token budget even after trimming"""
+
+
+def _defaults(model: type[BaseModel]) -> dict[str, Any]:
+    """Non-empty default values of a model's optional fields"""
+    defaults = {
+        name: to_jsonable_python(field.get_default(call_default_factory=True))
+        for name, field in model.model_fields.items()
+        if not field.is_required()
+    }
+    return {name: value for name, value in defaults.items() if value not in (None, "", [], {})}
+
+
+def compact_json(value: Any) -> str:
+    """Serialize without whitespace; field order follows the model, so it is stable"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def brand_fragment(profile: BrandProfile) -> str:
+    """Prompt line for a brand profile; stored profiles precompile this once"""
+    return f"BRAND PROFILE: {encode_model(profile)}"
+
+
+def encode_model(model: BaseModel) -> str:
+    """Compact JSON of a model with default-valued fields omitted"""
+    return compact_json(model.model_dump(mode="json", exclude_defaults=True))
+
+
+CHANNEL_RULES = "\n".join(f"- {spec.channel.value}: {spec.rule}" for spec in CHANNEL_SPECS.values())
+
+# The system prompts never vary between requests, so they form a stable
+# prefix that the upstream prompt cache can reuse.
+INTERPRET_SYSTEM_PROMPT = """You are the interpretation engine for Apology-as-a-Service (AaaS).
+
+Your job is to parse messy incident inputs into structured incident records.
+
+RULES:
+1. Never fabricate facts or evidence
+2. When evidence is missing, use "no evidence at this time" or "unknown"
+3. Extract entities, times, and numbers into the extractions field
+4. Assess severity based on harm scope and stakeholder impact
+5. Identify relevant regulatory jurisdictions
+6. Output valid JSON exactly matching the InterpretResponse schema
+
+Output only JSON, no prose outside JSON.
+Output JSON with fields: incident, notes, extractions."""
+
+GENERATE_SYSTEM_PROMPT = f"""You are the generation engine for Apology-as-a-Service (AaaS).
+
+Your job is to generate two apology variants per channel: useful and pointless.
+
+GLOBAL PRINCIPLES:
+- Truth & Evidence First: Never assert certainty without evidence
+- Duality: Always produce both useful and pointless variants
+- Non-Apology Detector: When contrition ≥ 60, ban "we regret any inconvenience" without ownership
+- Scapegoating Limits: Never target individuals or protected classes
+- Legal Hedging ≠ Lying: Use qualifiers without contradicting facts
+
+DETERMINISTIC MAPPINGS:
+Contrition (0-100):
+  0-20: neutral/indirect
+  21-59: partial ownership
+  ≥60: explicit "we caused/we failed" + restitution
+
+Legal Hedging (0-100):
+  0-20: plain language
+  21-59: add qualifiers ("to our knowledge", "pending investigation")
+  60-100: safe-harbor/force-majeure language
+
+Memes (0-100):
+  0-10: none
+  11-40: subtle idiom
+  41-70: tasteful unhinged
+  71-100: overt memes
+
+CHANNEL RULES:
+{CHANNEL_RULES}
+
+INPUT FORMAT:
+Request fields are compact JSON. Omitted fields take these defaults; omitted
+lists and text are empty, other omitted fields are unset.
+INCIDENT: {compact_json(_defaults(Incident))}
+SLIDERS: {compact_json(_defaults(Sliders))}
+STRATEGY: {compact_json(Strategy().model_dump(mode="json", exclude_none=True))}
+
+Generate drafts for ALL requested channels.
+Each channel must have both useful and pointless variants.
+Output only the drafts, as valid JSON:
+{{"drafts": {{"<channel>": {{"useful": "...", "pointless": "..."}}}}}}"""
+
+
+REPAIR_SYSTEM_PROMPT = f"""You are the revision engine for Apology-as-a-Service (AaaS).
+
+A draft broke its channel's length rules. Rewrite both variants so they
+follow the rules, keeping their facts, tone and intent.
+
+CHANNEL RULES:
+{CHANNEL_RULES}
+
+Output valid JSON: {{"drafts": {{"<channel>": {{"useful": "...", "pointless": "..."}}}}}}"""
+
+
+def interpret_user_prompt(request: InterpretRequest) -> str:
+    """User prompt for interpret mode"""
+    incident_input = request.incident_input
+    lines = [
+        "Parse this incident input into a structured record:",
+        "",
+        f"Text: {incident_input.text}",
+    ]
+    if incident_input.links:
+        lines.append(f"Links: {', '.join(incident_input.links)}")
+    if incident_input.files:
+        lines.append(f"Files: {', '.join(incident_input.files)}")
+    return "\n".join(lines)
+
+
+def generate_user_prompt(request: GenerateRequest) -> str:
+    """User prompt for generate mode: only what differs from the defaults"""
+    lines = [f"INCIDENT: {encode_model(request.incident)}"]
+
+    sliders = encode_model(request.sliders)
+    if sliders != "{}":
+        lines.append(f"SLIDERS: {sliders}")
+    strategy = encode_model(request.strategy)
+    if strategy != "{}":
+        lines.append(f"STRATEGY: {strategy}")
+
+    lines.append(f"TONE: {request.tone.value}")
+    lines.append(f"CHANNELS: {', '.join(c.value for c in request.channels)}")
+    lines.append(f"LOCALE: {request.locale}")
+    if request.brand_profile:
+        lines.append(brand_fragment(request.brand_profile))
+    elif request.stored_brand_profile:
+        lines.append(request.stored_brand_profile.fragment)
+
+    return "\n".join(lines)
+
+
+def interpret_messages(request: InterpretRequest) -> "list[ChatCompletionMessageParam]":
+    """Chat messages for an interpret request"""
+    return [
+        {"role": "system", "content": INTERPRET_SYSTEM_PROMPT},
+        {"role": "user", "content": interpret_user_prompt(request)},
+    ]
+
+
+def generate_messages(request: GenerateRequest) -> "list[ChatCompletionMessageParam]":
+    """Chat messages for a normalized generate request"""
+    return [
+        {"role": "system", "content": GENERATE_SYSTEM_PROMPT},
+        {"role": "user", "content": generate_user_prompt(request)},
+    ]
+
+
+def repair_messages(
+    channel: Channel, draft: dict[str, Any], problems: list[str]
+) -> "list[ChatCompletionMessageParam]":
+    """Chat messages asking to rewrite one channel's draft within its rules"""
+    user_prompt = "\n".join(
+        [
+            f"CHANNELS: {channel.value}",
+            f"PROBLEMS: {'; '.join(problems)}",
+            f"DRAFT: {compact_json({k: draft.get(k, '') for k in ('useful', 'pointless')})}",
+        ]
+    )
+    return [
+        {"role": "system", "content": REPAIR_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> Any:
+    """Tokenizer for a model, or None if unavailable"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Encodings are downloaded on first use; estimate if that fails
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Count tokens locally, estimating from length if tiktoken is missing"""
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: "list[ChatCompletionMessageParam]", model: str = "gpt-4") -> int:
+    """Count the input tokens of chat messages (content only, no framing overhead)"""
+    return sum(count_tokens(str(message.get("content") or ""), model) for message in messages)
+
+
+def fit_generate_budget(request: GenerateRequest, budget: int, model: str = "gpt-4") -> list[str]:
+    """Trim low-value fields until the prompt fits the input token budget
+
+    Brand exemplar paragraphs are dropped last-first. The request is
+    modified in place, so the result is deterministic for a given request.
+    A stored profile that doesn't fit is trimmed as a private copy, since
+    its precompiled fragment is shared; the request keeps naming the
+    stored profile and version.
+
+    Returns:
+        Adjustments describing what was dropped
+
+    Raises:
+        PromptTooLargeError: The prompt is still over budget with every
+            exemplar dropped
+    """
+
+    def tokens() -> int:
+        return count_message_tokens(generate_messages(request), model)
+
+    used = tokens()
+    stored = request.stored_brand_profile
+    brand = request.brand_profile
+    if used > budget and brand is None and stored is not None:
+        brand = stored.profile.model_copy(deep=True)
+
+    dropped = 0
+
+    def drop() -> None:
+        nonlocal dropped
+        assert brand is not None
+        brand.exemplar_paragraphs.pop()
+        dropped += 1
+        if request.brand_profile is None and stored is not None:
+            request.attach_brand_profile(
+                stored.model_copy(update={"profile": brand, "fragment": brand_fragment(brand)})
+            )
+
+    if used > budget and brand is not None and brand.exemplar_paragraphs:
+        # Count each exemplar once (plus its separator) and subtract, rather
+        # than re-encoding the whole prompt after every drop
+        costs = [count_tokens(compact_json(p), model) + 1 for p in brand.exemplar_paragraphs]
+        estimate = used
+        while brand.exemplar_paragraphs and estimate > budget:
+            estimate -= costs.pop()
+            drop()
+        used = tokens()
+        # Token boundaries can shift by a token or two; settle with exact counts
+        while brand.exemplar_paragraphs and used > budget:
+            drop()
+            used = tokens()
+
+    check_budget(used, budget)
+    if not dropped:
+        return []
+    return [f"Dropped {dropped} brand exemplar paragraph(s) to fit the input token budget"]
+
+
+def check_budget(used: int, budget: int) -> None:
+    """Raise PromptTooLargeError if a prompt of ``used`` tokens is over budget"""
+    if used > budget:
+        raise PromptTooLargeError(
+            f"Prompt needs {used} input tokens, over the {budget} token limit; "
+            "shorten the incident description"
+        )
+
+
+def check_interpret_budget(request: InterpretRequest, budget: int, model: str = "gpt-4") -> None:
+    """Refuse interpret input that doesn't fit the input token budget
+
+    Raises:
+        PromptTooLargeError: The prompt is over budget
+    """
+    check_budget(count_message_tokens(interpret_messages(request), model), budget)
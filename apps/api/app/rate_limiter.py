@@ -1,17 +1,116 @@
 """Rate limiting using Redis"""
 
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
 import redis.asyncio as redis
+from redis.commands.core import AsyncScript
 
 from .config import settings
 
+# Generic Cell Rate Algorithm: one key per client holding the theoretical
+# arrival time (TAT) in ms. Each request pushes the TAT forward by the
+# emission interval; a request is allowed while the TAT stays within one
+# window of now. This is a smooth sliding window with no edge bursts, and
+# decide-and-record happens atomically in a single round trip.
+#
+# The script grants up to ARGV[3] tokens but at least ARGV[4]; a plain check
+# passes the same value for both, a lease asks for a chunk and accepts less.
+#
+# KEYS[1] = rate limit key
+# ARGV[1] = emission interval in ms (window / limit)
+# ARGV[2] = window in ms
+# ARGV[3] = tokens wanted
+# ARGV[4] = minimum tokens to grant
+# Returns {granted, remaining, reset_after_ms, retry_after_ms}
+GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local minimum = tonumber(ARGV[4])
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+
+local available = math.floor((window - (tat - now)) / emission)
+local granted = math.min(wanted, available)
+
+if granted < minimum then
+    local retry_at = math.ceil(tat + emission * minimum) - window
+    return {0, available, tat - now, retry_at - now}
+end
+
+-- Whole milliseconds keep SET/PX exact; rounding up never over-admits
+local new_tat = math.ceil(tat + emission * granted)
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+local remaining = math.floor((window - (new_tat - now)) / emission)
+return {granted, remaining, new_tat - now, 0}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate limit check"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float = 0.0
+
+    def headers(self) -> dict[str, str]:
+        """X-RateLimit-* headers (plus Retry-After when denied)"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(int(self.reset_after + 0.999)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(int(self.retry_after + 0.999))
+        return headers
+
+
+@dataclass
+class _Lease:
+    """Quota leased from Redis and held by this worker"""
+
+    tokens: int
+    remaining: int
+    reset_at: float
+    blocked_until: float = 0.0
+
 
 class RateLimiter:
-    """Redis-based rate limiter"""
+    """Redis-based GCRA rate limiter with a local lease pre-filter
+
+    Each worker leases quota from Redis in chunks and spends it from an
+    in-memory bucket per client, so Redis is only touched once per lease.
+    Clients Redis has denied are rejected locally until their retry time.
+    Leased tokens are already charged in Redis, so the pre-filter never
+    admits more than the limit; at worst a worker strands fewer than one
+    lease of a client's quota.
+    """
 
     def __init__(self) -> None:
         self.redis_client: redis.Redis | None = None
         self.anon_limit = settings.rate_limit_anon
         self.authed_limit = settings.rate_limit_authed
+        self.window_ms = settings.rate_limit_window_seconds * 1000
+        self.lease_size = settings.rate_limit_lease_size
+        self.max_local_clients = settings.rate_limit_local_max_clients
+        self._script: AsyncScript | None = None
+        self._leases: OrderedDict[str, _Lease] = OrderedDict()
+        self._pending: dict[str, asyncio.Future[None]] = {}
+        self.redis_calls = 0
+        self.local_hits = 0
+        self.local_blocks = 0
 
     async def _get_client(self) -> redis.Redis:
         """Get or create Redis client"""
@@ -19,41 +118,153 @@ class RateLimiter:
             self.redis_client = redis.from_url(settings.redis_url, decode_responses=True)
         return self.redis_client
 
-    async def check_rate_limit(self, client_id: str, is_authed: bool) -> bool:
-        """Check if client is within rate limit
+    async def _get_script(self) -> AsyncScript:
+        """Register the GCRA script (invoked via EVALSHA, loaded on first miss)"""
+        if self._script is None:
+            client = await self._get_client()
+            self._script = client.register_script(GCRA_SCRIPT)
+        return self._script
+
+    def limit_for(self, is_authed: bool) -> int:
+        """Requests allowed per window for a client"""
+        return self.authed_limit if is_authed else self.anon_limit
+
+    def _lease_size(self, limit: int) -> int:
+        """Chunk size for a limit, capped at a tenth of it to bound stranding"""
+        return max(1, min(self.lease_size, limit // 10))
+
+    async def _take(
+        self, key: str, limit: int, wanted: int, minimum: int
+    ) -> tuple[int, int, float, float]:
+        """Run the GCRA script: (granted, remaining, reset_after, retry_after)"""
+        self.redis_calls += 1
+        script = await self._get_script()
+        granted, remaining, reset_ms, retry_ms = await script(
+            keys=[key], args=[self.window_ms / limit, self.window_ms, wanted, minimum]
+        )
+        return int(granted), max(int(remaining), 0), int(reset_ms) / 1000, int(retry_ms) / 1000
+
+    async def check_rate_limit(
+        self, client_id: str, is_authed: bool, cost: int = 1
+    ) -> RateLimitResult:
+        """Check if client is within rate limit, recording the request if so
 
         Args:
             client_id: Unique client identifier
             is_authed: Whether client is authenticated
+            cost: Number of requests to charge (e.g. batch size)
 
         Returns:
-            True if within limit, False if exceeded
+            Result with the decision and quota for X-RateLimit-* headers
         """
-        try:
-            client = await self._get_client()
-            key = f"ratelimit:{client_id}"
-
-            # Get current count
-            count = await client.get(key)
-            current = int(count) if count else 0
+        limit = self.limit_for(is_authed)
+        key = f"ratelimit:{client_id}"
+        now = time.monotonic()
 
-            # Check limit
-            limit = self.authed_limit if is_authed else self.anon_limit
+        while True:
+            lease = self._leases.get(key)
+            if lease is not None:
+                self._leases.move_to_end(key)
+                if lease.blocked_until > now:
+                    self.local_blocks += 1
+                    return RateLimitResult(
+                        allowed=False,
+                        limit=limit,
+                        remaining=0,
+                        reset_after=max(lease.reset_at - now, 0.0),
+                        retry_after=lease.blocked_until - now,
+                    )
+                if lease.tokens >= cost:
+                    self.local_hits += 1
+                    lease.tokens -= cost
+                    return RateLimitResult(
+                        allowed=True,
+                        limit=limit,
+                        remaining=lease.remaining + lease.tokens,
+                        reset_after=max(lease.reset_at - now, 0.0),
+                    )
 
-            if current >= limit:
-                return False
+            # Wait for an in-flight lease for this client instead of stampeding Redis
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            await asyncio.shield(pending)
+            now = time.monotonic()
 
-            # Increment and set TTL (1 hour)
-            pipe = client.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, 3600)
-            await pipe.execute()
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            return await self._lease(key, limit, cost, lease, now)
+        finally:
+            del self._pending[key]
+            future.set_result(None)
 
-            return True
+    async def _lease(
+        self, key: str, limit: int, cost: int, lease: _Lease | None, now: float
+    ) -> RateLimitResult:
+        """Lease a chunk of quota from Redis and charge ``cost`` against it"""
+        # Claim held tokens before awaiting so concurrent checks can't spend them too
+        held = 0
+        if lease is not None:
+            held, lease.tokens = lease.tokens, 0
+        needed = cost - held
 
+        try:
+            granted, remaining, reset_after, retry_after = await self._take(
+                key, limit, max(needed, self._lease_size(limit)), needed
+            )
         except Exception:
+            if lease is not None:
+                lease.tokens += held
             # If Redis is down, allow the request (fail open)
-            return True
+            return RateLimitResult(allowed=True, limit=limit, remaining=limit, reset_after=0.0)
+
+        # Merge with tokens another check may have returned meanwhile
+        current = self._leases.get(key)
+        tokens = (current.tokens if current is not None else 0) + held
+        allowed = granted > 0
+        if allowed:
+            tokens += granted - cost
+
+        # retry_after is when all ``needed`` units free up; block the client
+        # locally only until a single unit does, so a denied batch doesn't
+        # also refuse the client's next single request
+        unit_retry_after = retry_after - (needed - 1) * self.window_ms / limit / 1000
+        self._store_lease(
+            key,
+            _Lease(
+                tokens=tokens,
+                remaining=remaining,
+                reset_at=now + reset_after,
+                blocked_until=now + unit_retry_after
+                if not allowed and tokens == 0 and unit_retry_after > 0
+                else 0.0,
+            ),
+        )
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=remaining + tokens if allowed else remaining,
+            reset_after=reset_after,
+            retry_after=retry_after,
+        )
+
+    def _store_lease(self, key: str, lease: _Lease) -> None:
+        """Keep a client's lease, evicting least recently seen clients"""
+        self._leases[key] = lease
+        self._leases.move_to_end(key)
+        while len(self._leases) > self.max_local_clients:
+            self._leases.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """Return Redis round trips versus locally decided checks"""
+        return {
+            "redis_calls": self.redis_calls,
+            "local_hits": self.local_hits,
+            "local_blocks": self.local_blocks,
+            "local_clients": len(self._leases),
+        }
 
     async def close(self) -> None:
         """Close Redis connection"""
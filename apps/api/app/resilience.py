@@ -0,0 +1,303 @@
+"""Adaptive concurrency limiting and circuit breaking for upstream LLM calls"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from .config import settings
+
+
+class UpstreamUnavailableError(Exception):
+    """The upstream is shedding load or its circuit is open; retry later"""
+
+    def __init__(self, message: str, retry_after: float = 1.0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether an error means the upstream is throttling or unhealthy"""
+    import openai  # already loaded by the time a call can fail
+
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    # APITimeoutError is an APIConnectionError
+    return isinstance(error, openai.APIConnectionError | asyncio.TimeoutError)
+
+
+class AdaptiveLimiter:
+    """AIMD limit on in-flight upstream calls
+
+    The limit grows by one per limit's worth of successful calls (about one
+    per round trip) and is cut by ``backoff`` on a 429/5xx/timeout. Cuts are
+    applied at most once per ``decrease_interval`` so a burst of errors from
+    one overload counts once.
+
+    With ``latency_tolerance`` set, a call taking longer than that many times
+    the fastest recent call also cuts the limit. It is off by default: LLM
+    call duration tracks output length, so with mixed traffic a long draft
+    looks like queueing next to a short one.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        latency_tolerance: float | None,
+        queue_timeout: float,
+        backoff: float = 0.5,
+        decrease_interval: float = 1.0,
+    ) -> None:
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.decrease_interval = decrease_interval
+        self.inflight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._latencies: deque[float] = deque(maxlen=100)
+        self._last_decrease = 0.0
+        self.rejected = 0
+        self.decreases = 0
+
+    async def acquire(self) -> None:
+        """Wait for an in-flight slot, shedding the call if the queue wait is too long"""
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+
+        # Slots are handed to waiters in FIFO order by _wake
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except BaseException:
+            # Cancelled while queued: give back a slot we were just handed
+            if waiter.done():
+                self.release()
+            else:
+                self._forget(waiter)
+            raise
+
+        if not waiter.done():
+            self._forget(waiter)
+            self.rejected += 1
+            raise UpstreamUnavailableError("Upstream concurrency limit reached")
+
+    def _forget(self, waiter: asyncio.Future[None]) -> None:
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        self.inflight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to queued callers"""
+        while self._waiters and self.inflight < int(self.limit):
+            self._waiters.popleft().set_result(None)
+            self.inflight += 1
+
+    def on_success(self, latency: float | None) -> None:
+        """Grow the limit, unless the call was slow enough to signal queueing"""
+        if latency is not None and self.latency_tolerance is not None:
+            self._latencies.append(latency)
+            baseline = min(self._latencies)
+            if len(self._latencies) >= 10 and latency > baseline * self.latency_tolerance:
+                self.on_overload()
+                return
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self) -> None:
+        """Cut the limit multiplicatively"""
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_interval:
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.limit = max(self.minimum, self.limit * self.backoff)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+            "decreases": self.decreases,
+        }
+
+
+class CircuitBreaker:
+    """Open after too many recent upstream failures; probe again after a cooldown
+
+    ``closed``: calls flow and outcomes are tracked over the last ``window``
+    calls. Once at least ``min_calls`` are tracked and the failure ratio
+    reaches ``failure_ratio`` the breaker opens. ``open``: calls fail fast
+    for ``reset_timeout`` seconds. ``half_open``: one probe call is let
+    through; success closes the breaker, failure reopens it.
+    """
+
+    def __init__(
+        self, failure_ratio: float, min_calls: int, window: int, reset_timeout: float
+    ) -> None:
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self.opens = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = "half_open"
+        return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will let a probe through"""
+        return max(self._opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def allow(self) -> str | None:
+        """Admit a call upstream now, if the breaker lets it through
+
+        Returns:
+            "call" while closed, "probe" for the single half-open probe, or
+            None to fail fast. Pass ``probe=True`` to the ``record_*`` call
+            for a probe, so only the probe's outcome releases it.
+        """
+        state = self.state
+        if state == "closed":
+            return "call"
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return "probe"
+        self.short_circuited += 1
+        return None
+
+    def record_success(self, probe: bool = False) -> None:
+        if self._state == "half_open":
+            self._state = "closed"
+            self._outcomes.clear()
+        if probe:
+            self._probing = False
+        self._outcomes.append(True)
+
+    def record_ignored(self, probe: bool = False) -> None:
+        """Release a half-open probe whose outcome says nothing about upstream health"""
+        if probe:
+            self._probing = False
+
+    def record_failure(self, probe: bool = False) -> None:
+        if probe:
+            self._probing = False
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if self._state == "half_open" or (
+            len(self._outcomes) >= self.min_calls
+            and failures / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self._state = "open"
+        self._opened_at = time.monotonic()
+        self.opens += 1
+
+    def stats(self) -> dict[str, Any]:
+        state = self.state
+        return {
+            "state": state,
+            "failure_ratio": round(self._outcomes.count(False) / len(self._outcomes), 3)
+            if self._outcomes
+            else 0.0,
+            "retry_after": round(self.retry_after(), 1) if state == "open" else 0.0,
+            "opens": self.opens,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class UpstreamGuard:
+    """Circuit breaker plus adaptive limiter around each upstream call"""
+
+    def __init__(
+        self, limiter: AdaptiveLimiter | None = None, breaker: CircuitBreaker | None = None
+    ) -> None:
+        self.limiter = limiter or AdaptiveLimiter(
+            initial=settings.upstream_concurrency_initial,
+            minimum=settings.upstream_concurrency_min,
+            maximum=settings.upstream_concurrency_max,
+            latency_tolerance=settings.upstream_latency_tolerance,
+            queue_timeout=settings.upstream_queue_timeout_seconds,
+        )
+        self.breaker = breaker or CircuitBreaker(
+            failure_ratio=settings.breaker_failure_ratio,
+            min_calls=settings.breaker_min_calls,
+            window=settings.breaker_window,
+            reset_timeout=settings.breaker_reset_seconds,
+        )
+
+    @asynccontextmanager
+    async def slot(self, measure_latency: bool = True) -> AsyncIterator[None]:
+        """Hold an upstream slot for the duration of one call
+
+        Args:
+            measure_latency: Feed the call's duration to the limiter. Off for
+                streams, whose duration tracks output length, not queueing.
+
+        Raises:
+            UpstreamUnavailableError: The circuit is open or no slot freed up
+        """
+        admitted = self.breaker.allow()
+        if admitted is None:
+            raise UpstreamUnavailableError(
+                "Upstream unavailable (circuit open)", retry_after=self.breaker.retry_after()
+            )
+        probe = admitted == "probe"
+
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            # Shedding or cancellation at our end isn't an upstream failure,
+            # but a half-open probe must be released either way
+            self.breaker.record_ignored(probe)
+            raise
+
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            if is_overload(e):
+                self.limiter.on_overload()
+                self.breaker.record_failure(probe)
+            else:
+                # Not an upstream health problem (bad output, cancellation)
+                self.breaker.record_ignored(probe)
+            raise
+        else:
+            self.limiter.on_success(time.perf_counter() - start if measure_latency else None)
+            self.breaker.record_success(probe)
+        finally:
+            self.limiter.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {"breaker": self.breaker.stats(), "limiter": self.limiter.stats()}
+
+
+def retry_after_header(error: UpstreamUnavailableError) -> dict[str, str]:
+    """Retry-After header for a 503"""
+    return {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+
+
+# Singleton instance
+upstream_guard = UpstreamGuard()
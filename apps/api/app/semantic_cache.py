@@ -0,0 +1,427 @@
+"""Semantic near-duplicate cache backed by pgvector"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import math
+import re
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Protocol
+
+from .config import settings
+from .models import GenerateRequest, InterpretRequest
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Length of the (unit-normalized) slider/strategy block relative to the
+# unit-length text embedding: small, so incident text dominates the distance
+NUMERIC_WEIGHT = 0.25
+
+# Band edges of the generate prompt's deterministic slider mappings. Sliders
+# in different bands produce materially different drafts, so they are part
+# of the exact-match scope rather than the distance.
+SLIDER_BANDS = {
+    "contrition": (21, 60),
+    "legal_hedging": (21, 60),
+    "memes": (11, 41, 71),
+}
+
+# Seconds between deletes of expired rows, per process
+PURGE_INTERVAL_SECONDS = 300.0
+
+
+class Embedder(Protocol):
+    """Text embedding backend"""
+
+    dimensions: int
+
+    async def embed(self, text: str) -> list[float]:
+        """Embed text into a unit-length vector of ``dimensions`` floats"""
+        ...
+
+
+class HashingEmbedder:
+    """Deterministic local embedder using signed feature hashing
+
+    Hashes unigrams and bigrams into a fixed number of buckets. It needs no
+    network or model weights, so it doubles as the stand-in for tests.
+    """
+
+    def __init__(self, dimensions: int = 256) -> None:
+        self.dimensions = dimensions
+
+    async def embed(self, text: str) -> list[float]:
+        """Embed text by hashing its tokens"""
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dimensions] += sign
+
+        return _normalize(vector)
+
+
+class OpenAIEmbedder:
+    """Embedder using the OpenAI embeddings API"""
+
+    def __init__(self, model: str, dimensions: int) -> None:
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        self.model = model
+        self.dimensions = dimensions
+
+    async def embed(self, text: str) -> list[float]:
+        """Embed text with the configured embedding model"""
+        response = await self.client.embeddings.create(
+            model=self.model, input=text, dimensions=self.dimensions
+        )
+        return _normalize(list(response.data[0].embedding))
+
+
+def _normalize(vector: list[float]) -> list[float]:
+    """Scale a vector to unit length (zero vectors are returned unchanged)"""
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0.0:
+        return vector
+    return [v / norm for v in vector]
+
+
+def cosine_distance(a: list[float], b: list[float]) -> float:
+    """Cosine distance between two vectors"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    if norm == 0.0:
+        return 1.0
+    return 1.0 - dot / norm
+
+
+@dataclass
+class SemanticQuery:
+    """A cache lookup: exact-match scope plus text and numeric features"""
+
+    scope: str
+    text: str
+    features: list[float] = field(default_factory=list)
+    vector: list[float] | None = None
+
+
+# Number of numeric features per query; interpret queries are zero-padded
+NUMERIC_FEATURES = 12
+
+
+def generate_query(request: GenerateRequest, model: str) -> SemanticQuery:
+    """Build a semantic query for a normalized generate request
+
+    Channels, tone, severity, locale, strategy types, slider bands and
+    brand (or stored brand profile version) must match exactly; incident
+    text and slider/strategy values are compared by cosine distance.
+    """
+    incident = request.incident
+    scope_parts = {
+        "kind": "generate",
+        "model": model,
+        "channels": sorted(c.value for c in request.channels),
+        "tone": request.tone.value,
+        "severity": incident.severity.value,
+        "locale": request.locale,
+        "scapegoat": request.strategy.scapegoat.type,
+        "distraction": request.strategy.distraction.type,
+        "brand": request.brand_name,
+        "bands": [
+            bisect.bisect_right(edges, getattr(request.sliders, name))
+            for name, edges in SLIDER_BANDS.items()
+        ],
+    }
+    if request.brand_profile_id is not None:
+        # Stored profiles change by version, not by name
+        scope_parts["brand_profile"] = f"{request.brand_profile_id}@{request.brand_profile_version}"
+    sliders = request.sliders
+    strategy = request.strategy
+    features = [
+        sliders.contrition / 100,
+        sliders.legal_hedging / 100,
+        sliders.memes / 100,
+        sliders.accountability_evasion / 100,
+        sliders.profit_alchemist / 100,
+        sliders.risk_transfer / 100,
+        sliders.data_fog / 100,
+        sliders.pseudo_transparency / 100,
+        strategy.scapegoat.intensity / 100,
+        strategy.distraction.intensity / 100,
+        strategy.responsibility_split.brand,
+        1.0 if strategy.victimless_frame else 0.0,
+    ]
+    return SemanticQuery(
+        scope=_scope_hash(scope_parts),
+        text="\n".join([incident.summary, incident.what, incident.harm]),
+        features=features,
+    )
+
+
+def interpret_query(request: InterpretRequest, model: str) -> SemanticQuery:
+    """Build a semantic query for an interpret request"""
+    scope_parts = {"kind": "interpret", "model": model}
+    return SemanticQuery(
+        scope=_scope_hash(scope_parts),
+        text=request.incident_input.text,
+        features=[0.0] * NUMERIC_FEATURES,
+    )
+
+
+def _scope_hash(parts: Mapping[str, object]) -> str:
+    """Hash the exact-match part of a query"""
+    canonical = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class VectorStore(Protocol):
+    """Nearest-neighbour storage for cached payloads"""
+
+    async def nearest(self, scope: str, vector: list[float]) -> tuple[float, str] | None:
+        """Return (cosine distance, payload) of the closest live entry in scope"""
+        ...
+
+    async def add(self, scope: str, vector: list[float], payload: str) -> None:
+        """Store a payload under its vector"""
+        ...
+
+
+class InMemoryVectorStore:
+    """Brute-force in-process vector store for tests and single-node setups"""
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._entries: list[tuple[float, str, list[float], str]] = []
+
+    async def nearest(self, scope: str, vector: list[float]) -> tuple[float, str] | None:
+        """Scan entries in scope for the closest live vector"""
+        cutoff = time.monotonic() - self.ttl
+        best: tuple[float, str] | None = None
+        for created, entry_scope, entry_vector, payload in self._entries:
+            if entry_scope != scope or created < cutoff:
+                continue
+            distance = cosine_distance(vector, entry_vector)
+            if best is None or distance < best[0]:
+                best = (distance, payload)
+        return best
+
+    async def add(self, scope: str, vector: list[float], payload: str) -> None:
+        """Append an entry, dropping expired ones"""
+        now = time.monotonic()
+        self._entries = [entry for entry in self._entries if entry[0] >= now - self.ttl]
+        self._entries.append((now, scope, vector, payload))
+
+
+class PgVectorStore:
+    """pgvector-backed store with an approximate nearest-neighbour index
+
+    SQLAlchemy and pgvector are imported on construction, which the
+    semantic cache defers to its first lookup, so they stay off the import path.
+    """
+
+    def __init__(self, dimensions: int, ttl: int, index: str = "hnsw") -> None:
+        from pgvector.sqlalchemy import Vector
+        from sqlalchemy import Column, DateTime, Integer, String, Table, Text, func
+
+        from .db import metadata
+
+        if index not in ("hnsw", "ivfflat"):
+            raise ValueError(f"Unsupported index type: {index}")
+        self.dimensions = dimensions
+        self.ttl = ttl
+        self.index = index
+        self.table = Table(
+            "semantic_cache",
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("scope", String(64), nullable=False, index=True),
+            Column("embedding", Vector(dimensions), nullable=False),
+            Column("payload", Text, nullable=False),
+            Column("created_at", DateTime(timezone=True), server_default=func.now()),
+            extend_existing=True,
+        )
+        self._ready = False
+        self._last_purge = float("-inf")
+
+    def _ensure_schema(self) -> None:
+        """Create the extension, table and indexes on first use"""
+        if self._ready:
+            return
+
+        from sqlalchemy import text
+
+        from .db import get_engine
+
+        engine = get_engine()
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            self.table.create(conn, checkfirst=True)
+            options = " WITH (lists = 100)" if self.index == "ivfflat" else ""
+            conn.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS semantic_cache_embedding_{self.index} "
+                    f"ON semantic_cache USING {self.index} (embedding vector_cosine_ops)"
+                    f"{options}"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS semantic_cache_created_at "
+                    "ON semantic_cache (created_at)"
+                )
+            )
+        self._ready = True
+
+    def _nearest_sync(self, scope: str, vector: list[float]) -> tuple[float, str] | None:
+        from sqlalchemy import func, select, text
+
+        from .db import get_engine
+
+        self._ensure_schema()
+        distance = self.table.c.embedding.cosine_distance(vector)
+        query = (
+            select(self.table.c.payload, distance.label("distance"))
+            .where(self.table.c.scope == scope)
+            .where(self.table.c.created_at > func.now() - text(f"interval '{self.ttl} seconds'"))
+            .order_by(distance)
+            .limit(1)
+        )
+        with get_engine().connect() as conn:
+            row = conn.execute(query).first()
+        if row is None:
+            return None
+        return float(row.distance), row.payload
+
+    def _add_sync(self, scope: str, vector: list[float], payload: str) -> None:
+        from sqlalchemy import func, text
+
+        from .db import get_engine
+
+        self._ensure_schema()
+        with get_engine().begin() as conn:
+            conn.execute(self.table.insert().values(scope=scope, embedding=vector, payload=payload))
+            # Lookups skip expired rows; delete them now and then so the table stays bounded
+            if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.monotonic()
+                cutoff = func.now() - text(f"interval '{self.ttl} seconds'")
+                conn.execute(self.table.delete().where(self.table.c.created_at < cutoff))
+
+    async def nearest(self, scope: str, vector: list[float]) -> tuple[float, str] | None:
+        """Query the ANN index off the event loop"""
+        return await asyncio.to_thread(self._nearest_sync, scope, vector)
+
+    async def add(self, scope: str, vector: list[float], payload: str) -> None:
+        """Insert a row off the event loop"""
+        await asyncio.to_thread(self._add_sync, scope, vector, payload)
+
+
+class SemanticCache:
+    """Serve stored results for near-duplicate requests"""
+
+    def __init__(self, embedder: Embedder | None = None, store: VectorStore | None = None) -> None:
+        self.enabled = settings.semantic_cache_enabled
+        self.max_distance = settings.semantic_cache_max_distance
+        self._embedder = embedder
+        self._store = store
+        self.lookups = 0
+        self.hits = 0
+        self.near_misses = 0
+        self.empty = 0
+        self.errors = 0
+
+    @property
+    def embedder(self) -> Embedder:
+        """Get or create the configured embedder"""
+        if self._embedder is None:
+            embedder: Embedder
+            if settings.semantic_cache_embedder == "openai":
+                embedder = OpenAIEmbedder(
+                    settings.semantic_cache_embedding_model, settings.semantic_cache_dimensions
+                )
+            else:
+                embedder = HashingEmbedder(settings.semantic_cache_dimensions)
+            self._embedder = embedder
+        return self._embedder
+
+    @property
+    def store(self) -> VectorStore:
+        """Get or create the configured vector store"""
+        if self._store is None:
+            self._store = PgVectorStore(
+                self.embedder.dimensions + NUMERIC_FEATURES,
+                settings.semantic_cache_ttl_seconds,
+                settings.semantic_cache_index,
+            )
+        return self._store
+
+    async def _vector(self, query: SemanticQuery) -> list[float]:
+        """Embed a query once: unit text embedding plus weighted numeric block"""
+        if query.vector is None:
+            embedding = await self.embedder.embed(query.text)
+            query.vector = embedding + [f * NUMERIC_WEIGHT for f in _normalize(query.features)]
+        return query.vector
+
+    async def get(self, query: SemanticQuery) -> str | None:
+        """Return the payload of a near-duplicate within max_distance
+
+        Args:
+            query: Query from ``generate_query`` or ``interpret_query``
+
+        Returns:
+            Cached payload, or None on miss
+        """
+        if not self.enabled:
+            return None
+
+        self.lookups += 1
+        try:
+            nearest = await self.store.nearest(query.scope, await self._vector(query))
+        except Exception:
+            # If the store is down, behave as a miss
+            self.errors += 1
+            return None
+
+        if nearest is None:
+            self.empty += 1
+            return None
+
+        distance, payload = nearest
+        if distance > self.max_distance:
+            self.near_misses += 1
+            return None
+
+        self.hits += 1
+        return payload
+
+    async def set(self, query: SemanticQuery, payload: str) -> None:
+        """Store a validated payload for future near-duplicates"""
+        if not self.enabled:
+            return
+
+        try:
+            await self.store.add(query.scope, await self._vector(query), payload)
+        except Exception:
+            self.errors += 1
+
+    def stats(self) -> dict[str, float]:
+        """Return lookup counters and the threshold hit rate"""
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "near_misses": self.near_misses,
+            "empty": self.empty,
+            "errors": self.errors,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+        }
+
+
+# Singleton instance
+semantic_cache = SemanticCache()
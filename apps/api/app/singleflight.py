@@ -0,0 +1,202 @@
+"""Request coalescing (single-flight) for identical in-flight upstream calls"""
+
+import asyncio
+import json
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+import redis.asyncio as redis
+
+from .config import settings
+
+
+@dataclass
+class _Flight:
+    """One shared call and the number of callers awaiting it"""
+
+    task: "asyncio.Task[str]"
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Share one in-flight upstream call between concurrent identical callers
+
+    Within a process, callers with the same key await one task that runs
+    the call. The task belongs to the flight rather than to any caller, so a
+    caller that is cancelled (client disconnect, timeout) leaves the others
+    waiting; the call is only cancelled once every caller has gone.
+    With ``singleflight_distributed`` enabled, workers also coordinate through
+    Redis: the worker that wins ``SET NX`` on the lock runs the call and
+    publishes the result; the others subscribe and take the hand-off, or run
+    the call themselves if it does not arrive in time.
+    """
+
+    def __init__(self) -> None:
+        self.redis_client: redis.Redis | None = None
+        self.distributed = settings.singleflight_distributed
+        self.lock_ttl_ms = settings.singleflight_lock_ttl_seconds * 1000
+        self.wait_seconds = settings.singleflight_wait_seconds
+        self._inflight: dict[str, _Flight] = {}
+        self.calls = 0
+        self.executions = 0
+        self.shared_local = 0
+        self.shared_remote = 0
+
+    async def _get_client(self) -> redis.Redis:
+        """Get or create Redis client"""
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+        return self.redis_client
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        """Run ``fn`` once per key across concurrent callers
+
+        Args:
+            key: Canonical request key (see ``cache_key``)
+            fn: Upstream call producing the serialized result
+
+        Returns:
+            The result of the shared call
+        """
+        self.calls += 1
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            call = self._do_distributed(key, fn) if self.distributed else self._execute(fn)
+            flight = _Flight(asyncio.create_task(call))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _: self._settle(key, flight))
+        else:
+            self.shared_local += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller has gone: stop the call and let new callers start afresh
+                flight.task.cancel()
+                self._settle(key, flight)
+
+    def _settle(self, key: str, flight: _Flight) -> None:
+        """Forget a finished or abandoned call"""
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        task = flight.task
+        if task.done() and not task.cancelled():
+            # Callers observe the exception; don't warn if there are none
+            task.exception()
+
+    async def _execute(self, fn: Callable[[], Awaitable[str]]) -> str:
+        """Run the upstream call"""
+        self.executions += 1
+        return await fn()
+
+    async def _do_distributed(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        """Coordinate the call across workers via a Redis lock and pub/sub"""
+        lock_key = f"singleflight:lock:{key}"
+        result_key = f"singleflight:result:{key}"
+        channel = f"singleflight:{key}"
+
+        try:
+            client = await self._get_client()
+            acquired = await client.set(lock_key, "1", nx=True, px=self.lock_ttl_ms)
+        except Exception:
+            # If Redis is down, coalesce within this process only
+            return await self._execute(fn)
+
+        if acquired:
+            return await self._lead(client, fn, lock_key, result_key, channel)
+
+        result = await self._follow(client, result_key, channel)
+        if result is not None:
+            self.shared_remote += 1
+            return result
+
+        # The leader failed or timed out: run the call ourselves
+        return await self._execute(fn)
+
+    async def _lead(
+        self,
+        client: redis.Redis,
+        fn: Callable[[], Awaitable[str]],
+        lock_key: str,
+        result_key: str,
+        channel: str,
+    ) -> str:
+        """Run the call and hand the result to waiting workers"""
+        try:
+            result = await self._execute(fn)
+        except BaseException:
+            await self._publish(client, channel, {"ok": False})
+            await self._release(client, lock_key)
+            raise
+
+        # Store briefly for followers that subscribe after the publish
+        try:
+            await client.set(result_key, result, px=self.lock_ttl_ms)
+        except Exception:
+            pass
+        await self._publish(client, channel, {"ok": True, "value": result})
+        await self._release(client, lock_key)
+        return result
+
+    async def _follow(self, client: redis.Redis, result_key: str, channel: str) -> str | None:
+        """Wait for the leader's result, returning None on failure or timeout"""
+        try:
+            pubsub = client.pubsub()
+            await pubsub.subscribe(channel)
+            try:
+                # The leader may have finished before we subscribed
+                stored = await client.get(result_key)
+                if stored is not None:
+                    return str(stored)
+
+                deadline = time.monotonic() + self.wait_seconds
+                while (remaining := deadline - time.monotonic()) > 0:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=remaining
+                    )
+                    if message is None:
+                        continue
+                    payload = json.loads(message["data"])
+                    return str(payload["value"]) if payload.get("ok") else None
+                return None
+            finally:
+                await pubsub.unsubscribe(channel)
+                await pubsub.close()
+        except Exception:
+            return None
+
+    async def _publish(self, client: redis.Redis, channel: str, payload: dict[str, object]) -> None:
+        try:
+            await client.publish(channel, json.dumps(payload))
+        except Exception:
+            pass
+
+    async def _release(self, client: redis.Redis, lock_key: str) -> None:
+        try:
+            await client.delete(lock_key)
+        except Exception:
+            pass
+
+    def stats(self) -> dict[str, int]:
+        """Return call counters; ``saved`` is upstream calls avoided"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "shared_local": self.shared_local,
+            "shared_remote": self.shared_remote,
+            "saved": self.shared_local + self.shared_remote,
+        }
+
+    async def close(self) -> None:
+        """Close Redis connection"""
+        if self.redis_client:
+            await self.redis_client.close()
+
+
+# Singleton instance
+singleflight = SingleFlight()
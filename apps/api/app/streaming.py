@@ -0,0 +1,111 @@
+"""Incremental parsing and Server-Sent Events helpers for streamed generations"""
+
+import json
+from dataclasses import dataclass
+from typing import Any
+
+import orjson
+
+DRAFT_FIELDS = ("useful", "pointless")
+
+
+@dataclass
+class _Frame:
+    """An open JSON container while scanning"""
+
+    is_object: bool
+    key: str | None = None
+    expect_key: bool = True
+
+
+class DraftStreamParser:
+    """Incremental JSON scanner that reports completed draft fields
+
+    Feed it the completion text in arbitrary chunks. Whenever the string
+    value at ``drafts.<channel>.useful`` or ``drafts.<channel>.pointless``
+    closes, it is returned from ``feed``. The scanner only tracks container
+    nesting and keys, so it never re-parses the buffered prefix.
+    """
+
+    def __init__(self) -> None:
+        self._stack: list[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._raw: list[str] = []
+        self.completed: dict[str, set[str]] = {}
+
+    def feed(self, chunk: str) -> list[tuple[str, str, str]]:
+        """Consume a chunk of completion text
+
+        Args:
+            chunk: Next piece of the JSON completion
+
+        Returns:
+            List of (channel, field, text) for draft fields completed in this chunk
+        """
+        events: list[tuple[str, str, str]] = []
+
+        for char in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._raw.append(char)
+                elif char == "\\":
+                    self._escape = True
+                    self._raw.append(char)
+                elif char == '"':
+                    self._in_string = False
+                    value = json.loads('"' + "".join(self._raw) + '"')
+                    if self._string_is_key:
+                        self._stack[-1].key = value
+                    else:
+                        event = self._on_string_value(value)
+                        if event is not None:
+                            events.append(event)
+                else:
+                    self._raw.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._raw = []
+                top = self._stack[-1] if self._stack else None
+                self._string_is_key = top is not None and top.is_object and top.expect_key
+            elif char == "{":
+                self._stack.append(_Frame(is_object=True))
+            elif char == "[":
+                self._stack.append(_Frame(is_object=False))
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+            elif char == ":":
+                if self._stack:
+                    self._stack[-1].expect_key = False
+            elif char == ",":
+                if self._stack and self._stack[-1].is_object:
+                    self._stack[-1].expect_key = True
+                    self._stack[-1].key = None
+
+        return events
+
+    def _on_string_value(self, value: str) -> tuple[str, str, str] | None:
+        """Report a completed string if it sits at drafts.<channel>.<field>"""
+        if len(self._stack) != 3 or not all(frame.is_object for frame in self._stack):
+            return None
+
+        root, channel, field = (frame.key for frame in self._stack)
+        if root != "drafts" or channel is None or field not in DRAFT_FIELDS:
+            return None
+
+        self.completed.setdefault(channel, set()).add(field)
+        return channel, field, value
+
+    def channel_complete(self, channel: str) -> bool:
+        """Whether both variants of a channel have been seen"""
+        return self.completed.get(channel, set()) >= set(DRAFT_FIELDS)
+
+
+def format_sse(event: str, data: dict[str, Any]) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
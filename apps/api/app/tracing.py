@@ -0,0 +1,144 @@
+"""OpenTelemetry tracing with tail-based sampling
+
+Spans are buffered per trace until the local root span ends. Traces that
+were slow or hit an error are always exported; of the rest only a small,
+trace-id-deterministic fraction is kept, so tracing stays cheap at full
+traffic while every slow request is still visible.
+"""
+
+import threading
+from collections import OrderedDict
+
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter
+from opentelemetry.trace import StatusCode
+
+from .config import settings
+
+# Trace ids are 128-bit; the low 64 bits are compared against the ratio
+_ID_MASK = (1 << 64) - 1
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """Decide per trace, once its local root ends, whether to export it
+
+    Args:
+        delegate: Processor that exports kept spans, normally a BatchSpanProcessor
+        latency_threshold: Keep every trace whose root took at least this long (s)
+        sample_ratio: Fraction of the remaining traces to keep
+        max_traces: Traces buffered at once; the oldest is dropped beyond this
+        max_spans: Spans buffered per trace; later spans are dropped
+    """
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        latency_threshold: float,
+        sample_ratio: float,
+        max_traces: int = 10_000,
+        max_spans: int = 512,
+    ) -> None:
+        self.delegate = delegate
+        self.latency_threshold_ns = int(latency_threshold * 1_000_000_000)
+        self.ratio_bound = int(sample_ratio * _ID_MASK)
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self._traces: OrderedDict[int, list[ReadableSpan]] = OrderedDict()
+        # Late spans (ending after their root) follow the trace's decision
+        self._decisions: OrderedDict[int, bool] = OrderedDict()
+        self._lock = threading.Lock()
+        self.kept = 0
+        self.dropped = 0
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        trace_id = span.context.trace_id if span.context else 0
+        is_root = span.parent is None or span.parent.is_remote
+
+        with self._lock:
+            decision = self._decisions.get(trace_id)
+            if decision is None:
+                buffered = self._traces.setdefault(trace_id, [])
+                if len(buffered) < self.max_spans:
+                    buffered.append(span)
+                if not is_root:
+                    while len(self._traces) > self.max_traces:
+                        self._traces.popitem(last=False)
+                        self.dropped += 1
+                    return
+
+                spans = self._traces.pop(trace_id)
+                decision = self._keep(trace_id, span, spans)
+                self._decisions[trace_id] = decision
+                while len(self._decisions) > self.max_traces:
+                    self._decisions.popitem(last=False)
+                if decision:
+                    self.kept += 1
+                else:
+                    self.dropped += 1
+            else:
+                spans = [span]
+
+        if decision:
+            for buffered_span in spans:
+                self.delegate.on_end(buffered_span)
+
+    def _keep(self, trace_id: int, root: ReadableSpan, spans: list[ReadableSpan]) -> bool:
+        """Slow or failed traces, plus a deterministic sample of the rest"""
+        duration = (root.end_time or 0) - (root.start_time or 0)
+        if duration >= self.latency_threshold_ns:
+            return True
+        if any(s.status.status_code == StatusCode.ERROR for s in spans):
+            return True
+        return (trace_id & _ID_MASK) < self.ratio_bound
+
+    def shutdown(self) -> None:
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+    def stats(self) -> dict[str, int]:
+        """Return kept and dropped trace counts"""
+        return {"kept": self.kept, "dropped": self.dropped, "buffered": len(self._traces)}
+
+
+def build_tracer_provider(
+    exporter: SpanExporter, latency_threshold: float, sample_ratio: float
+) -> TracerProvider:
+    """Tracer provider exporting tail-sampled traces in batches through ``exporter``"""
+    provider = TracerProvider(resource=Resource.create({SERVICE_NAME: settings.otel_service_name}))
+    provider.add_span_processor(
+        TailSamplingProcessor(BatchSpanProcessor(exporter), latency_threshold, sample_ratio)
+    )
+    return provider
+
+
+def setup_tracing() -> TracerProvider | None:
+    """Install the global tracer provider with an OTLP/HTTP exporter
+
+    Returns:
+        The provider (shut it down to flush on exit), or None if no
+        OTEL_EXPORTER_OTLP_ENDPOINT is configured
+    """
+    if not settings.otel_exporter_otlp_endpoint:
+        return None
+
+    # Imported here so the exporter is only needed when tracing is enabled
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+    exporter = OTLPSpanExporter(
+        endpoint=settings.otel_exporter_otlp_endpoint.rstrip("/") + "/v1/traces"
+    )
+    provider = build_tracer_provider(
+        exporter,
+        latency_threshold=settings.otel_tail_latency_threshold_seconds,
+        sample_ratio=settings.otel_tail_sample_ratio,
+    )
+    trace.set_tracer_provider(provider)
+    return provider
@@ -0,0 +1,137 @@
+"""Job worker process
+
+Run with ``python -m app.worker``. Each worker processes up to
+JOB_WORKER_CONCURRENCY jobs at a time; scale throughput by adding workers.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import signal
+import socket
+from typing import Any
+
+import httpx
+
+from .config import settings
+from .jobs import job_queue
+from .llm_engine import llm_engine
+from .models import GenerateRequest, InterpretRequest
+
+logger = logging.getLogger("app.worker")
+
+
+async def execute(record: dict[str, Any]) -> dict[str, Any]:
+    """Run the engine call for a job record and return the serialized result"""
+    if record["kind"] == "generate":
+        generate_result = await llm_engine.generate(GenerateRequest(**record["request"]))
+        return generate_result.model_dump(mode="json")
+
+    interpret_result = await llm_engine.interpret(InterpretRequest(**record["request"]))
+    return interpret_result.model_dump(mode="json")
+
+
+async def resolve_callback_host(url: httpx.URL) -> str:
+    """Resolve a callback URL's host to the address to connect to
+
+    Callback URLs come from clients, so every address the host resolves to
+    must be public: loopback, private, link-local (cloud metadata) and other
+    reserved ranges are refused unless JOB_CALLBACK_ALLOW_PRIVATE is set.
+
+    Raises:
+        ValueError: The host resolves to a non-public address
+    """
+    port = url.port or (443 if url.scheme == "https" else 80)
+    infos = await asyncio.get_running_loop().getaddrinfo(url.host, port, type=socket.SOCK_STREAM)
+    addresses = [ipaddress.ip_address(info[4][0]) for info in infos]
+    if not settings.job_callback_allow_private:
+        blocked = [str(a) for a in addresses if not a.is_global or a.is_multicast]
+        if blocked:
+            raise ValueError(f"Callback host {url.host} resolves to non-public {blocked[0]}")
+    return str(addresses[0])
+
+
+async def notify(record: dict[str, Any]) -> None:
+    """POST the final job status to the job's callback URL, if any"""
+    if not record.get("callback_url"):
+        return
+
+    url = httpx.URL(record["callback_url"])
+    try:
+        address = await resolve_callback_host(url)
+        async with httpx.AsyncClient(follow_redirects=False) as client:
+            # Connect to the checked address, so a second DNS answer can't redirect
+            # the request; Host and TLS (SNI, certificate) still use the hostname
+            await client.post(
+                url.copy_with(host=address),
+                json=job_queue.status(record).model_dump(mode="json"),
+                headers={"Host": url.netloc.decode("ascii")},
+                extensions={"sni_hostname": url.host},
+                timeout=10.0,
+            )
+    except (OSError, ValueError, httpx.HTTPError) as e:
+        logger.warning("Callback for job %s failed: %s", record["id"], e)
+
+
+async def process(record: dict[str, Any]) -> None:
+    """Process one job, retrying on failure"""
+    try:
+        result = await asyncio.wait_for(execute(record), settings.job_timeout_seconds)
+    except Exception as e:
+        error = "Timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+        if await job_queue.fail(record, f"Job failed: {error}"):
+            logger.info("Job %s attempt %d failed, retrying", record["id"], record["attempts"])
+            return
+        logger.warning("Job %s failed permanently: %s", record["id"], error)
+    else:
+        await job_queue.complete(record, result)
+
+    await notify(record)
+
+
+async def run_worker(stop: asyncio.Event) -> None:
+    """Pull and process jobs until ``stop`` is set"""
+    slots = asyncio.Semaphore(settings.job_worker_concurrency)
+    running: set[asyncio.Task[None]] = set()
+
+    while not stop.is_set():
+        await slots.acquire()
+        try:
+            record = await job_queue.dequeue(timeout=1)
+        except Exception as e:
+            slots.release()
+            logger.warning("Dequeue failed: %s", e)
+            await asyncio.sleep(1)
+            continue
+
+        if record is None:
+            slots.release()
+            continue
+
+        task = asyncio.create_task(process(record))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: slots.release())
+
+    # Let in-flight jobs finish before exiting
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+async def main() -> None:
+    """Worker entry point"""
+    logging.basicConfig(level=logging.INFO)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("Worker started (concurrency=%d)", settings.job_worker_concurrency)
+    try:
+        await run_worker(stop)
+    finally:
+        await job_queue.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
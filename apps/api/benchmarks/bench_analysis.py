@@ -0,0 +1,77 @@
+"""Benchmark local scoring of a full six-channel response
+
+Compares the single trie scan against one regex pass per detector
+category over each channel.
+
+Usage:
+    python -m benchmarks.bench_analysis --iterations 5000
+"""
+
+import argparse
+import time
+
+from app.analysis import (
+    APOLOGY_TERMS,
+    CLAIM_TERMS,
+    EXPLICIT_OWNERSHIP_TERMS,
+    HEDGE_TERMS,
+    NON_APOLOGY_TERMS,
+    PARTIAL_OWNERSHIP_TERMS,
+    analysis_engine,
+)
+from app.models import Channel
+from app.moderation import compile_terms
+from app.offline import offline_generator
+
+from .bench_fanout import percentile
+from .bench_offline import make_request
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    cases = []
+    for i in range(args.iterations):
+        request = make_request(i)
+        request.channels = list(Channel)
+        cases.append((request, offline_generator.generate(request, []).drafts))
+
+    samples = []
+    start = time.perf_counter()
+    for request, drafts in cases:
+        t = time.perf_counter()
+        analysis_engine.analyze(request, drafts)
+        samples.append((time.perf_counter() - t) * 1_000_000)
+    elapsed = time.perf_counter() - start
+
+    patterns = [
+        compile_terms(terms)
+        for terms in (
+            NON_APOLOGY_TERMS,
+            EXPLICIT_OWNERSHIP_TERMS,
+            PARTIAL_OWNERSHIP_TERMS,
+            APOLOGY_TERMS,
+            HEDGE_TERMS,
+            CLAIM_TERMS,
+        )
+    ]
+    naive_start = time.perf_counter()
+    for _, drafts in cases:
+        for draft in drafts.values():
+            for pattern in patterns:
+                pattern.findall(draft.useful)
+    naive = time.perf_counter() - naive_start
+
+    print(f"{args.iterations} six-channel responses scored in {elapsed:.2f}s")
+    print(f"throughput: {args.iterations / elapsed:,.0f} responses/s (one core)")
+    print(
+        f"latency us: p50={percentile(samples, 50):.0f} "
+        f"p99={percentile(samples, 99):.0f} max={max(samples):.0f}"
+    )
+    print(f"per-category passes (counting only): {args.iterations / naive:,.0f} responses/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark single-call vs fan-out generation against the mock upstream
+
+Usage:
+    python -m benchmarks.bench_fanout --iterations 20 --per-token-ms 0.5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.cache import response_cache
+from app.llm_engine import LLMEngine
+from app.models import Channel, GenerateRequest, Incident
+
+from .mock_openai import MockConfig, create_app, mock_client
+
+CHANNEL_MIXES = {
+    "twitter+email": [Channel.TWITTER, Channel.CUSTOMER_EMAIL],
+    "press+ceo+twitter": [Channel.PRESS_RELEASE, Channel.CEO_LETTER, Channel.TWITTER],
+    "all": list(Channel),
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_mode(
+    engine: LLMEngine, channels: list[Channel], parallel: bool, iterations: int
+) -> list[float]:
+    """Time ``iterations`` uncached generations in one mode"""
+    samples = []
+    for i in range(iterations):
+        request = GenerateRequest(
+            incident=Incident(summary=f"Outage {i}", what="Database down", harm="No logins"),
+            channels=channels,
+        )
+        start = time.perf_counter()
+        await engine.generate(request, use_cache=False, parallel=parallel)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--base-latency-ms", type=float, default=50.0)
+    parser.add_argument("--per-token-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    config = MockConfig(base_latency_ms=args.base_latency_ms, per_token_ms=args.per_token_ms)
+    engine = LLMEngine(client=mock_client(create_app(config)))
+    response_cache.enabled = False
+
+    print(f"{'mix':<20} {'mode':<10} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, channels in CHANNEL_MIXES.items():
+        for parallel in (False, True):
+            samples = await run_mode(engine, channels, parallel, args.iterations)
+            mode = "fan-out" if parallel else "single"
+            print(
+                f"{name:<20} {mode:<10} {statistics.median(samples):>10.1f} "
+                f"{percentile(samples, 95):>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""Benchmark moderation throughput as the rule list grows
+
+Compares the compiled trie alternation against one regex per term.
+
+Usage:
+    python -m benchmarks.bench_moderation --text-kb 256
+"""
+
+import argparse
+import random
+import re
+import string
+import time
+
+from app.moderation import CompiledRules, compile_terms
+
+RULE_COUNTS = [10, 100, 1_000, 10_000]
+# One regex per term gets slow quickly; skip it past this many rules
+NAIVE_MAX_RULES = 1_000
+
+
+def random_words(rng: random.Random, count: int) -> list[str]:
+    """Generate distinct lowercase pseudo-words"""
+    words: set[str] = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))))
+    return list(words)
+
+
+def build_text(
+    rng: random.Random, filler: list[str], terms: list[str], size: int, hit_rate: float
+) -> str:
+    """Build roughly ``size`` bytes of filler text with rule terms mixed in"""
+    parts: list[str] = []
+    length = 0
+    while length < size:
+        word = rng.choice(terms if rng.random() < hit_rate else filler)
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)
+
+
+def throughput(fn: object, text: str, repeats: int) -> float:
+    """MB/s for scanning ``text`` ``repeats`` times"""
+    assert callable(fn)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(text)
+    elapsed = time.perf_counter() - start
+    return len(text.encode()) * repeats / elapsed / 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--text-kb", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--hit-rate", type=float, default=0.02, help="Fraction of rule words")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    filler = random_words(rng, 5_000)
+
+    print(f"{'rules':>7} {'compile ms':>11} {'trie MB/s':>10} {'naive MB/s':>11} {'matches':>8}")
+    for count in RULE_COUNTS:
+        terms = random_words(rng, count)
+        text = build_text(rng, filler, terms, args.text_kb * 1024, args.hit_rate)
+
+        start = time.perf_counter()
+        rules = CompiledRules(
+            pattern=compile_terms(terms), categories={t: ["bench"] for t in terms}
+        )
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        trie = throughput(rules.scan, text, args.repeats)
+
+        naive = "-"
+        if count <= NAIVE_MAX_RULES:
+            patterns = [re.compile(rf"\b{re.escape(t)}\b", re.IGNORECASE) for t in terms]
+
+            def scan_naive(text: str) -> list[re.Match[str]]:
+                return [m for p in patterns for m in p.finditer(text)]
+
+            naive = f"{throughput(scan_naive, text, 1):.2f}"
+
+        print(
+            f"{count:>7} {compile_ms:>11.1f} {trie:>10.2f} {naive:>11} {len(rules.scan(text)):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark the offline template generator on one core
+
+Usage:
+    python -m benchmarks.bench_offline --iterations 20000
+"""
+
+import argparse
+import time
+
+from app.llm_engine import llm_engine
+from app.models import Channel, GenerateRequest, Incident, Severity, Sliders, Tone
+
+from .bench_fanout import percentile
+
+
+def make_request(i: int) -> GenerateRequest:
+    """Vary the input so nothing is trivially repeated"""
+    return GenerateRequest(
+        incident=Incident(
+            summary=f"Checkout outage {i}",
+            what="A bad deploy broke payments",
+            harm="Customers could not complete orders",
+            severity=list(Severity)[i % 3],
+        ),
+        sliders=Sliders(contrition=i % 101, legal_hedging=(i * 7) % 101, memes=(i * 13) % 101),
+        tone=list(Tone)[i % 5],
+        channels=[Channel.TWITTER, Channel.CUSTOMER_EMAIL],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    requests = [make_request(i) for i in range(args.iterations)]
+    samples = []
+    start = time.perf_counter()
+    for request in requests:
+        t = time.perf_counter()
+        llm_engine.generate_offline(request)
+        samples.append((time.perf_counter() - t) * 1_000_000)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.iterations} lucky-style generations in {elapsed:.2f}s")
+    print(f"throughput: {args.iterations / elapsed:,.0f} RPS (one core, generator only)")
+    print(
+        f"latency us: p50={percentile(samples, 50):.0f} "
+        f"p99={percentile(samples, 99):.0f} max={max(samples):.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Load test for the Redis rate limiter
+
+Fires concurrent checks for a handful of clients and reports per-check
+latency, how many requests were admitted versus the configured limit (any
+excess is overshoot) and how many Redis round trips were made. Compare
+``--lease-size 1`` with a larger lease to see the local pre-filter's
+effect. Requires a running Redis.
+
+Usage:
+    python -m benchmarks.bench_rate_limiter --requests 20000 --concurrency 500
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from app.rate_limiter import RateLimiter
+
+from .bench_fanout import percentile
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--lease-size", type=int, default=1, help="1 disables the pre-filter")
+    args = parser.parse_args()
+
+    limiter = RateLimiter()
+    limiter.anon_limit = args.limit
+    limiter.lease_size = args.lease_size
+    run_id = uuid.uuid4().hex[:8]
+    clients = [f"bench:{run_id}:{i}" for i in range(args.clients)]
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    admitted = dict.fromkeys(clients, 0)
+
+    async def check(i: int) -> None:
+        client_id = clients[i % len(clients)]
+        async with semaphore:
+            start = time.perf_counter()
+            result = await limiter.check_rate_limit(client_id, is_authed=False)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if result.allowed:
+            admitted[client_id] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(check(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    await limiter.close()
+
+    overshoot = sum(max(0, count - args.limit) for count in admitted.values())
+    print(f"checks:      {args.requests} in {elapsed:.2f}s ({args.requests / elapsed:,.0f}/s)")
+    print(f"latency ms:  p50={statistics.median(latencies):.3f} "
+          f"p95={percentile(latencies, 95):.3f} p99={percentile(latencies, 99):.3f}")
+    print(f"admitted:    {sum(admitted.values())} (limit {args.limit} x {args.clients} clients)")
+    print(f"overshoot:   {overshoot}")
+    print(f"redis calls: {limiter.stats()['redis_calls']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""Micro-benchmarks for each step of the JSON path
+
+Times the stdlib/dict path against the fast path for: parsing a completion,
+rendering the response body, formatting an SSE event and building the
+/v1/lucky request.
+
+Usage:
+    python -m benchmarks.bench_serialization --iterations 2000
+"""
+
+import argparse
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.analysis import analysis_engine
+from app.main import LUCKY_TEMPLATE, _lucky_request
+from app.models import (
+    ChannelDraft,
+    GenerateCompletion,
+    GenerateRequest,
+    GenerateResponse,
+    Incident,
+    LuckyRequest,
+    Sliders,
+)
+from app.streaming import format_sse
+
+from .mock_openai import build_completion
+
+CHANNELS = ["press_release", "ceo_letter", "customer_email", "status_page", "twitter"]
+
+
+def timed(fn: Callable[[], Any], iterations: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    content, _ = build_completion(CHANNELS)
+    request = GenerateRequest(
+        incident=Incident(summary="Outage", what="Deploy broke checkout", harm="Orders failed")
+    )
+    completion = GenerateCompletion.model_validate_json(content)
+    metrics, detectors = analysis_engine.analyze(request, completion.drafts)
+    payload = GenerateResponse(
+        drafts=completion.drafts, metrics=metrics, detectors=detectors
+    ).model_dump(mode="json")
+    body = LuckyRequest(summary="Outage", what="Deploy broke checkout", harm="Orders failed")
+
+    def parse_dict() -> None:
+        result = json.loads(content)
+        {channel: ChannelDraft(**draft) for channel, draft in result["drafts"].items()}
+
+    def build_lucky() -> None:
+        GenerateRequest(
+            incident=Incident(
+                summary=body.summary, what=body.what, harm=body.harm, severity=body.severity
+            ),
+            sliders=Sliders(**LUCKY_TEMPLATE.sliders.model_dump()),
+            tone=LUCKY_TEMPLATE.tone,
+            channels=list(LUCKY_TEMPLATE.channels),
+        )
+
+    steps = [
+        (
+            "parse completion",
+            parse_dict,
+            lambda: GenerateCompletion.model_validate_json(content),
+        ),
+        ("render response", lambda: JSONResponse(payload), lambda: ORJSONResponse(payload)),
+        (
+            "format SSE result",
+            lambda: f"event: result\ndata: {json.dumps(payload)}\n\n",
+            lambda: format_sse("result", payload),
+        ),
+        ("build lucky request", build_lucky, lambda: _lucky_request(body)),
+    ]
+
+    print(f"payload: {len(content):,} bytes of drafts across {len(CHANNELS)} channels")
+    print(f"{'step':<22} {'stdlib us':>10} {'fast us':>9} {'speedup':>8}")
+    for name, slow, fast in steps:
+        slow_us = timed(slow, args.iterations)
+        fast_us = timed(fast, args.iterations)
+        print(f"{name:<22} {slow_us:>10.1f} {fast_us:>9.1f} {slow_us / fast_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
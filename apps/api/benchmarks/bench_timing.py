@@ -0,0 +1,130 @@
+"""Per-request overhead of the timing middleware
+
+Drives a minimal app directly over ASGI, with no middleware, with the old
+``@app.middleware("http")`` timing function (BaseHTTPMiddleware) and with
+the pure ASGI ``TimingMiddleware``, for a JSON and a streamed response.
+
+Usage:
+    python -m benchmarks.bench_timing --iterations 5000
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.types import Message, Scope
+
+from app.metrics import REQUEST_SECONDS, stage
+from app.timing import TimingMiddleware
+
+
+def observe(scope: Scope, status_code: int, seconds: float) -> None:
+    route = scope.get("route")
+    REQUEST_SECONDS.labels(
+        scope["method"], getattr(route, "path", "unmatched"), str(status_code)
+    ).observe(seconds)
+
+
+def build(middleware: str) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    @app.get("/json")
+    async def json_route() -> dict[str, Any]:
+        with stage("rate_limit"):
+            pass
+        return {"drafts": {"twitter": {"useful": "Sorry.", "pointless": "Oops."}}}
+
+    @app.get("/stream")
+    async def stream_route() -> StreamingResponse:
+        async def events() -> AsyncIterator[str]:
+            for i in range(10):
+                yield f"event: draft\ndata: {i}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    if middleware == "http":
+
+        @app.middleware("http")
+        async def add_process_time_header(request: Request, call_next: Any) -> Any:
+            start_time = time.perf_counter()
+            response = await call_next(request)
+            process_time = time.perf_counter() - start_time
+            response.headers["X-Process-Time"] = str(process_time)
+            route = request.scope.get("route")
+            REQUEST_SECONDS.labels(
+                request.method, getattr(route, "path", "unmatched"), str(response.status_code)
+            ).observe(process_time)
+            return response
+
+    elif middleware == "asgi":
+        app.add_middleware(TimingMiddleware, on_complete=observe)
+    return app
+
+
+async def request(app: FastAPI, path: str) -> None:
+    """Send one GET straight to the ASGI app and drain the response"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+    received = False
+
+    async def receive() -> Message:
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The client stays connected until the response is done
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        pass
+
+    await app(scope, receive, send)
+
+
+async def timed(app: FastAPI, path: str, iterations: int) -> float:
+    """Mean microseconds per request"""
+    for _ in range(iterations // 10):
+        await request(app, path)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await request(app, path)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    apps = {name: build(name) for name in ("none", "http", "asgi")}
+    print(
+        f"{'response':<10} {'none us':>9} {'http us':>9} {'asgi us':>9} {'http +':>8} {'asgi +':>8}"
+    )
+    for path in ("/json", "/stream"):
+        us = {name: await timed(app, path, args.iterations) for name, app in apps.items()}
+        print(
+            f"{path:<10} {us['none']:>9.1f} {us['http']:>9.1f} {us['asgi']:>9.1f} "
+            f"{us['http'] - us['none']:>8.1f} {us['asgi'] - us['none']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""Import-time budget for the API
+
+Imports ``app.main`` in fresh interpreters under ``python -X importtime``
+with Sentry and OpenTelemetry unconfigured, reports the median cumulative
+import time and the slowest direct imports, and fails when the median is
+over budget or a module that should load lazily was imported.
+
+Usage:
+    python -m benchmarks.importtime --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+# Loaded on first use or only when configured, never by ``import app.main``
+LAZY_MODULES = (
+    "openai",
+    "sentry_sdk",
+    "opentelemetry.sdk",
+    "opentelemetry.instrumentation",
+    "opentelemetry.exporter",
+    "sqlalchemy",
+    "pgvector",
+)
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    """Parse ``-X importtime`` lines; depth 0 is a top-level import"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        module = name.lstrip()
+        depth = (len(name) - len(module) - 1) // 2
+        records.append(ImportRecord(module.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def measure(module: str = "app.main") -> list[ImportRecord]:
+    """Import ``module`` in a fresh interpreter and return its import records"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("OPENAI_API_KEY", "importtime")
+    for name in ("SENTRY_DSN", "OTEL_EXPORTER_OTLP_ENDPOINT"):
+        env.pop(name, None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def subtree(records: list[ImportRecord], module: str) -> list[ImportRecord]:
+    """Imports made while importing top-level ``module``
+
+    Records are listed children first, so these are the nested records
+    directly before the module's own.
+    """
+    end = next(i for i, r in enumerate(records) if r.module == module and r.depth == 0)
+    start = end
+    while start > 0 and records[start - 1].depth > 0:
+        start -= 1
+    return records[start:end]
+
+
+def lazy_violations(records: list[ImportRecord]) -> list[str]:
+    """Modules from LAZY_MODULES that were imported"""
+    return sorted(
+        {
+            prefix
+            for record in records
+            for prefix in LAZY_MODULES
+            if record.module == prefix or record.module.startswith(prefix + ".")
+        }
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals_ms = [
+        next(r.cumulative_us for r in records if r.module == args.module) / 1000 for records in runs
+    ]
+    median_ms = statistics.median(totals_ms)
+
+    # Slowest imports made directly by the module, from the median run
+    records = runs[totals_ms.index(sorted(totals_ms)[len(totals_ms) // 2])]
+    direct = sorted(
+        (r for r in subtree(records, args.module) if r.depth == 1),
+        key=lambda r: r.cumulative_us,
+        reverse=True,
+    )[: args.top]
+    violations = lazy_violations(records)
+
+    print(f"import {args.module}: median {median_ms:.0f} ms over {args.runs} runs")
+    print(f"{'module':<44} {'cumulative ms':>14}")
+    for record in direct:
+        print(f"{record.module:<44} {record.cumulative_us / 1000:>14.1f}")
+
+    if args.output:
+        results = {
+            "module": args.module,
+            "median_ms": median_ms,
+            "runs_ms": totals_ms,
+            "budget_ms": args.budget_ms,
+            "slowest": {r.module: r.cumulative_us / 1000 for r in direct},
+            "lazy_violations": violations,
+        }
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    failed = False
+    if violations:
+        print(f"FAIL imported eagerly: {', '.join(violations)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL over budget: {median_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""Load test the API and oops.ninja with a weighted mix of scenarios
+
+Each run replays the same seeded schedule of requests with a fixed number
+of concurrent clients, then reports throughput, latency percentiles, the
+error rate and CPU time per request, overall and per scenario. Incidents
+are numbered, so requests miss the caches unless ``--cache`` is given.
+
+By default the API runs in-process against the mock upstream, so no
+servers, keys or Redis are needed and CPU per request is this process's
+CPU time (driver included). Against running servers, pass their URLs and
+the server PIDs to measure their CPU instead; raise RATE_LIMIT_ANON there
+first or most requests will be 429s.
+
+Usage:
+    python -m benchmarks.loadtest --requests 2000 --concurrency 32 --output run.json
+    python -m benchmarks.loadtest --api-url http://127.0.0.1:8000 \\
+        --oops-url http://127.0.0.1:8080 --pid 1234 --pid 1235
+    python -m benchmarks.loadtest --baseline baseline.json --threshold 0.15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from app.models import Channel
+
+from .mock_openai import MockConfig, create_app, mock_client
+
+CHANNELS = [channel.value for channel in Channel]
+
+
+@dataclass
+class Scenario:
+    """One kind of request in the mix"""
+
+    name: str
+    target: str  # "api" or "oops"
+    path: str
+    weight: float
+    build: Callable[[int], dict[str, Any]]
+    # oops.ninja takes form posts, the API takes JSON
+    form: bool = False
+
+
+def _incident(i: int) -> dict[str, Any]:
+    return {
+        "summary": f"Checkout outage {i}",
+        "what": "A bad deploy broke checkout for two hours",
+        "harm": "Customers could not place orders",
+        "severity": "medium",
+    }
+
+
+def _generate(channels: int) -> Callable[[int], dict[str, Any]]:
+    def build(i: int) -> dict[str, Any]:
+        return {"incident": _incident(i), "channels": CHANNELS[:channels]}
+
+    return build
+
+
+SCENARIOS = [
+    Scenario("lucky", "api", "/v1/lucky", 4, _incident),
+    *(
+        Scenario(f"generate_{n}", "api", "/v1/generate", weight, _generate(n))
+        for n, weight in ((1, 2), (2, 2), (3, 1), (4, 1), (5, 0.5), (6, 0.5))
+    ),
+    Scenario(
+        "interpret",
+        "api",
+        "/v1/interpret",
+        1,
+        lambda i: {
+            "mode": "interpret",
+            "incident_input": {"text": f"Checkout was down for 2 hours, ticket {i}"},
+        },
+    ),
+    Scenario("moderate", "api", "/v1/moderate", 2, lambda i: {"text": f"Sorry for outage {i}"}),
+    Scenario("oops_lucky", "oops", "/lucky", 2, _incident, form=True),
+]
+
+
+@dataclass
+class Sample:
+    scenario: str
+    latency_ms: float
+    ok: bool
+
+
+@dataclass
+class RunResult:
+    samples: list[Sample] = field(default_factory=list)
+    elapsed: float = 0.0
+    cpu_seconds: float | None = None
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def schedule(scenarios: list[Scenario], requests: int, seed: int) -> list[Scenario]:
+    """Seeded, weighted sequence of scenarios to replay"""
+    rng = random.Random(seed)
+    return rng.choices(scenarios, weights=[s.weight for s in scenarios], k=requests)
+
+
+def process_cpu_seconds(pids: list[int]) -> float:
+    """User plus system CPU time of ``pids`` (Linux), or of this process if none"""
+    if not pids:
+        return time.process_time()
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0
+    for pid in pids:
+        # Fields after the parenthesised command name; utime and stime are 14 and 15
+        stat = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        total += int(stat[11]) + int(stat[12])
+    return total / ticks
+
+
+async def drive(
+    clients: dict[str, httpx.AsyncClient],
+    plan: list[Scenario],
+    concurrency: int,
+    pids: list[int],
+) -> RunResult:
+    """Run ``plan`` with ``concurrency`` closed-loop workers"""
+    result = RunResult()
+    queue = iter(enumerate(plan))
+
+    async def worker(client_id: int) -> None:
+        headers = {"X-Client-ID": f"loadtest-{client_id}"}
+        for i, scenario in queue:
+            client = clients[scenario.target]
+            payload = scenario.build(i)
+            start = time.perf_counter()
+            try:
+                if scenario.form:
+                    response = await client.post(scenario.path, data=payload, headers=headers)
+                else:
+                    response = await client.post(scenario.path, json=payload, headers=headers)
+                ok = response.is_success
+            except httpx.HTTPError:
+                ok = False
+            latency = (time.perf_counter() - start) * 1000
+            result.samples.append(Sample(scenario.name, latency, ok))
+
+    cpu_start = process_cpu_seconds(pids)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    result.cpu_seconds = process_cpu_seconds(pids) - cpu_start
+    return result
+
+
+def _stats(samples: list[Sample], elapsed: float, cpu_seconds: float | None) -> dict[str, Any]:
+    latencies = [s.latency_ms for s in samples]
+    errors = sum(not s.ok for s in samples)
+    stats: dict[str, Any] = {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples),
+        "throughput_rps": len(samples) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+    if cpu_seconds is not None:
+        stats["cpu_ms_per_request"] = cpu_seconds / len(samples) * 1000
+    return stats
+
+
+def summarize(run: RunResult, meta: dict[str, Any]) -> dict[str, Any]:
+    """JSON-ready results: overall and per-scenario statistics"""
+    by_scenario: dict[str, list[Sample]] = {}
+    for sample in run.samples:
+        by_scenario.setdefault(sample.scenario, []).append(sample)
+    return {
+        "meta": meta,
+        "overall": _stats(run.samples, run.elapsed, run.cpu_seconds),
+        # CPU can't be attributed to scenarios that ran concurrently
+        "scenarios": {
+            name: _stats(samples, run.elapsed, None)
+            for name, samples in sorted(by_scenario.items())
+        },
+    }
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Regressions of ``results`` against ``baseline`` beyond ``threshold``
+
+    Latency percentiles and CPU per request may grow, and throughput may
+    shrink, by at most ``threshold`` (a fraction); the error rate may grow by
+    at most one percentage point.
+    """
+    regressions = []
+
+    def check(label: str, current: dict[str, Any], before: dict[str, Any]) -> None:
+        for key in ("p50_ms", "p95_ms", "p99_ms", "cpu_ms_per_request"):
+            if key in current and key in before and current[key] > before[key] * (1 + threshold):
+                regressions.append(f"{label} {key}: {before[key]:.2f} -> {current[key]:.2f}")
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{label} throughput_rps: "
+                f"{before['throughput_rps']:.1f} -> {current['throughput_rps']:.1f}"
+            )
+        if current["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(
+                f"{label} error_rate: {before['error_rate']:.3f} -> {current['error_rate']:.3f}"
+            )
+
+    check("overall", results["overall"], baseline["overall"])
+    for name, stats in results["scenarios"].items():
+        if name in baseline["scenarios"]:
+            check(name, stats, baseline["scenarios"][name])
+    return regressions
+
+
+def in_process_client(mock: MockConfig, cache: bool) -> httpx.AsyncClient:
+    """Client for the API app in this process, with its engine on the mock upstream"""
+    from app.backends import Backend, BackendPool
+    from app.cache import response_cache
+    from app.llm_engine import llm_engine
+    from app.main import app
+    from app.rate_limiter import rate_limiter
+    from app.semantic_cache import semantic_cache
+
+    llm_engine.pool = BackendPool(
+        [Backend("mock", mock_client(create_app(mock)), llm_engine.model)]
+    )
+    rate_limiter.anon_limit = rate_limiter.authed_limit = sys.maxsize
+    response_cache.enabled = semantic_cache.enabled = cache
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://api", timeout=60
+    )
+
+
+def print_report(results: dict[str, Any]) -> None:
+    print(
+        f"{'scenario':<14} {'requests':>8} {'errors':>7} {'rps':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    rows = [*results["scenarios"].items(), ("overall", results["overall"])]
+    for name, stats in rows:
+        print(
+            f"{name:<14} {stats['requests']:>8} {stats['errors']:>7} "
+            f"{stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.1f} "
+            f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+        )
+    if "cpu_ms_per_request" in results["overall"]:
+        print(f"cpu per request: {results['overall']['cpu_ms_per_request']:.2f} ms")
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--api-url", help="Running API; default is in-process")
+    parser.add_argument("--oops-url", help="Running oops.ninja; its scenarios are skipped without")
+    parser.add_argument("--pid", type=int, action="append", default=[], help="Server PIDs")
+    parser.add_argument("--scenarios", help="Comma-separated subset of scenarios")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Keep caches on (in-process)")
+    parser.add_argument("--base-latency-ms", type=float, default=50.0)
+    parser.add_argument("--per-token-ms", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="Fail if results regress from this")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    mock = MockConfig(
+        base_latency_ms=args.base_latency_ms,
+        per_token_ms=args.per_token_ms,
+        error_rate=args.error_rate,
+    )
+    clients = {
+        "api": (
+            httpx.AsyncClient(base_url=args.api_url, timeout=60)
+            if args.api_url
+            else in_process_client(mock, args.cache)
+        )
+    }
+    if args.oops_url:
+        clients["oops"] = httpx.AsyncClient(base_url=args.oops_url, timeout=60)
+
+    scenarios = [s for s in SCENARIOS if s.target in clients]
+    if args.scenarios:
+        names = set(args.scenarios.split(","))
+        scenarios = [s for s in scenarios if s.name in names]
+    if not scenarios:
+        parser.error("no scenarios to run")
+
+    # Warmup uses different incident numbers from the measured run
+    await drive(clients, schedule(scenarios, args.warmup, args.seed + 1), args.concurrency, [])
+    run = await drive(
+        clients, schedule(scenarios, args.requests, args.seed), args.concurrency, args.pid
+    )
+    for client in clients.values():
+        await client.aclose()
+
+    meta = {
+        "api": args.api_url or "in-process",
+        "oops": args.oops_url,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "cache": args.cache,
+        "mock": vars(mock) if not args.api_url else None,
+        "python": platform.python_version(),
+        "cpu_source": "server pids" if args.pid else "this process",
+    }
+    results = summarize(run, meta)
+    print_report(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,263 @@
+"""Local OpenAI-compatible mock server for benchmarks and tests
+
+Serves ``POST /v1/chat/completions`` with a deterministic body: drafts for
+the channels named in a generate prompt, or an incident record for an
+interpret prompt. Latency is a fixed base plus a per-token cost, so output
+length drives wall time the way it does upstream; with ``"stream": true``
+the base latency is the time to first token and chunks arrive at the token
+rate. Errors, malformed completions and throttling can be injected.
+
+Usage:
+    python -m benchmarks.mock_openai --port 8001 --per-token-ms 0.5
+
+Then point the API at it:
+    LLM_BACKENDS='[{"name": "mock", "base_url": "http://127.0.0.1:8001/v1"}]'
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import AsyncOpenAI
+
+_CHANNELS_RE = re.compile(r"^CHANNELS: (.+)$", re.MULTILINE)
+
+# Approximate output tokens per variant, mirroring the channel length rules
+CHANNEL_TOKENS = {
+    "twitter": 60,
+    "linkedin": 120,
+    "customer_email": 260,
+    "status_page": 220,
+    "press_release": 450,
+    "ceo_letter": 600,
+}
+
+
+@dataclass
+class MockConfig:
+    """Mock upstream behaviour"""
+
+    base_latency_ms: float = 50.0
+    # Token rate: 0.5 ms/token is 2000 tokens/s
+    per_token_ms: float = 0.5
+    # Answer 429 while more than this many requests are in flight
+    max_concurrency: int | None = None
+    # Fraction of requests answered with ``error_status``
+    error_rate: float = 0.0
+    error_status: int = 500
+    # Fraction of completions cut off mid-JSON
+    malformed_rate: float = 0.0
+    # Tokens per streamed chunk
+    stream_chunk_tokens: int = 8
+
+
+def _channels_from_messages(messages: list[dict[str, Any]]) -> list[str]:
+    """Read the requested channels from the user prompt"""
+    for message in messages:
+        match = _CHANNELS_RE.search(message.get("content") or "")
+        if match:
+            return [c.strip() for c in match.group(1).split(",") if c.strip()]
+    return ["twitter"]
+
+
+def _draft_text(channel: str, variant: str, tokens: int) -> str:
+    """Build filler text of roughly ``tokens`` tokens that fits the channel rules"""
+    words = [f"{variant}-{channel}"] + ["sorry"] * (max(tokens // 2, 1) - 1)
+    sentences = [" ".join(words[i : i + 15]) + "." for i in range(0, len(words), 15)]
+    paragraphs = [" ".join(sentences[i : i + 4]) for i in range(0, len(sentences), 4)]
+    return "\n\n".join(paragraphs)
+
+
+def build_completion(channels: list[str]) -> tuple[str, int]:
+    """Build a completion body and its output token count"""
+    drafts = {}
+    tokens = 20
+    for channel in channels:
+        channel_tokens = CHANNEL_TOKENS.get(channel, 100)
+        tokens += 2 * channel_tokens
+        drafts[channel] = {
+            "useful": _draft_text(channel, "useful", channel_tokens),
+            "pointless": _draft_text(channel, "pointless", channel_tokens),
+        }
+
+    body = {"drafts": drafts}
+    return json.dumps(body), tokens
+
+
+def build_interpret_completion() -> tuple[str, int]:
+    """Build an InterpretResponse-shaped completion and its output token count"""
+    body = {
+        "incident": {
+            "summary": "Service outage",
+            "who": ["customers"],
+            "what": "The service was unavailable",
+            "when": "unknown",
+            "harm": "Customers could not log in",
+            "stakeholders": ["customers"],
+            "severity": "medium",
+            "jurisdictions": [],
+            "evidence": ["no evidence at this time"],
+        },
+        "notes": ["Duration unknown"],
+        "extractions": {"entities": ["customers"], "times": [], "numbers": []},
+    }
+    return json.dumps(body), 120
+
+
+def _is_interpret(messages: list[dict[str, Any]]) -> bool:
+    return any("InterpretResponse" in (m.get("content") or "") for m in messages)
+
+
+def _error(message: str, code: str) -> dict[str, Any]:
+    """OpenAI-style error body"""
+    return {"error": {"message": message, "type": code, "code": code}}
+
+
+def create_app(config: MockConfig | None = None) -> FastAPI:
+    """Create the mock OpenAI application"""
+    config = config or MockConfig()
+    app = FastAPI(title="mock-openai")
+    app.state.config = config
+    app.state.requests = 0
+    app.state.inflight = 0
+    app.state.throttled = 0
+    rng = random.Random(0)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Any:
+        body = await request.json()
+        app.state.requests += 1
+
+        if config.max_concurrency is not None and app.state.inflight >= config.max_concurrency:
+            app.state.throttled += 1
+            return JSONResponse(_error("Rate limit reached", "rate_limit_exceeded"), 429)
+        if config.error_rate and rng.random() < config.error_rate:
+            return JSONResponse(
+                _error("The server had an error", "server_error"), config.error_status
+            )
+
+        content, completion_tokens = _content(body.get("messages", []))
+        if config.malformed_rate and rng.random() < config.malformed_rate:
+            content = content[: len(content) // 2]
+
+        app.state.inflight += 1
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream(body, content, completion_tokens), media_type="text/event-stream"
+            )
+        try:
+            return await _completion(body, content, completion_tokens)
+        finally:
+            app.state.inflight -= 1
+
+    def _content(messages: list[dict[str, Any]]) -> tuple[str, int]:
+        if _is_interpret(messages):
+            return build_interpret_completion()
+        return build_completion(_channels_from_messages(messages))
+
+    async def _stream(body: dict[str, Any], content: str, tokens: int) -> AsyncIterator[str]:
+        """Server-sent chat.completion.chunk events, paced at the token rate"""
+        try:
+            await asyncio.sleep(config.base_latency_ms / 1000)
+            pieces = max(1, math.ceil(tokens / config.stream_chunk_tokens))
+            size = math.ceil(len(content) / pieces)
+            chunk_id = f"chatcmpl-mock-{app.state.requests}"
+            for start in range(0, len(content), size):
+                await asyncio.sleep(config.per_token_ms * config.stream_chunk_tokens / 1000)
+                delta = {"content": content[start : start + size]}
+                yield _sse(_chunk(chunk_id, body, delta, None))
+            yield _sse(_chunk(chunk_id, body, {}, "stop"))
+            yield "data: [DONE]\n\n"
+        finally:
+            app.state.inflight -= 1
+
+    async def _completion(body: dict[str, Any], content: str, completion_tokens: int) -> Any:
+        await asyncio.sleep(
+            (config.base_latency_ms + config.per_token_ms * completion_tokens) / 1000
+        )
+
+        return {
+            "id": f"chatcmpl-mock-{app.state.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 500,
+                "completion_tokens": completion_tokens,
+                "total_tokens": 500 + completion_tokens,
+            },
+        }
+
+    return app
+
+
+def _chunk(
+    chunk_id: str, body: dict[str, Any], delta: dict[str, str], finish_reason: str | None
+) -> dict[str, Any]:
+    return {
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _sse(data: dict[str, Any]) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def mock_client(app: FastAPI) -> AsyncOpenAI:
+    """Build an AsyncOpenAI client that talks to the mock in-process over ASGI"""
+    http_client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://mock-openai/v1"
+    )
+    # No client-side retries, so injected errors reach the caller
+    return AsyncOpenAI(
+        api_key="mock", base_url="http://mock-openai/v1", http_client=http_client, max_retries=0
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--base-latency-ms", type=float, default=50.0)
+    parser.add_argument("--per-token-ms", type=float, default=0.5)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        base_latency_ms=args.base_latency_ms,
+        per_token_ms=args.per_token_ms,
+        max_concurrency=args.max_concurrency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        malformed_rate=args.malformed_rate,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
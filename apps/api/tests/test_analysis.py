@@ -0,0 +1,105 @@
+"""Tests for local draft scoring and detectors"""
+
+from app.analysis import analysis_engine
+from app.models import (
+    ChannelDraft,
+    GenerateRequest,
+    Incident,
+    ScapegoatStrategy,
+    ScapegoatType,
+    Severity,
+    Sliders,
+    Strategy,
+)
+
+
+def make_request(
+    evidence: list[str] | None = None, contrition: int = 50, **overrides: object
+) -> GenerateRequest:
+    return GenerateRequest(
+        incident=Incident(
+            summary="Checkout outage",
+            what="A bad deploy broke payments",
+            harm="Orders failed",
+            evidence=evidence or [],
+        ),
+        sliders=Sliders(contrition=contrition),
+        **overrides,  # type: ignore[arg-type]
+    )
+
+
+def analyze(request: GenerateRequest, **useful: str) -> tuple:
+    drafts = {
+        channel: ChannelDraft(useful=text, pointless="Oops.") for channel, text in useful.items()
+    }
+    return analysis_engine.analyze(request, drafts)
+
+
+def test_non_apology_detection() -> None:
+    """Regret without ownership is flagged; ownership clears it"""
+    _, detectors = analyze(make_request(), twitter="We regret any inconvenience.")
+    assert detectors.non_apology is True
+
+    _, detectors = analyze(make_request(), twitter="We caused this outage and we are sorry.")
+    assert detectors.non_apology is False
+
+
+def test_high_contrition_requires_explicit_ownership() -> None:
+    """A bare apology is not enough once contrition is 60 or more"""
+    text = "We are sorry about the outage."
+    _, low = analyze(make_request(contrition=40), twitter=text)
+    _, high = analyze(make_request(contrition=80), twitter=text)
+
+    assert low.non_apology is False
+    assert high.non_apology is True
+
+
+def test_unverifiable_claims_checked_against_evidence() -> None:
+    """Certainty without backing evidence is reported, sentence by sentence"""
+    text = "We caused this. The issue is fully resolved. No customer data was exposed."
+
+    _, detectors = analyze(make_request(), status_page=text)
+    assert detectors.unverifiable_claims == [
+        "The issue is fully resolved.",
+        "No customer data was exposed.",
+    ]
+
+    evidence = ["Incident resolved at 14:02 UTC, confirmed by monitoring"]
+    _, detectors = analyze(make_request(evidence=evidence), status_page=text)
+    assert detectors.unverifiable_claims == ["No customer data was exposed."]
+
+
+def test_all_channels_scanned_together() -> None:
+    """Ownership in one channel and a claim in another both count"""
+    _, detectors = analyze(
+        make_request(),
+        twitter="That is on us.",
+        linkedin="Uptime is back to 99.9% and we guarantee it.",
+    )
+    assert detectors.non_apology is False
+    assert detectors.unverifiable_claims == ["Uptime is back to 99.9% and we guarantee it."]
+
+
+def test_scapegoat_flag() -> None:
+    """Strategy wins; otherwise blame language is detected"""
+    _, detectors = analyze(make_request(), twitter="Our cloud provider had an outage. Sorry.")
+    assert detectors.scapegoat_flag == "vendor_outage"
+
+    strategy = Strategy(scapegoat=ScapegoatStrategy(type=ScapegoatType.WEATHER, intensity=30))
+    _, detectors = analyze(make_request(strategy=strategy), twitter="Sorry.")
+    assert detectors.scapegoat_flag == "weather"
+
+
+def test_metrics_follow_drafts() -> None:
+    """Hedging lowers clarity, ownership raises sincerity, scores are reproducible"""
+    request = make_request()
+    request.incident.severity = Severity.MEDIUM
+    plain, _ = analyze(request, twitter="We failed you. We are fixing it.")
+    hedged, _ = analyze(
+        request,
+        twitter="To our knowledge, pending investigation, an issue may have occurred.",
+    )
+
+    assert hedged.clarity_score < plain.clarity_score
+    assert plain.sincerity_score > hedged.sincerity_score
+    assert analyze(request, twitter="We failed you. We are fixing it.")[0] == plain
@@ -0,0 +1,108 @@
+"""Tests for the LLM backend pool"""
+
+import time
+
+import openai
+import pytest
+from fastapi import FastAPI
+
+from app.backends import FAILURE_THRESHOLD, Backend, BackendPool
+from app.config import settings
+from app.llm_engine import LLMEngine
+from app.models import GenerateRequest, Incident
+from benchmarks.mock_openai import MockConfig, create_app, mock_client
+
+MESSAGES = [{"role": "user", "content": "CHANNELS: twitter"}]
+
+
+def backend(name: str, app: FastAPI, weight: float = 1.0) -> Backend:
+    return Backend(name, mock_client(app), "mock", weight=weight)
+
+
+def broken(status: int = 503) -> FastAPI:
+    """An upstream where every call fails with ``status``"""
+    return create_app(MockConfig(base_latency_ms=0, error_rate=1.0, error_status=status))
+
+
+@pytest.mark.asyncio
+async def test_failover_to_next_backend() -> None:
+    """A failing backend is skipped for the call and removed after repeated failures"""
+    bad = backend("bad", broken(), weight=1.0)
+    good = backend("good", create_app(MockConfig(base_latency_ms=0, per_token_ms=0)), weight=0.0)
+    pool = BackendPool([bad, good])
+
+    for _ in range(FAILURE_THRESHOLD):
+        response = await pool.complete(messages=MESSAGES)
+        assert response.choices[0].message.content
+
+    assert bad.errors == FAILURE_THRESHOLD
+    assert not bad.available(time.monotonic())
+
+    # While cooling down, the bad backend is not tried at all
+    await pool.complete(messages=MESSAGES)
+    assert bad.requests == FAILURE_THRESHOLD
+    assert good.requests == FAILURE_THRESHOLD + 1
+
+
+@pytest.mark.asyncio
+async def test_request_errors_are_not_failed_over() -> None:
+    """A 400 is the request's fault: raised at once, without marking the backend down"""
+    bad_request = backend("bad-request", broken(400), weight=1.0)
+    good = backend("good", create_app(MockConfig(base_latency_ms=0, per_token_ms=0)), weight=0.0)
+    pool = BackendPool([bad_request, good])
+
+    for _ in range(FAILURE_THRESHOLD):
+        with pytest.raises(openai.BadRequestError):
+            await pool.complete(messages=MESSAGES)
+        with pytest.raises(openai.BadRequestError):
+            await pool.stream(messages=MESSAGES)
+
+    assert good.requests == 0
+    assert bad_request.errors == 0
+    assert bad_request.available(time.monotonic())
+
+
+@pytest.mark.asyncio
+async def test_hedge_takes_first_valid_response() -> None:
+    """A slow primary is hedged after the delay and the faster backend wins"""
+    slow_app = create_app(MockConfig(base_latency_ms=2000, per_token_ms=0))
+    fast_app = create_app(MockConfig(base_latency_ms=0, per_token_ms=0))
+    slow = backend("slow", slow_app, weight=1.0)
+    fast = backend("fast", fast_app, weight=0.0)
+    pool = BackendPool([slow, fast], hedge=True, hedge_delay=0.05)
+
+    response = await pool.complete(messages=MESSAGES)
+
+    assert response.choices[0].message.content
+    assert slow.hedges == 1
+    assert fast.hedge_wins == 1
+    # The cancelled primary doesn't count against its health
+    assert slow.errors == 0
+    assert pool.stats()["fast"]["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_routes_through_pool() -> None:
+    """The engine's upstream calls go through the pool"""
+    good_app = create_app(MockConfig(base_latency_ms=0, per_token_ms=0))
+    pool = BackendPool([backend("bad", broken()), backend("good", good_app, weight=0.0)])
+    engine = LLMEngine(pool=pool)
+
+    response = await engine.generate(
+        GenerateRequest(incident=Incident(summary="Pool", what="Down", harm="Waiting")),
+        use_cache=False,
+    )
+
+    assert "twitter" in response.drafts
+    assert good_app.state.requests == 1
+
+
+def test_pool_owns_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Clients built from settings don't retry inside the SDK and time out per attempt"""
+    monkeypatch.setattr(settings, "llm_request_timeout_seconds", 12.5)
+
+    pool = BackendPool.from_settings()
+
+    for client in (b.client for b in pool.backends):
+        assert client.max_retries == 0
+        assert client.timeout == 12.5
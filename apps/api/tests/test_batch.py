@@ -0,0 +1,113 @@
+"""Tests for batch generation"""
+
+import asyncio
+import json
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.backends import Backend, BackendPool
+from app.batch import run_batch
+from app.config import settings
+from app.llm_engine import llm_engine
+from app.main import app
+from app.models import GenerateRequest
+from app.rate_limiter import rate_limiter
+from benchmarks.mock_openai import MockConfig, create_app, mock_client
+
+client = TestClient(app)
+
+
+def item(summary: str) -> dict[str, Any]:
+    """Build a batch item payload"""
+    return {
+        "incident": {"summary": summary, "what": "Database went down", "harm": "No logins"},
+        "channels": ["twitter"],
+    }
+
+
+@pytest.fixture
+def mock_upstream(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Point the engine at the mock upstream, failing items whose summary says so"""
+    upstream = mock_client(create_app(MockConfig(base_latency_ms=0)))
+    monkeypatch.setattr(llm_engine, "pool", BackendPool([Backend("mock", upstream, "mock")]))
+    original = llm_engine._complete_generate
+
+    async def complete(request: Any) -> str:
+        if request.incident.summary == "fail":
+            raise ValueError("upstream exploded")
+        return await original(request)
+
+    monkeypatch.setattr(llm_engine, "_complete_generate", complete)
+
+
+def test_batch_returns_partial_results(mock_upstream: None) -> None:
+    """Failed items are reported per item without failing the batch"""
+    payload = {"items": [item("first"), item("fail"), item("third")], "concurrency": 2}
+
+    response = client.post("/v1/generate/batch", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+
+    assert [r["index"] for r in data["results"]] == [0, 1, 2]
+    assert [r["status"] for r in data["results"]] == ["ok", "error", "ok"]
+    assert "upstream exploded" in data["results"][1]["error"]
+    assert data["succeeded"] == 2
+    assert data["failed"] == 1
+
+
+def test_batch_ndjson_streaming(mock_upstream: None) -> None:
+    """NDJSON output has one line per item"""
+    payload = {"items": [item("first"), item("second")]}
+
+    response = client.post(
+        "/v1/generate/batch", json=payload, headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.strip().split("\n")]
+    assert sorted(line["index"] for line in lines) == [0, 1]
+    assert all(line["status"] == "ok" for line in lines)
+
+
+def test_batch_rejects_empty() -> None:
+    """An empty batch is a validation error"""
+    response = client.post("/v1/generate/batch", json={"items": []})
+    assert response.status_code == 422
+
+
+def test_batch_over_rate_limit_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A batch larger than the client's limit fails before charging the limiter"""
+    monkeypatch.setattr(rate_limiter, "anon_limit", 2)
+
+    response = client.post("/v1/generate/batch", json={"items": [item(str(i)) for i in range(3)]})
+    assert response.status_code == 422
+    assert "rate limit of 2" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_batch_limits_are_capped_by_settings(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Clients can lower concurrency and timeouts but not raise them past the settings"""
+    active = peak = 0
+
+    async def generate(request: Any, use_cache: bool = True) -> Any:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            active -= 1
+        raise ValueError("not needed")
+
+    monkeypatch.setattr(llm_engine, "generate", generate)
+    monkeypatch.setattr(settings, "batch_concurrency", 2)
+    monkeypatch.setattr(settings, "batch_item_timeout_seconds", 0.01)
+    items = [GenerateRequest(**item(f"incident {i}")) for i in range(6)]
+
+    results = [r async for r in run_batch(items, concurrency=100000, item_timeout=1e9)]
+
+    assert peak == 2
+    assert all(r.error == "Timed out after 0.01s" for r in results)
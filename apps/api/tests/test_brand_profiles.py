@@ -0,0 +1,167 @@
+"""Tests for stored brand profiles"""
+
+from collections.abc import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.brand_profiles import (
+    BrandProfileConflictError,
+    BrandProfileRegistry,
+    InMemoryBrandProfileStore,
+    brand_profiles,
+)
+from app.cache import cache_key
+from app.main import app
+from app.models import BrandProfile, GenerateRequest, Incident
+from app.prompt_encoder import (
+    count_message_tokens,
+    fit_generate_budget,
+    generate_messages,
+    generate_user_prompt,
+)
+
+INCIDENT = Incident(summary="Outage", what="Down", harm="Waiting")
+ACME = BrandProfile(name="Acme", values=["candor"], legal_boilerplate="No admission of liability.")
+
+
+def make_registry() -> BrandProfileRegistry:
+    """Registry with an in-process store that always rechecks the current version"""
+    registry = BrandProfileRegistry(store=InMemoryBrandProfileStore())
+    registry.etag_ttl = 0
+    return registry
+
+
+@pytest.fixture
+def memory_store() -> Iterator[None]:
+    """Point the app's registry at an empty in-process store"""
+    original = brand_profiles._store
+    brand_profiles._store = InMemoryBrandProfileStore()
+    yield
+    brand_profiles._store = original
+
+
+async def test_stored_profile_prompt_matches_inline() -> None:
+    """A resolved profile renders its precompiled fragment, as if sent inline"""
+    registry = make_registry()
+    created = await registry.create(ACME)
+
+    request = GenerateRequest(incident=INCIDENT, brand_profile_id=created.id)
+    await registry.resolve(request)
+
+    assert request.brand_profile_version == 1
+    assert request.brand_name == "Acme"
+    inline = GenerateRequest(incident=INCIDENT, brand_profile=ACME)
+    assert generate_user_prompt(request) == generate_user_prompt(inline)
+
+    # Later lookups reuse the compiled version
+    await registry.resolve(GenerateRequest(incident=INCIDENT, brand_profile_id=created.id))
+    assert registry.stats()["misses"] == 0
+
+
+async def test_update_changes_version_and_cache_key() -> None:
+    """Updates bump the version; pinned versions keep resolving"""
+    registry = make_registry()
+    created = await registry.create(ACME)
+    first = GenerateRequest(incident=INCIDENT, brand_profile_id=created.id)
+    await registry.resolve(first)
+
+    updated = await registry.update(created.id, ACME.model_copy(update={"name": "Acme Corp"}))
+    latest = GenerateRequest(incident=INCIDENT, brand_profile_id=created.id)
+    await registry.resolve(latest)
+    pinned = GenerateRequest(
+        incident=INCIDENT, brand_profile_id=created.id, brand_profile_version=1
+    )
+    await registry.resolve(pinned)
+
+    assert updated.version == 2
+    assert latest.brand_name == "Acme Corp"
+    assert pinned.brand_name == "Acme"
+    assert cache_key("generate", first) == cache_key("generate", pinned)
+    assert cache_key("generate", first) != cache_key("generate", latest)
+
+
+async def test_update_rejects_stale_if_match() -> None:
+    """An If-Match on an old version fails instead of overwriting"""
+    registry = make_registry()
+    created = await registry.create(ACME)
+    await registry.update(created.id, ACME, if_match={1})
+
+    with pytest.raises(BrandProfileConflictError):
+        await registry.update(created.id, ACME, if_match={1})
+
+
+async def test_budget_trims_a_copy_of_stored_profile() -> None:
+    """Trimming exemplars never modifies the shared compiled profile"""
+    registry = make_registry()
+    paragraphs = [f"Exemplar {i}: " + "we own our mistakes " * 20 for i in range(3)]
+    created = await registry.create(BrandProfile(name="Acme", exemplar_paragraphs=paragraphs))
+    request = GenerateRequest(incident=INCIDENT, brand_profile_id=created.id)
+    await registry.resolve(request)
+    stored = request.stored_brand_profile
+    assert stored is not None
+    key = cache_key("generate", request)
+
+    budget = count_message_tokens(generate_messages(request)) - 10
+    adjustments = fit_generate_budget(request, budget)
+
+    assert adjustments == ["Dropped 1 brand exemplar paragraph(s) to fit the input token budget"]
+    trimmed = request.stored_brand_profile
+    assert trimmed is not None
+    assert trimmed.profile.exemplar_paragraphs == paragraphs[:2]
+    assert stored.profile.exemplar_paragraphs == paragraphs
+    # Still a stored-profile request: valid, and cached under the same key
+    assert request.brand_profile is None
+    GenerateRequest.model_validate(request.model_dump())
+    assert cache_key("generate", request) == key
+    assert count_message_tokens(generate_messages(request)) <= budget
+
+
+def test_inline_and_stored_profile_are_exclusive() -> None:
+    """A request names an inline profile or a stored one"""
+    with pytest.raises(ValidationError):
+        GenerateRequest(incident=INCIDENT, brand_profile=ACME, brand_profile_id="abc")
+    with pytest.raises(ValidationError):
+        GenerateRequest(incident=INCIDENT, brand_profile_version=2)
+
+
+def test_brand_profile_endpoints(memory_store: None) -> None:
+    """Create, conditional get, conditional update and delete over HTTP"""
+    client = TestClient(app)
+
+    created = client.post("/v1/brand-profiles", json=ACME.model_dump(mode="json"))
+    assert created.status_code == 201
+    profile_id = created.json()["id"]
+    assert created.headers["ETag"] == '"1"'
+    assert "fragment" not in created.json()
+
+    not_modified = client.get(f"/v1/brand-profiles/{profile_id}", headers={"If-None-Match": '"1"'})
+    assert not_modified.status_code == 304
+
+    updated = client.put(
+        f"/v1/brand-profiles/{profile_id}",
+        json={"name": "Acme Corp"},
+        headers={"If-Match": '"1"'},
+    )
+    assert updated.headers["ETag"] == '"2"'
+    stale = client.put(
+        f"/v1/brand-profiles/{profile_id}", json={"name": "Acme"}, headers={"If-Match": '"1"'}
+    )
+    assert stale.status_code == 412
+    assert client.get(f"/v1/brand-profiles/{profile_id}?version=1").json()["profile"]["name"] == (
+        "Acme"
+    )
+
+    assert client.delete(f"/v1/brand-profiles/{profile_id}").status_code == 204
+    assert client.get(f"/v1/brand-profiles/{profile_id}").status_code == 404
+
+
+def test_generate_with_unknown_profile_is_404(memory_store: None) -> None:
+    """Unknown profile IDs fail before any upstream call"""
+    payload = {
+        "incident": INCIDENT.model_dump(mode="json"),
+        "brand_profile_id": "missing",
+    }
+    response = TestClient(app).post("/v1/generate", json=payload)
+    assert response.status_code == 404
@@ -0,0 +1,96 @@
+"""Tests for the generation response cache"""
+
+import json
+
+import pytest
+
+from app.cache import ResponseCache, cache_key, response_cache
+from app.llm_engine import llm_engine
+from app.models import GenerateRequest, Incident, Severity, Sliders
+
+LLM_RESULT = {
+    "drafts": {"twitter": {"useful": "We broke it. We fixed it.", "pointless": "Oops."}},
+    "metrics": {
+        "pr_risk": 0.2,
+        "legal_risk": 0.1,
+        "ethics_score": 0.9,
+        "clarity_score": 0.8,
+        "sincerity_score": 0.7,
+    },
+    "detectors": {"non_apology": False, "scapegoat_flag": "none", "unverifiable_claims": []},
+    "adjustments": [],
+    "rationales": [],
+}
+
+
+def make_request(memes: int = 0) -> GenerateRequest:
+    """Build a small generate request"""
+    return GenerateRequest(
+        incident=Incident(
+            summary="Database outage",
+            what="Database went down",
+            harm="Service unavailable for 2 hours",
+            severity=Severity.HIGH,
+        ),
+        sliders=Sliders(contrition=65, memes=memes),
+    )
+
+
+def test_cache_key_is_canonical() -> None:
+    """Equal requests hash equally, different requests do not"""
+    assert cache_key("generate", make_request()) == cache_key("generate", make_request())
+    assert cache_key("generate", make_request()) != cache_key("interpret", make_request())
+    assert cache_key("generate", make_request(memes=0)) != cache_key(
+        "generate", make_request(memes=5)
+    )
+
+
+@pytest.mark.asyncio
+async def test_local_tier_lru_eviction() -> None:
+    """Least recently used entries are evicted past max_entries"""
+    cache = ResponseCache()
+    cache.max_entries = 2
+
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    assert await cache.get("a") == "1"
+    await cache.set("c", "3")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+    assert await cache.get("c") == "3"
+    assert cache.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_local_tier_ttl() -> None:
+    """Expired entries are treated as misses"""
+    cache = ResponseCache()
+    cache.ttl = 0
+
+    await cache.set("a", "1")
+    assert await cache.get("a") is None
+    assert cache.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_serves_cache_hit(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A repeated normalized request skips the upstream completion"""
+    calls = 0
+
+    async def fake_complete(request: GenerateRequest) -> str:
+        nonlocal calls
+        calls += 1
+        return json.dumps(LLM_RESULT)
+
+    monkeypatch.setattr(llm_engine, "_complete_generate", fake_complete)
+    response_cache.clear_local()
+
+    # HIGH severity clamps memes to 0, so both requests normalize identically
+    first = await llm_engine.generate(make_request(memes=0))
+    second = await llm_engine.generate(make_request(memes=40))
+    assert calls == 1
+    assert second.drafts["twitter"].useful == first.drafts["twitter"].useful
+
+    await llm_engine.generate(make_request(), use_cache=False)
+    assert calls == 2
@@ -0,0 +1,89 @@
+"""Tests for channel specs, output budgets and targeted draft repair"""
+
+import json
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.channels import CHANNEL_SPECS, draft_violations, output_token_budget
+from app.llm_engine import LLMEngine
+from app.models import Channel, GenerateRequest, Incident
+
+EMAIL = "Dear customer. " + "We failed you and we are fixing it now. " * 15
+
+
+def completion(drafts: dict[str, Any]) -> str:
+    return json.dumps(
+        {
+            "drafts": drafts,
+            "metrics": {
+                "pr_risk": 0.2,
+                "legal_risk": 0.1,
+                "ethics_score": 0.9,
+                "clarity_score": 0.8,
+                "sincerity_score": 0.7,
+            },
+            "detectors": {"non_apology": False, "scapegoat_flag": "none"},
+        }
+    )
+
+
+def test_output_budget_follows_channel_mix() -> None:
+    """Longer channels raise the ceiling"""
+    twitter = output_token_budget([Channel.TWITTER])
+    both = output_token_budget([Channel.TWITTER, Channel.CEO_LETTER])
+
+    assert both - twitter == 2 * CHANNEL_SPECS[Channel.CEO_LETTER].variant_tokens
+
+
+def test_draft_violations() -> None:
+    """Length rules are checked for both variants"""
+    assert draft_violations(Channel.TWITTER, {"useful": "Sorry.", "pointless": "Oops."}) == []
+    assert draft_violations(Channel.TWITTER, {"useful": "x" * 300, "pointless": "Oops."}) == [
+        "useful: 300 characters (max 280)"
+    ]
+    assert draft_violations(Channel.LINKEDIN, {"useful": "One.", "pointless": "One. Two."}) == [
+        "useful: 1 sentences (min 2)"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_only_violating_channel_is_repaired() -> None:
+    """A too-long tweet gets one repair call; the email is left alone"""
+    calls: list[dict[str, Any]] = []
+
+    async def create(**kwargs: Any) -> Any:
+        calls.append(kwargs)
+        if len(calls) == 1:
+            content = completion(
+                {
+                    "twitter": {"useful": "We are sorry. " * 30, "pointless": "Oops."},
+                    "customer_email": {"useful": EMAIL, "pointless": EMAIL},
+                }
+            )
+        else:
+            content = json.dumps(
+                {"drafts": {"twitter": {"useful": "We broke it.", "pointless": "Oops."}}}
+            )
+        message = SimpleNamespace(content=content)
+        choice = SimpleNamespace(message=message, finish_reason="stop")
+        return SimpleNamespace(choices=[choice], model="gpt", usage=None)
+
+    engine = LLMEngine(
+        client=SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))  # type: ignore[arg-type]
+    )
+    request = GenerateRequest(
+        incident=Incident(summary="Outage", what="Down", harm="Waiting"),
+        channels=[Channel.TWITTER, Channel.CUSTOMER_EMAIL],
+    )
+
+    response = await engine.generate(request, use_cache=False)
+
+    assert calls[0]["max_tokens"] == output_token_budget(request.channels)
+    assert len(calls) == 2
+    assert calls[1]["max_tokens"] == output_token_budget([Channel.TWITTER])
+    assert "CHANNELS: twitter" in calls[1]["messages"][1]["content"]
+    assert response.drafts["twitter"].useful == "We broke it."
+    assert response.drafts["customer_email"].useful == EMAIL
+    assert any(a.startswith("Rewrote twitter draft") for a in response.adjustments)
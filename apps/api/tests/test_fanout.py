@@ -0,0 +1,57 @@
+"""Tests for per-channel fan-out generation"""
+
+import pytest
+
+from app.llm_engine import LLMEngine
+from app.models import Channel, GenerateRequest, Incident
+from benchmarks.mock_openai import MockConfig, create_app, mock_client
+
+
+def make_request(channels: list[Channel]) -> GenerateRequest:
+    """Build a generate request for the given channels"""
+    return GenerateRequest(
+        incident=Incident(summary="Fan-out test", what="Database down", harm="No logins"),
+        channels=channels,
+    )
+
+
+@pytest.mark.asyncio
+async def test_parallel_generate_issues_one_call_per_channel() -> None:
+    """Each channel gets its own completion and the drafts are merged"""
+    mock = create_app(MockConfig(base_latency_ms=0, per_token_ms=0))
+    engine = LLMEngine(client=mock_client(mock))
+    channels = [Channel.TWITTER, Channel.CEO_LETTER, Channel.STATUS_PAGE]
+
+    response = await engine.generate(make_request(channels), use_cache=False, parallel=True)
+
+    assert mock.state.requests == 3
+    assert set(response.drafts) == {c.value for c in channels}
+
+
+@pytest.mark.asyncio
+async def test_parallel_single_channel_uses_one_call() -> None:
+    """A single channel falls back to the single-call path"""
+    mock = create_app(MockConfig(base_latency_ms=0, per_token_ms=0))
+    engine = LLMEngine(client=mock_client(mock))
+
+    await engine.generate(make_request([Channel.TWITTER]), use_cache=False, parallel=True)
+    assert mock.state.requests == 1
+
+
+def test_merge_results() -> None:
+    """Drafts are combined and list fields de-duplicated"""
+    engine = LLMEngine(client=mock_client(create_app()))
+
+    def result(channel: str) -> dict:
+        return {
+            "drafts": {channel: {"useful": "u", "pointless": "p"}},
+            "adjustments": ["Reduced memes"],
+            "rationales": [f"{channel} rationale"],
+        }
+
+    merged = engine._merge_results([result("twitter"), result("linkedin")])
+
+    assert set(merged["drafts"]) == {"twitter", "linkedin"}
+    assert "metrics" not in merged
+    assert merged["adjustments"] == ["Reduced memes"]
+    assert merged["rationales"] == ["twitter rationale", "linkedin rationale"]
@@ -0,0 +1,201 @@
+"""Tests for the asynchronous job queue (queue tests require a local Redis)"""
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
+import pytest
+import redis.asyncio as redis
+
+from app.jobs import LEASES, QUEUES, JobQueue
+from app.models import GenerateRequest, Incident, IncidentInput, InterpretRequest, JobSubmitRequest
+from app.worker import notify, resolve_callback_host
+
+
+@pytest.fixture
+async def queue() -> AsyncIterator[JobQueue]:
+    """Job queue on a scratch Redis database, skipped if Redis is unavailable"""
+    job_queue = JobQueue()
+    job_queue.redis_client = redis.from_url("redis://localhost:6379/15", decode_responses=True)
+    try:
+        await job_queue.redis_client.flushdb()
+    except Exception:
+        pytest.skip("Redis is not available")
+    job_queue.max_attempts = 2
+    yield job_queue
+    await job_queue.redis_client.flushdb()
+    await job_queue.close()
+
+
+def generate_job() -> JobSubmitRequest:
+    return JobSubmitRequest(
+        request=GenerateRequest(
+            incident=Incident(summary="Outage", what="Database down", harm="No logins")
+        )
+    )
+
+
+def interpret_job() -> JobSubmitRequest:
+    return JobSubmitRequest(
+        request=InterpretRequest(incident_input=IncidentInput(text="Database down"))
+    )
+
+
+@pytest.mark.asyncio
+async def test_authed_jobs_dequeue_first(queue: JobQueue) -> None:
+    """Authed jobs are processed ahead of earlier anonymous jobs"""
+    anon = await queue.submit(interpret_job(), is_authed=False)
+    authed = await queue.submit(generate_job(), is_authed=True)
+
+    first = await queue.dequeue(timeout=1)
+    second = await queue.dequeue(timeout=1)
+    assert first is not None and second is not None
+    assert (first["id"], second["id"]) == (authed.id, anon.id)
+    assert first["status"] == "running"
+    assert first["kind"] == "generate"
+
+
+@pytest.mark.asyncio
+async def test_retry_then_fail(queue: JobQueue) -> None:
+    """Failed attempts are retried until max_attempts, then fail with a TTL"""
+    job = await queue.submit(generate_job(), is_authed=False)
+
+    record = await queue.dequeue(timeout=1)
+    assert record is not None
+    assert await queue.fail(record, "boom") is True
+    assert (await queue.get(job.id)).status == "queued"  # type: ignore[union-attr]
+
+    # Make the retry due immediately
+    await queue.redis_client.zadd("jobs:delayed", {job.id: 0})  # type: ignore[union-attr]
+    record = await queue.dequeue(timeout=1)
+    assert record is not None and record["attempts"] == 2
+    assert await queue.fail(record, "boom again") is False
+
+    status = await queue.get(job.id)
+    assert status is not None and status.status == "failed"
+    assert await queue.redis_client.ttl(f"job:{job.id}") > 0  # type: ignore[union-attr]
+
+
+@pytest.mark.asyncio
+async def test_complete_stores_result(queue: JobQueue) -> None:
+    """Completed jobs expose their result"""
+    job = await queue.submit(interpret_job(), is_authed=True)
+    record = await queue.dequeue(timeout=1)
+    assert record is not None
+    await queue.complete(record, {"notes": ["done"]})
+
+    status = await queue.get(job.id)
+    assert status is not None
+    assert status.status == "succeeded"
+    assert status.result == {"notes": ["done"]}
+    assert await queue.redis_client.llen(QUEUES["authed"]) == 0  # type: ignore[union-attr]
+    assert json.loads(await queue.redis_client.get(f"job:{job.id}"))["attempts"] == 1  # type: ignore[union-attr,arg-type]
+
+
+@pytest.mark.asyncio
+async def test_crashed_worker_job_is_requeued(queue: JobQueue) -> None:
+    """A job whose worker died mid-job goes back on its queue once its lease runs out"""
+    crashed = JobQueue(worker_id="crashed")
+    crashed.redis_client = queue.redis_client
+    job = await queue.submit(generate_job(), is_authed=False)
+
+    record = await crashed.dequeue(timeout=1)
+    assert record is not None and record["id"] == job.id
+    # The worker dies here; nothing is requeued while its lease lasts
+    assert await queue.requeue_expired() == 0
+    await queue.redis_client.zadd(LEASES, {job.id: 0})  # type: ignore[union-attr]
+
+    assert await queue.requeue_expired() == 1
+    assert (await queue.get(job.id)).status == "queued"  # type: ignore[union-attr]
+    assert await queue.redis_client.llen(crashed.processing_key) == 0  # type: ignore[union-attr]
+
+    record = await queue.dequeue(timeout=1)
+    assert record is not None
+    assert (record["id"], record["attempts"], record["worker"]) == (job.id, 2, queue.worker_id)
+
+    # With attempts exhausted, a lost job fails instead of looping
+    await queue.redis_client.zadd(LEASES, {job.id: 0})  # type: ignore[union-attr]
+    assert await queue.requeue_expired() == 0
+    assert (await queue.get(job.id)).status == "failed"  # type: ignore[union-attr]
+
+
+@pytest.mark.asyncio
+async def test_unleased_processing_job_is_requeued(queue: JobQueue) -> None:
+    """A worker that died between taking a job and leasing it still loses the job"""
+    job = await queue.submit(generate_job(), is_authed=True)
+    await queue.redis_client.lmove(  # type: ignore[union-attr]
+        QUEUES["authed"], "jobs:processing:crashed", "RIGHT", "LEFT"
+    )
+    record = json.loads(await queue.redis_client.get(f"job:{job.id}"))  # type: ignore[union-attr,arg-type]
+    record.update(status="running", attempts=1)
+    await queue.redis_client.set(f"job:{job.id}", json.dumps(record))  # type: ignore[union-attr]
+
+    # The reaper leases it first, then requeues it when that lease runs out
+    assert await queue.requeue_expired() == 0
+    assert await queue.redis_client.zscore(LEASES, job.id) is not None  # type: ignore[union-attr]
+    await queue.redis_client.zadd(LEASES, {job.id: 0})  # type: ignore[union-attr]
+    assert await queue.requeue_expired() == 1
+    assert await queue.redis_client.llen(QUEUES["authed"]) == 1  # type: ignore[union-attr]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1:8000/hook",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.0.0.5/hook",
+        "http://[::1]/hook",
+        "http://localhost/hook",
+    ],
+)
+async def test_callbacks_to_internal_addresses_are_refused(
+    url: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Client-supplied callback URLs can't reach loopback, private or metadata addresses"""
+    posted: list[Any] = []
+
+    async def post(self: httpx.AsyncClient, *args: Any, **kwargs: Any) -> None:
+        posted.append(args)
+
+    monkeypatch.setattr(httpx.AsyncClient, "post", post)
+    with pytest.raises(ValueError):
+        await resolve_callback_host(httpx.URL(url))
+
+    await notify({"id": "job", "status": "succeeded", "callback_url": url})
+    assert posted == []
+
+
+@pytest.mark.asyncio
+async def test_callback_connects_to_checked_address(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The POST goes to the address that was checked, not a second DNS answer"""
+    calls: list[tuple[httpx.URL, dict[str, Any]]] = []
+
+    async def getaddrinfo(host: str, port: int, **kwargs: Any) -> list[Any]:
+        assert host == "hooks.example.com"
+        return [(0, 0, 0, "", ("93.184.216.34", port))]
+
+    async def post(self: httpx.AsyncClient, url: httpx.URL, **kwargs: Any) -> None:
+        assert self.follow_redirects is False
+        calls.append((url, kwargs))
+
+    monkeypatch.setattr(asyncio.get_running_loop(), "getaddrinfo", getaddrinfo)
+    monkeypatch.setattr(httpx.AsyncClient, "post", post)
+    record = {
+        "id": "job",
+        "kind": "generate",
+        "status": "succeeded",
+        "priority": "anon",
+        "attempts": 1,
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-01T00:00:00Z",
+        "callback_url": "https://hooks.example.com:8443/hook",
+    }
+    await notify(record)
+
+    url, kwargs = calls[0]
+    assert str(url) == "https://93.184.216.34:8443/hook"
+    assert kwargs["headers"] == {"Host": "hooks.example.com:8443"}
+    assert kwargs["extensions"] == {"sni_hostname": "hooks.example.com"}
@@ -0,0 +1,87 @@
+"""Tests for the mock upstream and the load-test driver"""
+
+import httpx
+import pytest
+
+from app.llm_engine import LLMEngine
+from app.main import app
+from app.models import Channel, GenerateRequest, Incident, InterpretRequest
+from benchmarks.loadtest import SCENARIOS, compare, drive, schedule, summarize
+from benchmarks.mock_openai import MockConfig, create_app, mock_client
+
+FAST = MockConfig(base_latency_ms=0, per_token_ms=0)
+
+
+def engine(config: MockConfig = FAST) -> LLMEngine:
+    return LLMEngine(client=mock_client(create_app(config)))
+
+
+def generate_request() -> GenerateRequest:
+    return GenerateRequest(
+        incident=Incident(summary="Load", what="Down", harm="Waiting"),
+        channels=[Channel.TWITTER, Channel.CUSTOMER_EMAIL],
+    )
+
+
+@pytest.mark.asyncio
+async def test_mock_streams_chunks_the_engine_can_parse() -> None:
+    events = [
+        event async for event in engine().generate_stream(generate_request(), use_cache=False)
+    ]
+
+    drafts = [data for kind, data in events if kind == "draft"]
+    assert {d["channel"] for d in drafts} == {"twitter", "customer_email"}
+    result = next(data for kind, data in events if kind == "result")
+    assert set(result["drafts"]) == {"twitter", "customer_email"}
+
+
+@pytest.mark.asyncio
+async def test_mock_answers_interpret_prompts() -> None:
+    request = InterpretRequest.model_validate(
+        {"mode": "interpret", "incident_input": {"text": "Checkout down for 2 hours"}}
+    )
+    response = await engine().interpret(request, use_cache=False)
+    assert response.incident.summary == "Service outage"
+
+
+@pytest.mark.asyncio
+async def test_mock_injects_malformed_completions() -> None:
+    broken = engine(MockConfig(base_latency_ms=0, per_token_ms=0, malformed_rate=1.0))
+    with pytest.raises(ValueError):
+        await broken.generate(generate_request(), use_cache=False, parallel=False)
+
+
+def test_schedule_is_reproducible() -> None:
+    first = [s.name for s in schedule(SCENARIOS, 50, seed=7)]
+    assert first == [s.name for s in schedule(SCENARIOS, 50, seed=7)]
+    assert first != [s.name for s in schedule(SCENARIOS, 50, seed=8)]
+
+
+@pytest.mark.asyncio
+async def test_drive_reports_percentiles_per_scenario() -> None:
+    moderate = [s for s in SCENARIOS if s.name == "moderate"]
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api")
+
+    run = await drive({"api": client}, schedule(moderate, 8, seed=0), concurrency=4, pids=[])
+    results = summarize(run, meta={})
+
+    stats = results["scenarios"]["moderate"]
+    assert stats["requests"] == 8
+    assert stats["errors"] == 0
+    assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert results["overall"]["cpu_ms_per_request"] > 0
+
+
+def test_compare_flags_regressions_beyond_threshold() -> None:
+    def results(p95: float, rps: float, errors: float) -> dict:
+        stats = {"p50_ms": 10.0, "p95_ms": p95, "p99_ms": 40.0, "throughput_rps": rps}
+        stats["error_rate"] = errors
+        return {"overall": stats, "scenarios": {"lucky": dict(stats)}}
+
+    baseline = results(p95=20.0, rps=100.0, errors=0.0)
+    assert compare(results(p95=22.0, rps=95.0, errors=0.005), baseline, threshold=0.15) == []
+
+    regressions = compare(results(p95=30.0, rps=80.0, errors=0.05), baseline, threshold=0.15)
+    assert "overall p95_ms: 20.00 -> 30.00" in regressions
+    assert any(r.startswith("lucky throughput_rps") for r in regressions)
+    assert any(r.startswith("overall error_rate") for r in regressions)
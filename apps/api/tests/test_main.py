@@ -3,6 +3,7 @@
 import pytest
 from fastapi.testclient import TestClient
 
+from app.llm_engine import llm_engine
 from app.main import app
 
 client = TestClient(app)
@@ -67,6 +68,18 @@ async def test_generate_minimal() -> None:
     assert response.status_code in [200, 500]  # May fail without OpenAI key
 
 
+def test_over_input_budget_is_413(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A prompt that can't be trimmed to the input budget is refused up front"""
+    monkeypatch.setattr(llm_engine, "max_input_tokens", 10)
+    payload = {"incident": {"summary": "Outage", "what": "Down", "harm": "Waiting"}}
+
+    response = client.post("/v1/generate", json=payload)
+    assert response.status_code == 413
+
+    response = client.post("/v1/interpret", json={"incident_input": {"text": "Outage " * 50}})
+    assert response.status_code == 413
+
+
 def test_moderate_safe_content() -> None:
     """Test moderation with safe content"""
     payload = {"text": "We apologize for the service disruption"}
@@ -0,0 +1,103 @@
+"""Tests for Prometheus metrics"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.backends import Backend, BackendPool
+from app.config import settings
+from app.llm_engine import LLMEngine
+from app.main import app
+from app.metrics import record_tokens
+from app.models import Channel, GenerateRequest, Incident
+from benchmarks.mock_openai import MockConfig, create_app, mock_client
+
+client = TestClient(app)
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint_reports_stages() -> None:
+    """A request shows up in the stage and route histograms"""
+    payload = {"summary": "Outage", "what": "Down", "harm": "Waiting", "generator": "offline"}
+    assert client.post("/v1/lucky", json=payload).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'sorry_stage_seconds_count{stage="rate_limit"}' in response.text
+    assert 'sorry_stage_seconds_count{stage="serialization"}' in response.text
+    assert 'route="/v1/lucky"' in response.text
+
+
+def test_tokens_split_by_channel_budget() -> None:
+    before = sample("sorry_llm_tokens_total", model="m", channel="twitter", direction="output")
+    record_tokens("m", [Channel.TWITTER, Channel.CUSTOMER_EMAIL], 520, 520)
+
+    # twitter's budget is 120 of the 520 tokens across both channels
+    after = sample("sorry_llm_tokens_total", model="m", channel="twitter", direction="output")
+    assert after - before == pytest.approx(120)
+
+
+@pytest.mark.asyncio
+async def test_generate_records_tokens_and_upstream_stages() -> None:
+    engine = LLMEngine(
+        client=mock_client(create_app(MockConfig(base_latency_ms=0, per_token_ms=0)))
+    )
+    request = GenerateRequest(
+        incident=Incident(summary="Metrics", what="Down", harm="Waiting"),
+        channels=[Channel.STATUS_PAGE],
+    )
+    before = sample(
+        "sorry_llm_tokens_total",
+        model=settings.openai_model,
+        channel="status_page",
+        direction="input",
+    )
+    waits = sample("sorry_stage_seconds_count", stage="upstream_wait")
+
+    await engine.generate(request, use_cache=False)
+
+    assert sample("sorry_stage_seconds_count", stage="upstream_wait") == waits + 1
+    assert (
+        sample(
+            "sorry_llm_tokens_total",
+            model=settings.openai_model,
+            channel="status_page",
+            direction="input",
+        )
+        > before
+    )
+
+
+@pytest.mark.asyncio
+async def test_upstream_errors_counted_by_kind() -> None:
+    mock = create_app(MockConfig(base_latency_ms=0, per_token_ms=0, error_rate=1.0))
+    pool = BackendPool([Backend("flaky", mock_client(mock), "gpt")])
+    before = sample("sorry_upstream_errors_total", backend="flaky", kind="server_error")
+
+    with pytest.raises(Exception):
+        await pool.complete(messages=[{"role": "user", "content": "CHANNELS: twitter"}])
+
+    assert sample("sorry_upstream_errors_total", backend="flaky", kind="server_error") == before + 1
+
+
+def test_multiprocess_mode_aggregates_workers(tmp_path: Path) -> None:
+    """Samples written by separate processes are summed by /metrics"""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = "from app.metrics import RATE_LIMITED; RATE_LIMITED.labels('/v1/lucky').inc()"
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True)
+
+    render = "from app.metrics import render; print(render()[0].decode())"
+    output = subprocess.run(
+        [sys.executable, "-c", render], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    assert 'sorry_rate_limited_total{route="/v1/lucky"} 2.0' in output
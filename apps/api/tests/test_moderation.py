@@ -0,0 +1,101 @@
+"""Tests for the moderation engine"""
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from app.moderation import ModerationEngine, compile_terms, load_rules
+
+
+def write_rules(path: Path, rules: list[dict[str, object]]) -> None:
+    path.write_text(json.dumps({"rules": rules}))
+
+
+def test_compiled_pattern_prefers_longest_term() -> None:
+    """Shared prefixes are factored out and the longest term wins"""
+    pattern = compile_terms(["tragedy", "tragedy profit", "trade"])
+
+    assert [m.group() for m in pattern.finditer("Trade on TRAGEDY  profit")] == [
+        "Trade",
+        "TRAGEDY  profit",
+    ]
+    # Word boundaries: no match inside longer words
+    assert pattern.search("tradespeople") is None
+
+
+def test_scan_reports_every_category_and_span(tmp_path: Path) -> None:
+    """One pass reports all matches, including terms in several categories"""
+    rules = tmp_path / "rules.json"
+    write_rules(
+        rules,
+        [
+            {"category": "hate_violence", "terms": ["hate", "violence"]},
+            {"category": "illegal", "terms": ["exploit", "violence"]},
+        ],
+    )
+    engine = ModerationEngine(rules)
+
+    result = engine.check("No hate. We exploit nothing; violence is wrong")
+
+    assert result["allowed"] is False
+    assert result["category"] == "policy_violation"
+    assert result["categories"] == ["hate_violence", "illegal"]
+    assert [(m["term"], m["category"], m["start"]) for m in result["matches"]] == [
+        ("hate", "hate_violence", 3),
+        ("exploit", "illegal", 12),
+        ("violence", "hate_violence", 29),
+        ("violence", "illegal", 29),
+    ]
+    assert engine.check("We apologize for the outage")["allowed"] is True
+
+
+def test_rules_hot_reload(tmp_path: Path) -> None:
+    """Edited rule files are picked up without a restart"""
+    rules = tmp_path / "rules.json"
+    write_rules(rules, [{"category": "illegal", "terms": ["exploit"]}])
+    engine = ModerationEngine(rules)
+    engine.reload_interval = 0
+
+    assert engine.check("refund scam")["allowed"] is True
+
+    write_rules(rules, [{"category": "fraud", "terms": ["refund scam"]}])
+    os.utime(rules, (1, rules.stat().st_mtime + 10))
+
+    assert engine.check("refund scam")["categories"] == ["fraud"]
+
+
+def test_rules_directory_is_merged(tmp_path: Path) -> None:
+    """Every JSON file in a rules directory contributes rules"""
+    write_rules(tmp_path / "base.json", [{"category": "illegal", "terms": ["exploit"]}])
+    write_rules(tmp_path / "brand.json", [{"category": "brand", "terms": ["competitor"]}])
+    engine = ModerationEngine(tmp_path)
+
+    assert engine.check("exploit the competitor")["categories"] == ["illegal", "brand"]
+
+
+def test_deleted_rules_file_is_dropped(tmp_path: Path) -> None:
+    """Removing an older file from a rules directory removes its rules"""
+    write_rules(tmp_path / "base.json", [{"category": "illegal", "terms": ["exploit"]}])
+    write_rules(tmp_path / "brand.json", [{"category": "brand", "terms": ["competitor"]}])
+    os.utime(tmp_path / "base.json", (1, 1))
+    engine = ModerationEngine(tmp_path)
+    engine.reload_interval = 0
+    assert engine.check("exploit")["allowed"] is False
+
+    (tmp_path / "base.json").unlink()
+
+    assert engine.check("exploit")["allowed"] is True
+
+
+@pytest.mark.parametrize("term", ["", "   "])
+def test_empty_terms_are_rejected(tmp_path: Path, term: str) -> None:
+    """An empty term would match everywhere, so the rules fail to load"""
+    rules = tmp_path / "rules.json"
+    write_rules(rules, [{"category": "illegal", "terms": ["exploit", term]}])
+
+    with pytest.raises(ValueError, match="empty term"):
+        load_rules(rules)
+    with pytest.raises(ValueError):
+        compile_terms(["exploit", term])
@@ -0,0 +1,112 @@
+"""Tests for the offline template generator"""
+
+import itertools
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.channels import draft_violations
+from app.llm_engine import llm_engine
+from app.main import app
+from app.models import BrandProfile, Channel, GenerateRequest, Incident, Severity, Sliders, Tone
+from app.offline import offline_generator
+
+client = TestClient(app)
+
+
+def make_request(**overrides: object) -> GenerateRequest:
+    fields: dict[str, object] = {
+        "incident": Incident(
+            summary="Checkout was down for two hours",
+            what="A bad deploy broke payments",
+            harm="Customers could not complete orders",
+        ),
+        "channels": list(Channel),
+    }
+    fields.update(overrides)
+    return GenerateRequest(**fields)  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize("tone,severity,level", itertools.product(Tone, Severity, [0, 30, 65, 100]))
+def test_drafts_follow_channel_rules(tone: Tone, severity: Severity, level: int) -> None:
+    """Every channel draft fits its length rules across tones, severities and sliders"""
+    request = make_request(
+        tone=tone,
+        sliders=Sliders(contrition=level, legal_hedging=level, memes=level),
+    )
+    request.incident.severity = severity
+
+    response = llm_engine.generate_offline(request)
+
+    assert set(response.drafts) == {c.value for c in Channel}
+    for channel in Channel:
+        draft = response.drafts[channel.value].model_dump()
+        assert draft_violations(channel, draft) == [], (channel, draft)
+
+
+def test_slider_mappings() -> None:
+    """Contrition and hedging bands change the wording deterministically"""
+    low = offline_generator.generate(make_request(sliders=Sliders(contrition=10)), [])
+    high = offline_generator.generate(
+        make_request(sliders=Sliders(contrition=80, legal_hedging=70)), []
+    )
+
+    assert low.detectors.non_apology is True
+    assert "aware" in low.drafts["twitter"].useful or "attention" in low.drafts["twitter"].useful
+    assert high.drafts["twitter"].useful.startswith("We ")
+    assert "Without admission of liability" in high.drafts["ceo_letter"].useful
+    assert high.metrics.sincerity_score > low.metrics.sincerity_score
+
+    # Same input, same output
+    again = offline_generator.generate(make_request(sliders=Sliders(contrition=10)), [])
+    assert again == low
+
+
+@pytest.mark.parametrize("brand", [None, "Acme"])
+def test_indirect_ownership_reads_with_and_without_brand(brand: str | None) -> None:
+    """Low contrition speaks as the brand when named, and as "we" otherwise"""
+    ownership = set()
+    for i in range(10):
+        request = make_request(
+            incident=Incident(summary=f"Outage {i} happened", what="Down", harm="Waiting"),
+            brand_profile=BrandProfile(name=brand) if brand else None,
+            sliders=Sliders(contrition=20),
+            channels=[Channel.TWITTER],
+        )
+        useful = offline_generator.generate(request, []).drafts["twitter"].useful
+        ownership.add(useful.split(f"outage {i}")[0].split(". ")[-1])
+
+    if brand:
+        assert ownership == {"Acme is aware that ", "It has come to Acme's attention that "}
+    else:
+        assert ownership == {"We are aware that ", "It has come to our attention that "}
+
+
+def test_long_input_is_trimmed_for_twitter() -> None:
+    """User text never pushes a tweet past the limit"""
+    request = make_request(
+        incident=Incident(summary="x " * 300, what="y", harm="z"),
+        brand_profile=BrandProfile(name="Acme"),
+        channels=[Channel.TWITTER],
+    )
+
+    draft = offline_generator.generate(request, []).drafts["twitter"]
+    assert len(draft.useful) <= 280
+
+
+def test_lucky_offline_generator() -> None:
+    """/v1/lucky can skip the LLM entirely"""
+    payload = {
+        "summary": "Login outage",
+        "what": "Auth service down",
+        "harm": "No logins",
+        "generator": "offline",
+    }
+
+    response = client.post("/v1/lucky", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["generator"] == "offline"
+    assert data["twitter"]["useful"]
+    assert data["customer_email"]["pointless"]
@@ -0,0 +1,176 @@
+"""Tests for compact prompt encoding"""
+
+import json
+
+import pytest
+
+from app import prompt_encoder
+from app.models import (
+    BrandProfile,
+    Channel,
+    GenerateRequest,
+    Incident,
+    Severity,
+    Sliders,
+    Strategy,
+    Tone,
+)
+from app.prompt_encoder import (
+    GENERATE_SYSTEM_PROMPT,
+    PromptTooLargeError,
+    count_message_tokens,
+    fit_generate_budget,
+    generate_messages,
+    generate_user_prompt,
+)
+
+CORPUS = [
+    GenerateRequest(
+        incident=Incident(summary="Login outage", what="Auth service down", harm="No logins"),
+    ),
+    GenerateRequest(
+        incident=Incident(
+            summary="Data exposure",
+            what="Misconfigured bucket exposed invoices",
+            harm="Customer invoices publicly readable for 3 days",
+            severity=Severity.HIGH,
+            stakeholders=["customers", "regulators"],
+            jurisdictions=["EU"],
+        ),
+        sliders=Sliders(contrition=80, legal_hedging=60),
+        tone=Tone.STOIC,
+        channels=[Channel.PRESS_RELEASE, Channel.CUSTOMER_EMAIL, Channel.STATUS_PAGE],
+    ),
+    GenerateRequest(
+        incident=Incident(
+            summary="Price glitch", what="Checkout doubled prices", harm="Overcharges"
+        ),
+        sliders=Sliders(memes=30),
+        tone=Tone.CHEEKY,
+        channels=[Channel.TWITTER, Channel.LINKEDIN],
+        brand_profile=BrandProfile(
+            name="Acme",
+            values=["honesty"],
+            exemplar_paragraphs=["We build things that work, and we fix them when they don't."],
+        ),
+    ),
+]
+
+
+def legacy_user_prompt(request: GenerateRequest) -> str:
+    """The user prompt as it was built before compact encoding"""
+    brand = (
+        f"BRAND PROFILE: {json.dumps(request.brand_profile.model_dump(), indent=2)}"
+        if request.brand_profile
+        else ""
+    )
+    return f"""Generate apologies for this incident:
+
+INCIDENT:
+{json.dumps(request.incident.model_dump(mode="json"), indent=2)}
+
+SLIDERS:
+{json.dumps(request.sliders.model_dump(), indent=2)}
+
+STRATEGY:
+{json.dumps(request.strategy.model_dump(mode="json"), indent=2)}
+
+TONE: {request.tone.value}
+CHANNELS: {', '.join(c.value for c in request.channels)}
+LOCALE: {request.locale}
+
+{brand}
+
+Generate drafts for ALL requested channels.
+Each channel must have both useful and pointless variants.
+Include metrics, detectors, adjustments, and rationales."""
+
+
+def test_compact_prompt_reduces_user_tokens() -> None:
+    """The per-request part of the prompt shrinks across the corpus"""
+    legacy = sum(
+        count_message_tokens([{"role": "user", "content": legacy_user_prompt(r)}]) for r in CORPUS
+    )
+    compact = sum(
+        count_message_tokens([{"role": "user", "content": generate_user_prompt(r)}]) for r in CORPUS
+    )
+
+    reduction = 1 - compact / legacy
+    assert reduction > 0.5, f"legacy={legacy} compact={compact} reduction={reduction:.0%}"
+
+
+def test_omitted_fields_decode_to_request() -> None:
+    """Omitted fields are exactly the defaults, so nothing is lost"""
+    for request in CORPUS:
+        lines = dict(line.split(": ", 1) for line in generate_user_prompt(request).splitlines())
+        assert Incident(**json.loads(lines["INCIDENT"])) == request.incident
+        assert Sliders(**json.loads(lines.get("SLIDERS", "{}"))) == request.sliders
+        assert Strategy(**json.loads(lines.get("STRATEGY", "{}"))) == request.strategy
+
+    # The system prompt is identical for every request
+    assert {generate_messages(r)[0]["content"] for r in CORPUS} == {GENERATE_SYSTEM_PROMPT}
+
+
+def test_budget_drops_exemplars_last_first() -> None:
+    """Exemplar paragraphs are trimmed from the end until the prompt fits"""
+    paragraphs = [f"Exemplar {i}: " + "we own our mistakes " * 20 for i in range(5)]
+    request = GenerateRequest(
+        incident=Incident(summary="Outage", what="Down", harm="Waiting"),
+        brand_profile=BrandProfile(name="Acme", exemplar_paragraphs=list(paragraphs)),
+    )
+    full = count_message_tokens(generate_messages(request))
+    per_paragraph = full - count_message_tokens(
+        generate_messages(
+            request.model_copy(
+                update={
+                    "brand_profile": BrandProfile(name="Acme", exemplar_paragraphs=paragraphs[:4])
+                }
+            )
+        )
+    )
+
+    adjustments = fit_generate_budget(request, full - 2 * per_paragraph)
+
+    assert request.brand_profile is not None
+    assert request.brand_profile.exemplar_paragraphs == paragraphs[:3]
+    assert adjustments == ["Dropped 2 brand exemplar paragraph(s) to fit the input token budget"]
+    assert fit_generate_budget(request, full) == []
+
+
+def test_budget_fails_when_trimming_is_not_enough() -> None:
+    """A prompt over budget with no exemplars left is refused, not sent"""
+    request = GenerateRequest(
+        incident=Incident(summary="Outage", what="Down", harm="Waiting"),
+        brand_profile=BrandProfile(name="Acme", exemplar_paragraphs=["We own our mistakes."]),
+    )
+    without_exemplars = count_message_tokens(
+        generate_messages(request.model_copy(update={"brand_profile": BrandProfile(name="Acme")}))
+    )
+
+    with pytest.raises(PromptTooLargeError):
+        fit_generate_budget(request, without_exemplars - 1)
+
+
+def test_budget_counts_each_exemplar_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Trimming doesn't re-encode the whole prompt for every dropped exemplar"""
+    paragraphs = [f"Exemplar {i}: " + "we own our mistakes " * 20 for i in range(20)]
+    request = GenerateRequest(
+        incident=Incident(summary="Outage", what="Down", harm="Waiting"),
+        brand_profile=BrandProfile(name="Acme", exemplar_paragraphs=list(paragraphs)),
+    )
+    budget = count_message_tokens(generate_messages(request)) // 2
+    calls = 0
+    count = prompt_encoder.count_message_tokens
+
+    def counting(*args: object) -> int:
+        nonlocal calls
+        calls += 1
+        return count(*args)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(prompt_encoder, "count_message_tokens", counting)
+    fit_generate_budget(request, budget)
+
+    assert request.brand_profile is not None
+    assert 0 < len(request.brand_profile.exemplar_paragraphs) < 20
+    assert count(generate_messages(request)) <= budget
+    assert calls <= 3
@@ -0,0 +1,99 @@
+"""Tests for the GCRA rate limiter (require a local Redis)"""
+
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+import redis.asyncio as redis
+
+from app.rate_limiter import RateLimiter, RateLimitResult
+
+
+@pytest.fixture
+async def limiter() -> AsyncIterator[RateLimiter]:
+    """Limiter on a scratch Redis database, skipped if Redis is unavailable"""
+    rate_limiter = RateLimiter()
+    rate_limiter.redis_client = redis.from_url("redis://localhost:6379/15", decode_responses=True)
+    try:
+        await rate_limiter.redis_client.flushdb()
+    except Exception:
+        pytest.skip("Redis is not available")
+    rate_limiter.anon_limit = 10
+    yield rate_limiter
+    await rate_limiter.redis_client.flushdb()
+    await rate_limiter.close()
+
+
+def test_headers() -> None:
+    """Denied results carry Retry-After, allowed ones do not"""
+    allowed = RateLimitResult(allowed=True, limit=10, remaining=3, reset_after=12.2)
+    assert allowed.headers() == {
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "3",
+        "X-RateLimit-Reset": "13",
+    }
+    denied = RateLimitResult(
+        allowed=False, limit=10, remaining=0, reset_after=3600, retry_after=359.5
+    )
+    assert denied.headers()["Retry-After"] == "360"
+
+
+@pytest.mark.asyncio
+async def test_remaining_counts_down(limiter: RateLimiter) -> None:
+    """Remaining quota decreases per request and cost is charged in full"""
+    first = await limiter.check_rate_limit("client", is_authed=False)
+    assert first.allowed and first.remaining == 9
+
+    batch = await limiter.check_rate_limit("client", is_authed=False, cost=4)
+    assert batch.allowed and batch.remaining == 5
+
+    too_big = await limiter.check_rate_limit("client", is_authed=False, cost=6)
+    assert not too_big.allowed
+    assert too_big.retry_after > 0
+
+
+@pytest.mark.asyncio
+async def test_no_overshoot_under_concurrency(limiter: RateLimiter) -> None:
+    """Concurrent bursts never admit more than the limit"""
+    results = await asyncio.gather(
+        *(limiter.check_rate_limit("burst", is_authed=False) for _ in range(200))
+    )
+    assert sum(r.allowed for r in results) == 10
+
+
+@pytest.mark.asyncio
+async def test_leases_cut_redis_round_trips(limiter: RateLimiter) -> None:
+    """Authed clients spend leased quota locally without overshooting"""
+    limiter.authed_limit = 100
+    limiter.lease_size = 20
+
+    results = [await limiter.check_rate_limit("leased", is_authed=True) for _ in range(120)]
+
+    assert sum(r.allowed for r in results) == 100
+    # Lease of 10 per round trip: 10 leases, one denial, then local blocks
+    assert limiter.stats()["redis_calls"] == 11
+    assert limiter.stats()["local_blocks"] == 19
+    assert results[-1].retry_after > 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_leases_never_overshoot(limiter: RateLimiter) -> None:
+    """Concurrent checks sharing leases admit exactly the limit"""
+    limiter.authed_limit = 100
+    limiter.lease_size = 20
+
+    results = await asyncio.gather(
+        *(limiter.check_rate_limit("burst", is_authed=True) for _ in range(300))
+    )
+    assert sum(r.allowed for r in results) == 100
+
+
+@pytest.mark.asyncio
+async def test_denied_batch_does_not_block_single_requests(limiter: RateLimiter) -> None:
+    """A batch over the remaining quota leaves single requests to Redis"""
+    too_big = await limiter.check_rate_limit("batcher", is_authed=False, cost=11)
+    assert not too_big.allowed
+
+    single = await limiter.check_rate_limit("batcher", is_authed=False)
+    assert single.allowed
+    assert limiter.stats()["local_blocks"] == 0
@@ -0,0 +1,212 @@
+"""Tests for the adaptive limiter and circuit breaker"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.llm_engine import LLMEngine
+from app.main import app
+from app.models import GenerateRequest, Incident
+from app.resilience import AdaptiveLimiter, CircuitBreaker, UpstreamGuard, UpstreamUnavailableError
+from benchmarks.mock_openai import MockConfig, create_app, mock_client
+
+
+def make_request(summary: str) -> GenerateRequest:
+    return GenerateRequest(incident=Incident(summary=summary, what="Down", harm="Waiting"))
+
+
+def make_guard(limiter: AdaptiveLimiter | None = None, **breaker: float) -> UpstreamGuard:
+    return UpstreamGuard(
+        limiter=limiter
+        or AdaptiveLimiter(
+            initial=16, minimum=1, maximum=64, latency_tolerance=100, queue_timeout=5
+        ),
+        breaker=CircuitBreaker(
+            failure_ratio=breaker.get("failure_ratio", 2.0),  # never opens by default
+            min_calls=int(breaker.get("min_calls", 10)),
+            window=int(breaker.get("window", 20)),
+            reset_timeout=breaker.get("reset_timeout", 30),
+        ),
+    )
+
+
+async def simulate(limiter: AdaptiveLimiter, calls: int) -> tuple[int, int]:
+    """Fire ``calls`` generations at an upstream that throttles above 4 in flight"""
+    mock = create_app(MockConfig(base_latency_ms=20, per_token_ms=0, max_concurrency=4))
+    engine = LLMEngine(client=mock_client(mock), guard=make_guard(limiter))
+
+    async def one(i: int) -> bool:
+        # Callers pace themselves a little, like real traffic
+        await asyncio.sleep(i * 0.002)
+        try:
+            await engine.generate(make_request(f"Simulated outage {i}"), use_cache=False)
+            return True
+        except Exception:
+            return False
+
+    results = await asyncio.gather(*(one(i) for i in range(calls)))
+    return sum(results), mock.state.throttled
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_backs_off_under_throttling() -> None:
+    """The AIMD limit converges near upstream capacity and cuts 429s"""
+    adaptive = AdaptiveLimiter(
+        initial=32,
+        minimum=1,
+        maximum=64,
+        latency_tolerance=100,
+        queue_timeout=5,
+        decrease_interval=0.05,
+    )
+    # Same starting point, but the limit never comes down
+    fixed = AdaptiveLimiter(
+        initial=32, minimum=32, maximum=32, latency_tolerance=100, queue_timeout=5
+    )
+
+    adaptive_ok, adaptive_throttled = await simulate(adaptive, 300)
+    fixed_ok, fixed_throttled = await simulate(fixed, 300)
+
+    figures = (
+        f"adaptive: ok={adaptive_ok} throttled={adaptive_throttled} limit={int(adaptive.limit)}; "
+        f"fixed: ok={fixed_ok} throttled={fixed_throttled}"
+    )
+    assert adaptive.decreases > 0, figures
+    assert adaptive.limit < 16, figures
+    assert adaptive_throttled < fixed_throttled / 2, figures
+    assert adaptive_ok > fixed_ok, figures
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_and_serves_cache() -> None:
+    """An unhealthy upstream opens the breaker; cached results still serve"""
+    config = MockConfig(base_latency_ms=0, per_token_ms=0)
+    mock = create_app(config)
+    guard = make_guard(failure_ratio=0.5, min_calls=4, window=4, reset_timeout=0.2)
+    engine = LLMEngine(client=mock_client(mock), guard=guard)
+
+    cached = await engine.generate(make_request("Cached outage"), use_cache=False)
+
+    config.error_rate = 1.0
+    for i in range(3):
+        with pytest.raises(Exception):
+            await engine.generate(make_request(f"Failing outage {i}"), use_cache=False)
+    assert guard.breaker.state == "open"
+
+    # Fails fast without calling upstream
+    requests = mock.state.requests
+    with pytest.raises(UpstreamUnavailableError):
+        await engine.generate(make_request("Another outage"), use_cache=False)
+    assert mock.state.requests == requests
+
+    # A fresh result was asked for, but the cached one beats a 503
+    served = await engine.generate(make_request("Cached outage"), use_cache=False)
+    assert served.drafts == cached.drafts
+
+    # After the cooldown one probe goes through and closes the breaker
+    config.error_rate = 0.0
+    time.sleep(0.25)
+    assert guard.breaker.state == "half_open"
+    await engine.generate(make_request("Recovered outage"), use_cache=False)
+    assert guard.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_limiter_sheds_when_queue_wait_expires() -> None:
+    """Callers queued past the timeout get UpstreamUnavailableError"""
+    limiter = AdaptiveLimiter(
+        initial=1, minimum=1, maximum=1, latency_tolerance=2, queue_timeout=0.05
+    )
+
+    await limiter.acquire()
+    with pytest.raises(UpstreamUnavailableError):
+        await limiter.acquire()
+    limiter.release()
+
+    await limiter.acquire()
+    assert limiter.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_queued_probe_releases_breaker() -> None:
+    """A half-open probe cancelled while queued for a slot frees the probe"""
+    limiter = AdaptiveLimiter(
+        initial=1, minimum=1, maximum=1, latency_tolerance=None, queue_timeout=5
+    )
+    guard = make_guard(limiter, failure_ratio=0.5, min_calls=1, window=1, reset_timeout=0)
+    guard.breaker.record_failure()
+    assert guard.breaker.state == "half_open"
+
+    async def probe() -> None:
+        async with guard.slot():
+            pass
+
+    await limiter.acquire()
+    task = asyncio.create_task(probe())
+    await asyncio.sleep(0)
+    assert limiter.stats()["queued"] == 1
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    limiter.release()
+
+    # The next caller gets to probe, and closes the breaker
+    async with guard.slot():
+        pass
+    assert guard.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_shed_call_does_not_release_anothers_probe() -> None:
+    """Only the probe's own outcome frees the half-open probe"""
+    limiter = AdaptiveLimiter(
+        initial=1, minimum=1, maximum=1, latency_tolerance=None, queue_timeout=0.2
+    )
+    guard = make_guard(limiter, failure_ratio=0.5, min_calls=1, window=1, reset_timeout=0)
+
+    async def call() -> None:
+        async with guard.slot():
+            pass
+
+    await limiter.acquire()
+    # Admitted while closed, then shed by the queue timeout
+    shed = asyncio.create_task(call())
+    await asyncio.sleep(0.1)
+    guard.breaker.record_failure()
+    probe = asyncio.create_task(call())
+    await asyncio.sleep(0.15)
+
+    with pytest.raises(UpstreamUnavailableError):
+        await shed
+    assert not probe.done()
+    assert guard.breaker.allow() is None
+
+    limiter.release()
+    await probe
+    assert guard.breaker.state == "closed"
+
+
+def test_mixed_length_calls_do_not_shrink_limit() -> None:
+    """With the shipped settings, long drafts next to short ones aren't overload"""
+    limiter = UpstreamGuard().limiter
+    initial = limiter.limit
+
+    for i in range(100):
+        # Tweets next to CEO letters: 20x spread in call duration
+        limiter.on_success(0.1 if i % 2 else 2.0)
+
+    assert limiter.decreases == 0
+    assert limiter.limit > initial
+
+
+def test_upstream_diagnostics_endpoint() -> None:
+    """Breaker, limiter and backend stats are exposed"""
+    response = TestClient(app).get("/v1/diagnostics/upstream")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["breaker"]["state"] in ("closed", "open", "half_open")
+    assert "limit" in data["limiter"]
+    assert data["backends"]
@@ -0,0 +1,120 @@
+"""Tests for the semantic near-duplicate cache"""
+
+import pytest
+
+from app.models import Channel, GenerateRequest, Incident, Severity, Sliders, Tone
+from app.semantic_cache import (
+    HashingEmbedder,
+    InMemoryVectorStore,
+    SemanticCache,
+    cosine_distance,
+    generate_query,
+)
+
+
+def make_request(
+    summary: str = "Database outage",
+    contrition: int = 65,
+    tone: Tone = Tone.EARNEST,
+    channels: list[Channel] | None = None,
+) -> GenerateRequest:
+    """Build a generate request with a configurable summary"""
+    return GenerateRequest(
+        incident=Incident(
+            summary=summary,
+            what="Our primary database went down for two hours",
+            harm="Customers could not log in or place orders",
+            severity=Severity.MEDIUM,
+        ),
+        sliders=Sliders(contrition=contrition),
+        tone=tone,
+        channels=channels or [Channel.TWITTER],
+    )
+
+
+def make_cache() -> SemanticCache:
+    """Build an enabled cache with the local embedder and store"""
+    cache = SemanticCache(embedder=HashingEmbedder(128), store=InMemoryVectorStore(ttl=60))
+    cache.enabled = True
+    cache.max_distance = 0.1
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_hashing_embedder_is_deterministic() -> None:
+    """The local embedder is stable and unit length"""
+    embedder = HashingEmbedder(64)
+    first = await embedder.embed("Database outage for two hours")
+    second = await embedder.embed("Database outage for two hours")
+    assert first == second
+    assert abs(sum(v * v for v in first) - 1.0) < 1e-9
+    assert cosine_distance(first, await embedder.embed("Coffee machine on fire")) > 0.5
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_hits() -> None:
+    """A lightly reworded incident with similar sliders is served from cache"""
+    cache = make_cache()
+    await cache.set(generate_query(make_request(), "gpt"), "payload")
+
+    hit = await cache.get(generate_query(make_request("Database outage!", contrition=66), "gpt"))
+    assert hit == "payload"
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_scope_and_threshold_misses() -> None:
+    """Tone/channel/slider band mismatches never match; distant incidents are near misses"""
+    cache = make_cache()
+    await cache.set(generate_query(make_request(), "gpt"), "payload")
+
+    assert await cache.get(generate_query(make_request(tone=Tone.CHEEKY), "gpt")) is None
+    assert (
+        await cache.get(generate_query(make_request(channels=[Channel.LINKEDIN]), "gpt")) is None
+    )
+    assert await cache.get(generate_query(make_request(contrition=5), "gpt")) is None
+    assert await cache.get(generate_query(make_request("Coffee machine on fire"), "gpt")) is None
+
+    stats = cache.stats()
+    assert stats["empty"] == 3
+    assert stats["near_misses"] == 1
+    assert stats["hit_rate"] == 0.0
+
+
+@pytest.mark.asyncio
+async def test_matching_sliders_do_not_outweigh_text() -> None:
+    """Identical, extreme sliders never make different incidents match"""
+    cache = make_cache()
+    cache.max_distance = 0.08
+    sliders = Sliders(
+        contrition=100,
+        legal_hedging=100,
+        memes=100,
+        accountability_evasion=100,
+        profit_alchemist=100,
+        risk_transfer=100,
+        data_fog=100,
+        pseudo_transparency=100,
+    )
+    first = make_request()
+    other = make_request("Database breach")
+    other.incident.what = "Attackers copied our primary database"
+    other.incident.harm = "Customers had their personal data exposed"
+    for request in (first, other):
+        request.sliders = sliders
+        request.strategy.scapegoat.intensity = 100
+        request.strategy.distraction.intensity = 100
+        request.strategy.victimless_frame = True
+
+    await cache.set(generate_query(first, "gpt"), "payload")
+    assert await cache.get(generate_query(other, "gpt")) is None
+    assert cache.stats()["near_misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_in_memory_store_drops_expired_entries() -> None:
+    """Expired entries are removed on write, not just skipped on lookup"""
+    store = InMemoryVectorStore(ttl=0)
+    await store.add("scope", [1.0], "old")
+    await store.add("scope", [1.0], "new")
+    assert len(store._entries) == 1
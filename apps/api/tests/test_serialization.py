@@ -0,0 +1,57 @@
+"""Tests for the orjson response path and direct completion parsing"""
+
+import pytest
+from fastapi.responses import ORJSONResponse
+
+from app.llm_engine import llm_engine
+from app.main import LUCKY_TEMPLATE, _lucky_request, app
+from app.models import GenerateRequest, Incident, LuckyRequest, Severity, Sliders
+
+
+def test_default_response_class_is_orjson() -> None:
+    assert issubclass(app.router.default_response_class, ORJSONResponse)
+
+
+def test_lucky_request_matches_validated_build() -> None:
+    """The template path yields the same request as validating from scratch"""
+    body = LuckyRequest(summary="Outage", what="Deploy broke checkout", harm="Orders failed")
+    request = _lucky_request(body)
+
+    expected = GenerateRequest.model_validate(
+        {
+            **LUCKY_TEMPLATE.model_dump(),
+            "incident": {
+                **LUCKY_TEMPLATE.incident.model_dump(),
+                "summary": "Outage",
+                "what": "Deploy broke checkout",
+                "harm": "Orders failed",
+                "severity": Severity.MEDIUM,
+            },
+        }
+    )
+    assert request.model_dump() == expected.model_dump()
+
+
+def test_lucky_request_guardrails_do_not_leak_into_template() -> None:
+    """Severity clamps mutate the copy, never the shared template"""
+    body = LuckyRequest(summary="Breach", what="Data exposed", harm="Users", severity="high")
+    llm_engine.generate_offline(_lucky_request(body))
+
+    assert (
+        LUCKY_TEMPLATE.sliders.model_dump()
+        == Sliders(contrition=65, legal_hedging=30, memes=10).model_dump()
+    )
+    assert LUCKY_TEMPLATE.strategy.responsibility_split.brand == 0.5
+    assert LUCKY_TEMPLATE.incident.summary == ""
+
+
+def test_parse_generate_validates_json_directly() -> None:
+    request = GenerateRequest(incident=Incident(summary="s", what="w", harm="h"))
+    content = '{"drafts": {"twitter": {"useful": "We caused this. Sorry.", "pointless": "Oops"}}}'
+
+    response = llm_engine._parse_generate(request, content, ["Reduced memes"])
+    assert response.drafts["twitter"].pointless == "Oops"
+    assert response.adjustments == ["Reduced memes"]
+
+    with pytest.raises(ValueError):
+        llm_engine._parse_generate(request, '{"drafts": {"twitter": "not a draft"}}', [])
@@ -0,0 +1,114 @@
+"""Tests for single-flight request coalescing"""
+
+import asyncio
+
+import pytest
+
+from app.llm_engine import LLMEngine
+from app.models import Channel, GenerateRequest, Incident
+from app.singleflight import SingleFlight
+from benchmarks.mock_openai import MockConfig, create_app, mock_client
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call() -> None:
+    """Identical concurrent keys run the function once"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("k", upstream) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats()["saved"] == 4
+
+    # Once settled, the next call runs again
+    await flight.do("k", upstream)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_followers() -> None:
+    """Followers see the leader's exception and the key is released"""
+    flight = SingleFlight()
+
+    async def failing() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    results = await asyncio.gather(
+        *(flight.do("k", failing) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_engine_coalesces_identical_generations() -> None:
+    """Concurrent identical uncached generate calls hit the upstream once"""
+    mock = create_app(MockConfig(base_latency_ms=50, per_token_ms=0))
+    engine = LLMEngine(client=mock_client(mock))
+
+    def request() -> GenerateRequest:
+        return GenerateRequest(
+            incident=Incident(summary="Trending outage", what="Login down", harm="No logins"),
+            channels=[Channel.TWITTER],
+        )
+
+    responses = await asyncio.gather(
+        *(engine.generate(request(), use_cache=False) for _ in range(4))
+    )
+    assert mock.state.requests == 1
+    assert len({r.drafts["twitter"].useful for r in responses}) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_fail_followers() -> None:
+    """A leader's disconnect leaves the shared call running for the followers"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    leader = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(flight.do("k", upstream)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await asyncio.gather(*followers) == ["result", "result"]
+    assert leader.cancelled()
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_call_cancelled_once_every_caller_leaves() -> None:
+    """The shared call stops when nobody is waiting for it any more"""
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def upstream() -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "result"
+
+    callers = [asyncio.create_task(flight.do("k", upstream)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    for caller in callers:
+        caller.cancel()
+
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert flight._inflight == {}
@@ -0,0 +1,53 @@
+"""Tests for cold start: lazy imports and readiness after warmup"""
+
+import time
+
+from fastapi.testclient import TestClient
+
+from app.llm_engine import llm_engine
+from app.main import app
+from benchmarks.importtime import lazy_violations, measure, parse_importtime, subtree
+
+SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   encodings
+import time:        50 |         50 |     app.config
+import time:       300 |        350 |   fastapi
+import time:       900 |       1300 | app.main
+"""
+
+
+def test_parse_importtime_depths() -> None:
+    records = parse_importtime(SAMPLE)
+    assert [(r.module, r.depth) for r in records] == [
+        ("encodings", 1),
+        ("app.config", 2),
+        ("fastapi", 1),
+        ("app.main", 0),
+    ]
+    assert [r.module for r in subtree(records, "app.main")] == [
+        "encodings",
+        "app.config",
+        "fastapi",
+    ]
+
+
+def test_import_keeps_optional_stacks_lazy() -> None:
+    """Sentry, OpenTelemetry, OpenAI and SQLAlchemy stay out of ``import app.main``"""
+    assert lazy_violations(measure("app.main")) == []
+
+
+def test_ready_after_warmup() -> None:
+    with TestClient(app) as client:
+        assert client.get("/health").status_code == 200
+
+        deadline = time.monotonic() + 10
+        response = client.get("/ready")
+        while response.status_code == 503 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            response = client.get("/ready")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert response.json()["warmup_ms"] >= 0
+        assert llm_engine._pool is not None
@@ -0,0 +1,107 @@
+"""Tests for streamed generation"""
+
+import json
+from collections.abc import AsyncIterator
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.backends import Backend, BackendPool
+from app.llm_engine import llm_engine
+from app.main import app
+from app.streaming import DraftStreamParser
+
+client = TestClient(app)
+
+COMPLETION = json.dumps(
+    {
+        "drafts": {
+            "twitter": {"useful": 'We said "sorry" — and meant it.', "pointless": "Oops {}"},
+            "customer_email": {
+                "useful": "Dear customer,\nWe failed.",
+                "pointless": "Per my last email",
+                "redlines": ["not a draft"],
+            },
+        },
+        "rationales": ["useful: owns the failure"],
+    }
+)
+
+
+def chunked(text: str, size: int) -> list[str]:
+    """Split text into fixed-size chunks"""
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, len(COMPLETION)])
+def test_parser_reports_each_draft_field(size: int) -> None:
+    """Draft fields are reported once, regardless of chunk boundaries"""
+    parser = DraftStreamParser()
+    events = [event for chunk in chunked(COMPLETION, size) for event in parser.feed(chunk)]
+
+    assert events == [
+        ("twitter", "useful", 'We said "sorry" — and meant it.'),
+        ("twitter", "pointless", "Oops {}"),
+        ("customer_email", "useful", "Dear customer,\nWe failed."),
+        ("customer_email", "pointless", "Per my last email"),
+    ]
+    assert parser.channel_complete("twitter")
+
+
+class FakeStream:
+    """Async iterator over chat completion chunks"""
+
+    def __init__(self, deltas: list[str]) -> None:
+        self._deltas = iter(deltas)
+
+    def __aiter__(self) -> "FakeStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            delta = next(self._deltas)
+        except StopIteration:
+            raise StopAsyncIteration
+        choice = SimpleNamespace(delta=SimpleNamespace(content=delta), finish_reason=None)
+        return SimpleNamespace(choices=[choice])
+
+
+def test_generate_stream_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The SSE endpoint emits drafts, the validated result and timings"""
+
+    async def create(**kwargs: Any) -> AsyncIterator[Any]:
+        assert kwargs["stream"] is True
+        return FakeStream(chunked(COMPLETION, 8))
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm_engine, "pool", BackendPool([Backend("fake", fake_client, "gpt")]))
+
+    payload = {
+        "incident": {"summary": "Stream test", "what": "Streaming", "harm": "Waiting"},
+        "channels": ["twitter", "customer_email"],
+    }
+    response = client.post(
+        "/v1/generate/stream", json=payload, headers={"Cache-Control": "no-cache"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line.removeprefix("event: "), json.loads(data_line[6:])))
+
+    names = [name for name, _ in events]
+    assert names == ["draft"] * 4 + ["result", "timings"]
+    assert events[0][1] == {
+        "channel": "twitter",
+        "variant": "useful",
+        "text": 'We said "sorry" — and meant it.',
+    }
+    # Scored locally: "We failed." is explicit ownership
+    assert events[4][1]["detectors"]["non_apology"] is False
+    assert events[4][1]["metrics"]["sincerity_score"] > 0.5
+    timings = events[5][1]
+    assert timings["ttft_ms"] <= timings["ttfc_ms"] <= timings["total_ms"]
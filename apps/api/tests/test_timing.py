@@ -0,0 +1,94 @@
+"""Tests for the timing middleware and Server-Timing header"""
+
+import asyncio
+from collections.abc import AsyncIterator
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from starlette.types import Scope
+
+from app.main import app
+from app.metrics import stage
+from app.timing import TimingMiddleware, server_timing
+
+
+def timed_app(**options: object) -> tuple[FastAPI, list[tuple[int, float]]]:
+    completed: list[tuple[int, float]] = []
+
+    def on_complete(scope: Scope, status_code: int, seconds: float) -> None:
+        completed.append((status_code, seconds))
+
+    test_app = FastAPI()
+
+    @test_app.get("/fanout")
+    async def fanout() -> dict[str, str]:
+        async def call() -> None:
+            with stage("upstream_wait"):
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(call(), call())
+        return {"status": "ok"}
+
+    @test_app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def events() -> AsyncIterator[str]:
+            for i in range(3):
+                yield f"data: {i}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    test_app.add_middleware(TimingMiddleware, on_complete=on_complete, **options)
+    return test_app, completed
+
+
+def parse(header: str) -> dict[str, float]:
+    return {
+        metric.split(";dur=")[0]: float(metric.split(";dur=")[1]) for metric in header.split(", ")
+    }
+
+
+def test_server_timing_format() -> None:
+    header = server_timing({"rate_limit": 250_000, "upstream_wait": 812_400_000}, 830_120_000)
+    assert header == "rate_limit;dur=0.25, upstream_wait;dur=812.40, total;dur=830.12"
+
+
+def test_api_reports_stage_breakdown() -> None:
+    payload = {"summary": "Outage", "what": "Down", "harm": "Waiting", "generator": "offline"}
+    response = TestClient(app).post("/v1/lucky", json=payload)
+
+    timings = parse(response.headers["Server-Timing"])
+    assert list(timings)[0] == "rate_limit"
+    assert "serialization" in timings
+    assert timings["total"] >= timings["rate_limit"]
+    allowed = response.headers["Timing-Allow-Origin"].split(", ")
+    assert "https://sorry.monster" in allowed
+    assert all("*" not in origin for origin in allowed)
+    assert float(response.headers["X-Process-Time"]) > 0
+
+
+def test_concurrent_stages_are_summed() -> None:
+    test_app, completed = timed_app()
+    response = TestClient(test_app).get("/fanout")
+
+    timings = parse(response.headers["Server-Timing"])
+    assert timings["upstream_wait"] >= 20
+    assert completed[0][0] == 200
+
+
+def test_streamed_body_passes_through() -> None:
+    test_app, completed = timed_app()
+    response = TestClient(test_app).get("/stream")
+
+    assert response.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+    assert "total" in parse(response.headers["Server-Timing"])
+    # Reported once, after the whole body has been sent
+    assert [status_code for status_code, _ in completed] == [200]
+
+
+def test_server_timing_can_be_disabled() -> None:
+    test_app, _ = timed_app(server_timing=False)
+    response = TestClient(test_app).get("/fanout")
+
+    assert "Server-Timing" not in response.headers
+    assert "X-Process-Time" in response.headers
@@ -0,0 +1,88 @@
+"""Tests for engine tracing and tail-based sampling"""
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Status, StatusCode
+
+from app.llm_engine import LLMEngine
+from app.models import Channel, GenerateRequest, Incident
+from app.tracing import TailSamplingProcessor
+from benchmarks.mock_openai import MockConfig, create_app, mock_client
+
+SECOND = 1_000_000_000
+
+
+def tail_sampled(ratio: float = 0.0) -> tuple[TracerProvider, InMemorySpanExporter]:
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(
+        TailSamplingProcessor(
+            SimpleSpanProcessor(exporter), latency_threshold=2.0, sample_ratio=ratio
+        )
+    )
+    return provider, exporter
+
+
+def record_trace(provider: TracerProvider, seconds: float, error: bool = False) -> None:
+    """One root span with a child, timed explicitly"""
+    tracer = provider.get_tracer(__name__)
+    with tracer.start_as_current_span("root", start_time=0, end_on_exit=False) as root:
+        with tracer.start_as_current_span("child", start_time=0) as child:
+            if error:
+                child.set_status(Status(StatusCode.ERROR))
+    root.end(end_time=int(seconds * SECOND))
+
+
+def test_fast_traces_are_dropped() -> None:
+    provider, exporter = tail_sampled()
+    record_trace(provider, seconds=0.1)
+    assert exporter.get_finished_spans() == ()
+
+
+def test_slow_traces_are_kept_whole() -> None:
+    provider, exporter = tail_sampled()
+    record_trace(provider, seconds=3.0)
+    assert [span.name for span in exporter.get_finished_spans()] == ["child", "root"]
+
+
+def test_failed_traces_are_kept() -> None:
+    provider, exporter = tail_sampled()
+    record_trace(provider, seconds=0.1, error=True)
+    assert len(exporter.get_finished_spans()) == 2
+
+
+def test_sample_ratio_keeps_everything_at_one() -> None:
+    provider, exporter = tail_sampled(ratio=1.0)
+    for _ in range(5):
+        record_trace(provider, seconds=0.1)
+    assert len(exporter.get_finished_spans()) == 10
+
+
+@pytest.mark.asyncio
+async def test_generate_emits_stage_spans() -> None:
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    engine = LLMEngine(
+        client=mock_client(create_app(MockConfig(base_latency_ms=0, per_token_ms=0))),
+        tracer=provider.get_tracer(__name__),
+    )
+    request = GenerateRequest(
+        incident=Incident(summary="Tracing", what="Down", harm="Waiting"),
+        channels=[Channel.STATUS_PAGE],
+    )
+
+    await engine.generate(request, use_cache=False, parallel=False)
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    root = spans["LLMEngine.generate"]
+    for name in ("clamp", "validate", "prompt_build", "llm.upstream", "parse"):
+        assert spans[name].context.trace_id == root.context.trace_id
+    assert spans["parse"].parent.span_id == root.context.span_id
+
+    upstream = spans["llm.upstream"].attributes
+    assert upstream["gen_ai.request.model"] == engine.model
+    assert upstream["app.channels"] == ("status_page",)
+    assert upstream["gen_ai.usage.completion_tokens"] > 0
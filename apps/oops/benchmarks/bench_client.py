@@ -0,0 +1,147 @@
+"""Benchmark oops.ninja -> API call overhead at a fixed request rate
+
+Compares a new AsyncClient per call, the shared pooled client and direct
+ASGI mode against a stub /v1/lucky that answers instantly, so the numbers
+are client and transport overhead only.
+
+Usage:
+    python -m benchmarks.bench_client --rps 200 --seconds 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+PAYLOAD = {"summary": "Outage", "what": "Database down", "harm": "No logins", "severity": "medium"}
+
+stub = FastAPI()
+
+
+@stub.post("/v1/lucky")
+async def stub_lucky(body: dict[str, Any]) -> dict[str, Any]:
+    return {"drafts": {"twitter": {"useful": "Sorry.", "pointless": "Oops."}}}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def serve(port: int) -> None:
+    """Run the stub API in its own process so it doesn't share our event loop"""
+    uvicorn.run(stub, port=port, log_level="warning")
+
+
+async def drive(
+    call: Callable[[], Awaitable[None]], rps: int, seconds: float
+) -> tuple[list[float], int]:
+    """Issue calls open-loop at ``rps``; return latencies in ms and the error count"""
+    latencies: list[float] = []
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            await call()
+        except httpx.HTTPError:
+            errors += 1
+            return
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tasks = []
+    interval = 1 / rps
+    begin = time.perf_counter()
+    for i in range(int(rps * seconds)):
+        # Schedule against the start time so slow calls don't lower the rate
+        delay = begin + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one()))
+    await asyncio.gather(*tasks)
+    return latencies, errors
+
+
+async def run(rps: int, seconds: float) -> None:
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+    server.start()
+
+    base_url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient() as probe:
+        while True:
+            try:
+                await probe.post(f"{base_url}/v1/lucky", json=PAYLOAD)
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+
+    async def per_call() -> None:
+        async with httpx.AsyncClient() as client:
+            (await client.post(f"{base_url}/v1/lucky", json=PAYLOAD)).raise_for_status()
+
+    pooled_client = httpx.AsyncClient(
+        base_url=base_url, limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+
+    async def pooled() -> None:
+        (await pooled_client.post("/v1/lucky", json=PAYLOAD)).raise_for_status()
+
+    direct_client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=stub),  # type: ignore[arg-type]
+        base_url="http://sorry_api",
+    )
+
+    async def direct() -> None:
+        (await direct_client.post("/v1/lucky", json=PAYLOAD)).raise_for_status()
+
+    modes = {"client per call": per_call, "pooled keep-alive": pooled, "direct ASGI": direct}
+    try:
+        print(f"{rps} RPS for {seconds:.0f}s")
+        print(
+            f"{'mode':<20} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for name, call in modes.items():
+            latencies, errors = await drive(call, rps, seconds)
+            if not latencies:
+                print(f"{name:<20} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {errors:>7}")
+                continue
+            print(
+                f"{name:<20} {statistics.mean(latencies):>8.2f} {percentile(latencies, 50):>8.2f}"
+                f" {percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f}"
+                f" {errors:>7}"
+            )
+    finally:
+        await pooled_client.aclose()
+        await direct_client.aclose()
+        server.terminate()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rps", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.rps, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,97 @@
 """oops.ninja - Minimal instant mode apology service"""
 
+import importlib
 import os
+import sys
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
 from typing import Any
 
 import httpx
-from fastapi import FastAPI, Form, HTTPException, Request
+from fastapi import FastAPI, Form, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 
+from .cache import SWRCache, lucky_key
+
+# API backend URL
+API_URL = os.getenv("API_URL", "http://sorry_api:8083")
+
+# "http" calls API_URL; "direct" runs the API app in-process over ASGI
+# (no network hop). Direct mode needs the API package importable, e.g.
+# API_APP_PATH=/srv/apps/api.
+API_MODE = os.getenv("API_MODE", "http")
+API_APP_PATH = os.getenv("API_APP_PATH", "")
+
+# Connection pool (http mode)
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "100"))
+API_MAX_KEEPALIVE = int(os.getenv("API_MAX_KEEPALIVE", "20"))
+API_KEEPALIVE_EXPIRY = float(os.getenv("API_KEEPALIVE_EXPIRY", "30"))
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "60"))
+# HTTP/2 is negotiated via TLS ALPN, so it only applies to https:// API URLs
+API_HTTP2 = os.getenv("API_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Result cache: fresh entries are served as-is, stale ones are served while
+# being refreshed in the background
+CACHE_FRESH_SECONDS = float(os.getenv("OOPS_CACHE_FRESH_SECONDS", "300"))
+CACHE_STALE_SECONDS = float(os.getenv("OOPS_CACHE_STALE_SECONDS", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("OOPS_CACHE_MAX_ENTRIES", "2048"))
+CACHE_MAX_REFRESHES = int(os.getenv("OOPS_CACHE_MAX_REFRESHES", "4"))
+
+
+def load_api_app() -> FastAPI:
+    """Import the sorry.monster API app for direct mode"""
+    if API_APP_PATH and API_APP_PATH not in sys.path:
+        sys.path.insert(0, API_APP_PATH)
+    api_app: FastAPI = importlib.import_module("app.main").app
+    return api_app
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Open one shared API client for the life of the process"""
+    async with AsyncExitStack() as stack:
+        if API_MODE == "direct":
+            api_app = load_api_app()
+            # Run the API's own startup/shutdown since no server does it for us
+            await stack.enter_async_context(api_app.router.lifespan_context(api_app))
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=api_app),  # type: ignore[arg-type]
+                base_url="http://sorry_api",
+                timeout=API_TIMEOUT,
+            )
+        else:
+            client = httpx.AsyncClient(
+                base_url=API_URL,
+                timeout=API_TIMEOUT,
+                http2=API_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=API_MAX_CONNECTIONS,
+                    max_keepalive_connections=API_MAX_KEEPALIVE,
+                    keepalive_expiry=API_KEEPALIVE_EXPIRY,
+                ),
+            )
+        app.state.api_client = await stack.enter_async_context(client)
+
+        app.state.cache = SWRCache(
+            fresh_ttl=CACHE_FRESH_SECONDS,
+            stale_ttl=CACHE_STALE_SECONDS,
+            max_entries=CACHE_MAX_ENTRIES,
+            max_refreshes=CACHE_MAX_REFRESHES,
+        )
+        stack.push_async_callback(app.state.cache.close)
+        yield
+
+
 app = FastAPI(
     title="oops.ninja",
     version="1.0.0",
     description="Instant apology generation - I'm Feeling Lucky mode",
+    lifespan=lifespan,
 )
 
 templates = Jinja2Templates(directory="templates")
 
-# API backend URL
-API_URL = os.getenv("API_URL", "http://sorry_api:8083")
-
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request) -> Any:
@@ -28,6 +101,8 @@ async def index(request: Request) -> Any:
 
 @app.post("/lucky")
 async def lucky(
+    request: Request,
+    response: Response,
     summary: str = Form(...),
     what: str = Form(...),
     harm: str = Form(...),
@@ -46,17 +121,44 @@ async def lucky(
         "severity": severity,
     }
 
-    # Call /v1/lucky API endpoint
+    client: httpx.AsyncClient = request.app.state.api_client
+
+    async def fetch() -> dict[str, Any]:
+        # Call /v1/lucky API endpoint over the shared, keep-alive client
+        api_response = await client.post("/v1/lucky", json=payload)
+        api_response.raise_for_status()
+        result: dict[str, Any] = api_response.json()
+        return result
+
+    cache: SWRCache = request.app.state.cache
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{API_URL}/v1/lucky", json=payload, timeout=60.0)
-            response.raise_for_status()
-            return response.json()
+        result, served = await cache.get(lucky_key(summary, what, harm, severity), fetch)
     except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"API error: {str(e)}")
 
+    response.headers["X-Cache"] = served
+    return result
+
 
 @app.get("/health")
 async def health() -> dict[str, str]:
     """Health check"""
     return {"status": "healthy", "service": "oops.ninja"}
+
+
+@app.get("/ready")
+async def ready(request: Request, response: Response) -> dict[str, Any]:
+    """Readiness probe
+
+    In direct mode the API runs in this process, so its warmup is ours too;
+    in http mode the API is probed separately and we're ready once started.
+    """
+    client: httpx.AsyncClient | None = getattr(request.app.state, "api_client", None)
+    if client is None:
+        response.status_code = 503
+        return {"status": "starting", "service": "oops.ninja"}
+    if API_MODE == "direct":
+        api_response = await client.get("/ready")
+        response.status_code = api_response.status_code
+        return {**api_response.json(), "service": "oops.ninja"}
+    return {"status": "ready", "service": "oops.ninja"}
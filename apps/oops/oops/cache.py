@@ -0,0 +1,146 @@
+"""Stale-while-revalidate cache for instant mode results"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+logger = logging.getLogger("oops.cache")
+
+Fetch = Callable[[], Awaitable[dict[str, Any]]]
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace so trivial edits share an entry"""
+    return " ".join(text.lower().split())
+
+
+def lucky_key(summary: str, what: str, harm: str, severity: str) -> str:
+    """Cache key for a /lucky submission"""
+    fields = [normalize(summary), normalize(what), normalize(harm), normalize(severity)]
+    return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+
+class SWRCache:
+    """In-memory LRU cache that serves stale entries while refreshing them
+
+    Entries younger than ``fresh_ttl`` are served as-is. Older entries, up to
+    ``stale_ttl``, are served immediately and refreshed in the background,
+    with at most ``max_refreshes`` refreshes in flight. Concurrent misses for
+    the same key share one upstream call.
+    """
+
+    def __init__(
+        self, fresh_ttl: float, stale_ttl: float, max_entries: int, max_refreshes: int
+    ) -> None:
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[dict[str, Any]]] = {}
+        self._refreshing: set[str] = set()
+        self._refreshes = asyncio.Semaphore(max_refreshes)
+        self._tasks: set[asyncio.Task[Any]] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, fetch: Fetch) -> tuple[dict[str, Any], str]:
+        """Return the cached value or fetch it
+
+        Args:
+            key: Cache key (see ``lucky_key``)
+            fetch: Upstream call producing the value
+
+        Returns:
+            The value and how it was served: "hit", "stale" or "miss"
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.monotonic() - stored_at
+            if age < self.fresh_ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value, "hit"
+            if age < self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._schedule_refresh(key, fetch)
+                return value, "stale"
+
+        self.misses += 1
+        return await self._fetch(key, fetch), "miss"
+
+    async def _fetch(self, key: str, fetch: Fetch) -> dict[str, Any]:
+        """Fetch and store a value, sharing the call with concurrent misses
+
+        The fetch runs in a task of its own, so a caller that goes away (a
+        client disconnect or timeout) doesn't cancel it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: self._settle(key, done))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: str, fetch: Fetch) -> dict[str, Any]:
+        value = await fetch()
+        self._store(key, value)
+        return value
+
+    def _settle(self, key: str, task: "asyncio.Task[dict[str, Any]]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self._tasks.discard(task)
+        if not task.cancelled():
+            # Callers observe the exception; don't warn if there are none
+            task.exception()
+
+    def _schedule_refresh(self, key: str, fetch: Fetch) -> None:
+        """Start a background refresh unless one is running or the ceiling is hit"""
+        if key in self._refreshing or self._refreshes.locked():
+            return
+
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, fetch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: str, fetch: Fetch) -> None:
+        try:
+            async with self._refreshes:
+                await self._fetch(key, fetch)
+        except Exception as e:
+            # Keep serving the stale entry; the next request retries
+            logger.warning("Background refresh failed: %s", e)
+        finally:
+            self._refreshing.discard(key)
+
+    def _store(self, key: str, value: dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshing": len(self._refreshing),
+        }
+
+    async def close(self) -> None:
+        """Cancel background refreshes and fetches"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,137 @@
+"""Tests for the stale-while-revalidate cache"""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from oops import cache
+from oops.cache import SWRCache
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to"""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Upstream:
+    """Counts calls and returns a new version each time"""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self) -> dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"version": self.calls}
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    # Swap the module's reference only; the event loop keeps the real clock
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def make_cache(max_entries: int = 10) -> SWRCache:
+    return SWRCache(
+        fresh_ttl=10, stale_ttl=60, max_entries=max_entries, max_refreshes=4
+    )
+
+
+@pytest.mark.asyncio
+async def test_fresh_hit(clock: Clock) -> None:
+    """A second get inside fresh_ttl is served without calling upstream"""
+    swr = make_cache()
+    upstream = Upstream()
+
+    assert await swr.get("k", upstream) == ({"version": 1}, "miss")
+    clock.now += 9
+    assert await swr.get("k", upstream) == ({"version": 1}, "hit")
+    assert upstream.calls == 1
+    assert swr.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_served_with_one_background_refresh(clock: Clock) -> None:
+    """Stale entries are returned immediately while a single refresh runs"""
+    swr = make_cache()
+    upstream = Upstream(delay=0.05)
+    await swr.get("k", upstream)
+
+    clock.now += 30
+    results = [await swr.get("k", upstream) for _ in range(5)]
+    assert results == [({"version": 1}, "stale")] * 5
+    assert swr.stats()["refreshing"] == 1
+
+    await asyncio.sleep(0.1)
+    assert upstream.calls == 2
+    assert swr.stats()["refreshing"] == 0
+    assert await swr.get("k", upstream) == ({"version": 2}, "hit")
+    await swr.close()
+
+
+@pytest.mark.asyncio
+async def test_entries_past_stale_ttl_are_refetched(clock: Clock) -> None:
+    """Nothing older than stale_ttl is served, not even as stale"""
+    swr = make_cache()
+    upstream = Upstream()
+    await swr.get("k", upstream)
+
+    clock.now += 60
+    assert await swr.get("k", upstream) == ({"version": 2}, "miss")
+    assert swr.stats()["stale_hits"] == 0
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entry_is_evicted(clock: Clock) -> None:
+    """Going over max_entries drops the entry used longest ago"""
+    swr = make_cache(max_entries=2)
+    upstream = Upstream()
+    await swr.get("a", upstream)
+    await swr.get("b", upstream)
+    await swr.get("a", upstream)
+
+    await swr.get("c", upstream)
+
+    assert swr.stats()["entries"] == 2
+    assert (await swr.get("a", upstream))[1] == "hit"
+    assert (await swr.get("b", upstream))[1] == "miss"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch(clock: Clock) -> None:
+    """Simultaneous misses for a key wait on the same upstream call"""
+    swr = make_cache()
+    upstream = Upstream(delay=0.05)
+
+    results = await asyncio.gather(*(swr.get("k", upstream) for _ in range(5)))
+
+    assert upstream.calls == 1
+    assert results == [({"version": 1}, "miss")] * 5
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_fail_others(clock: Clock) -> None:
+    """A miss whose first caller goes away still answers the callers sharing it"""
+    swr = make_cache()
+    upstream = Upstream(delay=0.05)
+
+    leader = asyncio.create_task(swr.get("k", upstream))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(swr.get("k", upstream))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == ({"version": 1}, "miss")
+    assert leader.cancelled()
+    assert upstream.calls == 1
+    assert swr.stats()["entries"] == 1